@@ -0,0 +1,123 @@
+"""Import time benchmark of the climate platform.
+
+Imports the platform in a fresh interpreter with '-X importtime' and
+reports the import time of the integration modules. The run fails when
+modules which are only needed by a configured filter or master (numpy,
+UKF filter, nesting) are loaded on platform import.
+
+usage (from repository root, Home Assistant installed):
+    python -m benchmarks.import_benchmark
+    python -m benchmarks.import_benchmark --repeats 10 --max-ms 150
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PACKAGE = "custom_components.multizone_thermostat"
+PLATFORM = f"{PACKAGE}.climate"
+REPEATS = 5
+
+# modules to be loaded only when a configured entity needs them
+LAZY_MODULES = [
+    "numpy",
+    f"{PACKAGE}.UKF_config",
+    f"{PACKAGE}.UKF_filter",
+    f"{PACKAGE}.pwm_nesting",
+    f"{PACKAGE}.nesting_solver",
+]
+
+IMPORT_CODE = (
+    "import json, sys\n"
+    "import {module}\n"
+    "print(json.dumps([name for name in {lazy!r} if name in sys.modules]))\n"
+)
+
+
+def import_once(module: str) -> tuple[dict, list]:
+    """Import module in new interpreter.
+
+    returns cumulative import time (us) per module and loaded lazy modules
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            IMPORT_CODE.format(module=module, lazy=LAZY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # line format: 'import time: self [us] | cumulative | imported package'
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumul, name = line.split(":", 1)[1].split("|")
+        name = name.strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(cumul))
+    return cumulative, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(module: str, repeats: int) -> tuple[dict, list]:
+    """Median import time per integration module in ms and lazy modules loaded."""
+    timings = {}
+    loaded = set()
+    for _ in range(repeats):
+        cumulative, lazy = import_once(module)
+        loaded.update(lazy)
+        for name, value in cumulative.items():
+            if name.startswith(PACKAGE) or name in ["numpy", "homeassistant"]:
+                timings.setdefault(name, []).append(value / 1e3)
+    return (
+        {name: statistics.median(values) for name, values in timings.items()},
+        sorted(loaded),
+    )
+
+
+def main(argv: list | None = None) -> int:
+    """Run the benchmark and check the lazily loaded modules."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=PLATFORM, help="module to import")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument(
+        "--max-ms", type=float, help="fail when module import exceeds limit"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        timings, loaded = run(args.module, args.repeats)
+    except RuntimeError as err:
+        print(f"import of {args.module} failed: {err}")
+        return 1
+
+    print(f"{'module':60} {'cumulative ms':>14}")
+    for name, value in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"{name:60} {value:14.1f}")
+
+    failed = False
+    for name in loaded:
+        print(f"EAGER IMPORT {name}")
+        failed = True
+
+    total = timings.get(args.module, 0)
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"IMPORT TIME {total:.1f} ms > limit {args.max_ms:.1f} ms")
+        failed = True
+
+    if failed:
+        return 1
+    print("no eager imports")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""Micro-benchmark of the satellite nesting routine.
+
+Generates randomised and adversarial satellite demand sets, times every
+nesting stage per operation mode and scores the packing quality. Results
+are compared against a stored baseline and the run fails when latency or
+quality regresses beyond the thresholds.
+
+usage (from repository root):
+    python -m benchmarks.nesting_benchmark                  compare with baseline
+    python -m benchmarks.nesting_benchmark --update         store new baseline
+    python -m benchmarks.nesting_benchmark --output x.json  also write results
+"""
+
+import argparse
+import copy
+import json
+import logging
+from pathlib import Path
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from custom_components.multizone_thermostat.const import (
+    NESTING_ADAPTIVE,
+    NESTING_MATRIX,
+    NestingMode,
+    NestingStrategy,
+)
+from custom_components.multizone_thermostat.pwm_nesting import Nesting
+from custom_components.multizone_thermostat.satelite_record import SateliteRecord
+
+BASELINE_FILE = Path(__file__).with_name("nesting_baseline.json")
+CALIBRATION = "calibration"
+
+REPEATS = 25
+SEED = 1
+MASTER_PWM_SCALE = 100
+MIN_LOAD = 0.15
+
+# allowed regression before failing
+LATENCY_TOLERANCE = 1.0  # factor of baseline median
+LATENCY_FLOOR = 0.5e-3  # seconds, ignore differences below timer noise
+QUALITY_TOLERANCE = 0.02  # absolute on balance and peak load
+
+STAGES = [
+    "nest_rooms",
+    "distribute_nesting",
+    "get_nesting",
+    "get_master_output",
+    "check_pwm",
+]
+
+
+def satelite(area: float, pwm: float, pwm_duration: int = 1800) -> SateliteRecord:
+    """Satellite data as stored by the master."""
+    return SateliteRecord(
+        hvac_mode="heat",
+        self_controlled="master",
+        preset_mode="none",
+        control_mode="proportional_mode",
+        pwm_duration=pwm_duration,
+        pwm_scale=MASTER_PWM_SCALE,
+        setpoint=20,
+        area=area,
+        pwm=pwm,
+        offset=0,
+    )
+
+
+def scenario_random(rng: random.Random, rooms: int) -> dict:
+    """Random room sizes and demand."""
+    return {
+        f"room_{i}": satelite(rng.uniform(4, 40), rng.uniform(5, 100))
+        for i in range(rooms)
+    }
+
+
+def scenario_many_small(rng: random.Random, rooms: int) -> dict:
+    """Many small rooms with short pwm: rounding up dominates."""
+    return {
+        f"room_{i}": satelite(rng.uniform(1, 4), rng.uniform(1, 10))
+        for i in range(rooms)
+    }
+
+
+def scenario_dominant(rng: random.Random, rooms: int) -> dict:
+    """Single large room requiring most of the heat."""
+    data = {"room_0": satelite(120, 90)}
+    data.update(
+        {
+            f"room_{i}": satelite(rng.uniform(4, 10), rng.uniform(10, 60))
+            for i in range(1, rooms)
+        }
+    )
+    return data
+
+
+def scenario_full_load(rng: random.Random, rooms: int) -> dict:
+    """All rooms near full demand."""
+    return {
+        f"room_{i}": satelite(rng.uniform(8, 30), rng.uniform(85, 100))
+        for i in range(rooms)
+    }
+
+
+def scenario_alternating(rng: random.Random, rooms: int) -> dict:
+    """Alternating long and short demand of equal area: fragments lids."""
+    return {
+        f"room_{i}": satelite(15, 95 if i % 2 else 15 + rng.uniform(0, 5))
+        for i in range(rooms)
+    }
+
+
+def scenario_mixed_prop(rng: random.Random, rooms: int) -> dict:
+    """Random on-off rooms combined with proportional valves."""
+    data = scenario_random(rng, rooms)
+    for i, room in enumerate(data):
+        if i % 3 == 0:
+            data[room].pwm_duration = 0
+    return data
+
+
+def scenario_unbalanced_lids(rng: random.Random, rooms: int) -> dict:
+    """Dominant half loop room and full load rooms: a lid per room, no balance."""
+    data = {"room_0": satelite(150, 50)}
+    data.update(
+        {f"room_{i}": satelite(rng.uniform(1.5, 2.5), 100) for i in range(1, rooms)}
+    )
+    return data
+
+
+SCENARIOS = {
+    "random_4": (scenario_random, 4),
+    "random_12": (scenario_random, 12),
+    "random_30": (scenario_random, 30),
+    "many_small_30": (scenario_many_small, 30),
+    "dominant_10": (scenario_dominant, 10),
+    "full_load_12": (scenario_full_load, 12),
+    "alternating_12": (scenario_alternating, 12),
+    "mixed_prop_12": (scenario_mixed_prop, 12),
+    "unbalanced_lids_20": (scenario_unbalanced_lids, 20),
+}
+
+
+def mid_cycle_update(rng: random.Random, sat_data: dict) -> dict:
+    """Satellite changes during a pwm cycle: drift, drop-out and new demand."""
+    new_data = copy.deepcopy(sat_data)
+    for i, data in enumerate(new_data.values()):
+        if i % 5 == 0:
+            data.pwm = 0
+        else:
+            data.pwm = min(100, max(0, data.pwm * rng.uniform(0.8, 1.2)))
+    return new_data
+
+
+def packing_quality(nesting: Nesting) -> dict:
+    """Score the packing: balance, peak load and placed rooms."""
+    balance = nesting.nesting_balance(nesting.packed)
+    demanded = [room for i, room in enumerate(nesting.rooms) if nesting.pwm[i] > 0]
+    placed = {cell for lid in nesting.packed for cell in lid.flat if cell is not None}
+    return {
+        "balance": abs(balance) if balance is not None else 0.0,
+        "peak_load": nesting.peak_load(),
+        "lids": len(nesting.packed),
+        "matrix": nesting.matrix,
+        "placed_fraction": len(placed) / len(demanded) if demanded else 1.0,
+    }
+
+
+def timed(func, *args, **kwargs) -> float:
+    """Run func and return duration in seconds."""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_case(
+    scenario: str,
+    mode: NestingMode,
+    resolution: int | str = NESTING_MATRIX,
+    strategy: NestingStrategy = NestingStrategy.FIRST_FIT,
+) -> dict:
+    """Benchmark all stages for one scenario, operation mode and settings."""
+    generator, rooms = SCENARIOS[scenario]
+    durations = {stage: [] for stage in STAGES}
+    quality = None
+
+    for repeat in range(REPEATS):
+        rng = random.Random(f"{SEED}-{scenario}-{repeat}")
+        sat_data = generator(rng, rooms)
+        tot_area = sum(data.area for data in sat_data.values())
+        nesting = Nesting(
+            "benchmark",
+            operation_mode=mode,
+            master_pwm=MASTER_PWM_SCALE,
+            tot_area=tot_area,
+            min_load=MIN_LOAD,
+            pwm_threshold=0,
+            min_prop_valve_opening=0,
+            resolution=resolution,
+            strategy=strategy,
+        )
+
+        durations["nest_rooms"].append(timed(nesting.nest_rooms, sat_data))
+        durations["distribute_nesting"].append(timed(nesting.distribute_nesting))
+        durations["get_nesting"].append(timed(nesting.get_nesting))
+        durations["get_master_output"].append(timed(nesting.get_master_output))
+
+        # quality of the first (reproducible) repeat
+        if quality is None:
+            quality = packing_quality(nesting)
+
+        update = mid_cycle_update(rng, sat_data)
+        durations["check_pwm"].append(timed(nesting.check_pwm, update, dt=0.4))
+
+    return {
+        "latency": {
+            stage: statistics.median(values) for stage, values in durations.items()
+        },
+        "quality": quality,
+    }
+
+
+def calibrate() -> float:
+    """Time a fixed reference workload to normalise latency between runs."""
+    durations = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        lid = np.array([[None] * 20 for _ in range(20)], dtype=object)
+        for i in range(20):
+            lid[i, : i + 1] = f"room_{i}"
+            _ = [list(dict.fromkeys(lid[:, j])) for j in range(20)]
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run_all() -> dict:
+    """Benchmark all scenarios in all nesting modes and strategies."""
+    results = {CALIBRATION: calibrate()}
+    for scenario in SCENARIOS:
+        for mode in NestingMode:
+            results[f"{scenario}/{mode}"] = run_case(scenario, mode)
+            results[f"{scenario}/{mode}/{NESTING_ADAPTIVE}"] = run_case(
+                scenario, mode, NESTING_ADAPTIVE
+            )
+            results[f"{scenario}/{mode}/{NestingStrategy.BEAM_SEARCH}"] = run_case(
+                scenario, mode, strategy=NestingStrategy.BEAM_SEARCH
+            )
+    return results
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Return list of regressions with respect to the baseline."""
+    regressions = []
+    # correct for speed of current machine
+    speed = results[CALIBRATION] / baseline.get(CALIBRATION, results[CALIBRATION])
+    for case, result in results.items():
+        if case == CALIBRATION or case not in baseline:
+            continue
+        old = baseline[case]
+
+        for stage, new_time in result["latency"].items():
+            old_time = old["latency"].get(stage)
+            if old_time is None:
+                continue
+            old_time *= speed
+            limit = max(old_time * (1 + LATENCY_TOLERANCE), old_time + LATENCY_FLOOR)
+            if new_time > limit:
+                regressions.append(
+                    f"{case}: {stage} {new_time * 1e3:.3f} ms > limit {limit * 1e3:.3f} ms"
+                )
+
+        for metric in ["balance", "peak_load"]:
+            if result["quality"][metric] > old["quality"][metric] + QUALITY_TOLERANCE:
+                regressions.append(
+                    f"{case}: {metric} {result['quality'][metric]:.3f} > "
+                    f"baseline {old['quality'][metric]:.3f}"
+                )
+        if result["quality"]["placed_fraction"] < old["quality"]["placed_fraction"]:
+            regressions.append(
+                f"{case}: placed_fraction {result['quality']['placed_fraction']:.3f} < "
+                f"baseline {old['quality']['placed_fraction']:.3f}"
+            )
+    return regressions
+
+
+def report(results: dict) -> None:
+    """Print a summary table."""
+    print(
+        f"{'case':45} {'nest':>8} {'distr':>8} {'offset':>8} {'master':>8} "
+        f"{'check':>8} {'balance':>8} {'peak':>6} {'lids':>5} {'matrix':>6}"
+    )
+    for case, result in results.items():
+        if case == CALIBRATION:
+            continue
+        lat = {stage: result["latency"][stage] * 1e3 for stage in STAGES}
+        qual = result["quality"]
+        print(
+            f"{case:45} {lat['nest_rooms']:8.3f} {lat['distribute_nesting']:8.3f} "
+            f"{lat['get_nesting']:8.3f} {lat['get_master_output']:8.3f} "
+            f"{lat['check_pwm']:8.3f} {qual['balance']:8.3f} "
+            f"{qual['peak_load']:6.2f} {qual['lids']:5d} {qual['matrix']:6d}"
+        )
+    print(f"latency in ms (median), calibration {results[CALIBRATION] * 1e3:.3f} ms")
+
+
+def main(argv: list | None = None) -> int:
+    """Run the benchmark and compare or store the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="store new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--output", type=Path, help="write results to json file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    results = run_all()
+    report(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.update:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"baseline stored in {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"no baseline found at {args.baseline}, run with --update")
+        return 1
+
+    regressions = compare(results, json.loads(args.baseline.read_text()))
+    for regression in regressions:
+        print("REGRESSION", regression)
+    if regressions:
+        return 1
+
+    print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
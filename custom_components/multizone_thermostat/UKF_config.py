@@ -1,8 +1,7 @@
 """module to initiate UKF filter for temperature readings"""
-import time
-
 import numpy as np
 
+from .clock import get_clock
 from .UKF_filter.discretization import Q_discrete_white_noise
 from .UKF_filter.sigma_points import MerweScaledSigmaPoints
 from .UKF_filter.UKF import UnscentedKalmanFilter
@@ -14,7 +13,7 @@ class UKFFilter:
     def __init__(self, current_temp, timedelta, filter_mode):
         """init Unscented kalman filter"""
         self._interval = 0
-        self._last_update = time.time()
+        self._last_update = get_clock().time()
         self._mode = filter_mode
         sigmas = MerweScaledSigmaPoints(n=2, alpha=0.001, beta=2, kappa=0)
         self._kf_temp = UnscentedKalmanFilter(
@@ -29,8 +28,9 @@ class UKFFilter:
         run UKF prediction with variable timestep
         https://github.com/rlabbe/filterpy/issues/196
         """
-        timedelta = time.time() - self._last_update
-        self._last_update = time.time()
+        now = get_clock().time()
+        timedelta = now - self._last_update
+        self._last_update = now
         self._kf_temp.predict(dt=timedelta)
 
     def kf_update(self, current_temp):
@@ -47,6 +47,26 @@ class UKFFilter:
         """return filtered velocity"""
         return float(self._kf_temp.x[1])
 
+    def get_state(self):
+        """return filter state to store"""
+        return {
+            "x": self._kf_temp.x.tolist(),
+            "P": self._kf_temp.P.tolist(),
+            "last_update": self._last_update,
+        }
+
+    def set_state(self, state):
+        """restore stored filter state"""
+        self._kf_temp.x = np.array(state["x"], dtype=float)
+        if "P" in state:
+            self._kf_temp.P = np.array(state["P"], dtype=float)
+        self._last_update = state["last_update"]
+
+    @property
+    def factorization_repairs(self):
+        """return repaired covariance factorizations per repair method"""
+        return dict(self._kf_temp.points_fn.sqrt.repairs)
+
     def set_Q_R(self, timedelta=None):  # pylint: disable=invalid-name
         """process noise"""
         # default Q .002 R 4
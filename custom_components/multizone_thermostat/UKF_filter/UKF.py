@@ -22,7 +22,7 @@ import numpy as np
 from numpy import eye, zeros, dot, isscalar, outer
 from .unscented_transform import unscented_transform
 from .helpers import pretty_str
-from .cholesky import cholesky
+from .factorization import CholeskyFactorization
 
 
 def logpdf(x, mean, cov):
@@ -336,7 +336,7 @@ class UnscentedKalmanFilter(object):
         self._mahalanobis = None
 
         if sqrt_fn is None:
-            self.msqrt = cholesky
+            self.msqrt = CholeskyFactorization()
         else:
             self.msqrt = sqrt_fn
 
@@ -0,0 +1,95 @@
+"""Cholesky factorization of (stacked) covariance matrices.
+
+Factorization is done by LAPACK through numpy for a single (n, n) matrix
+or a stack of matrices (rooms, n, n) in one call. A matrix which is not
+positive definite, e.g. due to rounding in the filter update, is repaired
+by adding jitter to the diagonal and as last resort by clipping negative
+eigenvalues. Repairs are counted per factorization object.
+"""
+import numpy as np
+
+JITTER_START = 1e-10  # relative to mean of diagonal
+JITTER_STEPS = 6  # jitter is increased tenfold each step
+EIGEN_FLOOR = 1e-12  # relative to mean of diagonal
+
+
+class CholeskyFactorization:
+    """Matrix square root for the sigma point classes (sqrt_method).
+
+    returns upper triangular U with U.T @ U = P by default, rows of U are
+    used to create the sigma points
+    """
+
+    def __init__(self, upper=True):
+        self.upper = upper
+        self.repairs = {"jitter": 0, "eigen_clip": 0}
+
+    def __call__(self, P):
+        return cholesky(P, upper=self.upper, repairs=self.repairs)
+
+    @property
+    def repair_count(self):
+        """Number of factorizations which required repair."""
+        return sum(self.repairs.values())
+
+    def __repr__(self):
+        return "CholeskyFactorization(upper={}, repairs={})".format(
+            self.upper, self.repairs
+        )
+
+
+def cholesky(P, upper=True, repairs=None):
+    """Cholesky factor of P with shape (n, n) or (..., n, n).
+
+    repairs is an optional dict to count the applied repairs
+    """
+    P = np.asarray(P, dtype=float)
+    try:
+        L = np.linalg.cholesky(P)
+    except np.linalg.LinAlgError:
+        if P.ndim == 2:
+            L = _repair(P, repairs)
+        else:
+            # only repair the failing matrices of the stack
+            stack = P.reshape(-1, *P.shape[-2:])
+            L = np.empty_like(stack)
+            for i, P_i in enumerate(stack):
+                try:
+                    L[i] = np.linalg.cholesky(P_i)
+                except np.linalg.LinAlgError:
+                    L[i] = _repair(P_i, repairs)
+            L = L.reshape(P.shape)
+
+    if upper:
+        return np.swapaxes(L, -1, -2)
+    return L
+
+
+def _repair(P, repairs=None):
+    """Lower cholesky factor of nearest positive definite matrix of P."""
+    P = (P + P.T) / 2
+    n = P.shape[0]
+    scale = np.mean(np.abs(np.diag(P)))
+    if not np.isfinite(scale):
+        raise np.linalg.LinAlgError("matrix contains non finite values")
+    if scale == 0:
+        scale = 1.0
+
+    jitter = JITTER_START * scale
+    for _ in range(JITTER_STEPS):
+        try:
+            L = np.linalg.cholesky(P + jitter * np.eye(n))
+        except np.linalg.LinAlgError:
+            jitter *= 10
+            continue
+        if repairs is not None:
+            repairs["jitter"] += 1
+        return L
+
+    # clip eigenvalues to small positive value
+    w, v = np.linalg.eigh(P)
+    w = np.maximum(w, EIGEN_FLOOR * scale)
+    L = np.linalg.cholesky((v * w) @ v.T + EIGEN_FLOOR * scale * np.eye(n))
+    if repairs is not None:
+        repairs["eigen_clip"] += 1
+    return L
@@ -16,7 +16,7 @@ This is licensed under an MIT license. See the readme.MD file
 for more information.
 """
 import numpy as np
-from .cholesky import cholesky
+from .factorization import CholeskyFactorization
 from .helpers import pretty_str
 
 class MerweScaledSigmaPoints(object):
@@ -102,7 +102,7 @@ class MerweScaledSigmaPoints(object):
         self.beta = beta
         self.kappa = kappa
         if sqrt_method is None:
-            self.sqrt = cholesky
+            self.sqrt = CholeskyFactorization()
         else:
             self.sqrt = sqrt_method
 
@@ -269,7 +269,7 @@ class JulierSigmaPoints(object):
         self.n = n
         self.kappa = kappa
         if sqrt_method is None:
-            self.sqrt = cholesky
+            self.sqrt = CholeskyFactorization()
         else:
             self.sqrt = sqrt_method
 
@@ -434,7 +434,7 @@ class SimplexSigmaPoints(object):
         self.n = n
         self.alpha = alpha
         if sqrt_method is None:
-            self.sqrt = cholesky
+            self.sqrt = CholeskyFactorization()
         else:
             self.sqrt = sqrt_method
 
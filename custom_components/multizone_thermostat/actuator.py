@@ -0,0 +1,108 @@
+"""Desired and commanded state of the valves and switches."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from homeassistant.core import HomeAssistant, callback
+
+from .clock import get_clock
+
+
+@dataclass(slots=True)
+class ActuatorState:
+    """Last observed and commanded state of one actuator."""
+
+    state: str | None = None
+    commanded: str | float | None = None
+    commanded_at: float | None = None
+    sent: int = 0
+    suppressed: int = 0
+
+
+class ActuatorCache:
+    """Cache of the actuator states of a thermostat.
+
+    The observed state follows the state change events of the actuators
+    such that the state machine is not read on every valve check. A command
+    is suppressed when the actuator already reports the desired state. For
+    valve positions the desired position should in addition be within the
+    deadband of the last command and the command is repeated after the
+    refresh period.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Prepare empty cache."""
+        self.hass = hass
+        self._actuators: dict[str, ActuatorState] = {}
+
+    def _get(self, entity_id: str) -> ActuatorState:
+        """Cache entry of actuator."""
+        if (actuator := self._actuators.get(entity_id)) is None:
+            actuator = self._actuators[entity_id] = ActuatorState()
+        return actuator
+
+    @callback
+    def async_observe(self, entity_id: str, state: str | None) -> None:
+        """Store state reported by actuator."""
+        self._get(entity_id).state = state
+
+    def get_state(self, entity_id: str) -> str | None:
+        """Reported state of actuator, read from state machine once."""
+        actuator = self._get(entity_id)
+        if actuator.state is None:
+            if (state := self.hass.states.get(entity_id)) is None:
+                return None
+            actuator.state = state.state
+        return actuator.state
+
+    @callback
+    def async_suppressed(self, entity_id: str) -> None:
+        """Count command which was not sent."""
+        self._get(entity_id).suppressed += 1
+
+    def is_redundant(
+        self, entity_id: str, position: float, deadband: float = 0, refresh: float = 0
+    ) -> bool:
+        """Check if valve position command can be suppressed and count it.
+
+        The position is compared with the last command or, when no command
+        was sent yet, with the reported position.
+        """
+        actuator = self._get(entity_id)
+        try:
+            reported = float(self.get_state(entity_id))
+        except (TypeError, ValueError):
+            return False
+
+        if isinstance(actuator.commanded, float):
+            last = actuator.commanded
+            # resend when actuator did not follow or refresh is due
+            if abs(reported - last) > deadband or (
+                refresh and get_clock().monotonic() - actuator.commanded_at >= refresh
+            ):
+                return False
+        else:
+            last = reported
+
+        if abs(position - last) > deadband:
+            return False
+
+        actuator.suppressed += 1
+        return True
+
+    def commanded(self, entity_id: str, command: str | float) -> None:
+        """Store command sent to actuator."""
+        actuator = self._get(entity_id)
+        if not isinstance(command, str):
+            command = float(command)
+        actuator.commanded = command
+        actuator.commanded_at = get_clock().monotonic()
+        actuator.sent += 1
+
+    @property
+    def counters(self) -> dict:
+        """Commands sent and suppressed per actuator."""
+        return {
+            entity_id: {"sent": actuator.sent, "suppressed": actuator.suppressed}
+            for entity_id, actuator in self._actuators.items()
+        }
@@ -19,6 +19,7 @@ import time
 import traceback
 
 from homeassistant.components.climate import (
+    ATTR_CURRENT_TEMPERATURE,
     ATTR_HVAC_MODE,
     ATTR_PRESET_MODE,
     PRESET_NONE,
@@ -32,7 +33,6 @@ from homeassistant.const import (
     ATTR_TEMPERATURE,
     CONF_NAME,
     CONF_UNIQUE_ID,
-    EVENT_HOMEASSISTANT_START,
     SERVICE_TURN_OFF,
     SERVICE_TURN_ON,
     STATE_CLOSED,
@@ -52,36 +52,45 @@ from homeassistant.core import (
     callback,
     Event,
 )
-from homeassistant.exceptions import ConditionError
+from homeassistant.exceptions import ConditionError, HomeAssistantError
 from homeassistant.helpers import condition
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.event import (
     EventStateChangedData,
-    async_track_point_in_utc_time,
     async_track_state_change_event,
-    async_track_time_change,
-    async_track_time_interval,
 )
 from homeassistant.helpers.reload import async_setup_reload_service
 from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 
-from . import DOMAIN, PLATFORMS, UKF_config, hvac_setting, services
+from . import DOMAIN, PLATFORMS, hvac_setting, services
 from .const import (
+    ATTR_ACTUATOR_COMMANDS,
     ATTR_CONTROL_MODE,
     ATTR_CONTROL_OFFSET,
     ATTR_CONTROL_OUTPUT,
     ATTR_CONTROL_PWM_OUTPUT,
+    ATTR_CONTROL_TRACE,
     ATTR_CURRENT_OUTDOOR_TEMPERATURE,
     ATTR_CURRENT_TEMP_VEL,
     ATTR_EMERGENCY_MODE,
     ATTR_FILTER_MODE,
+    ATTR_FILTER_REPAIRS,
     ATTR_HVAC_DEFINITION,
+    ATTR_LAST_SWITCH_CHANGE,
+    ATTR_MASTER_COORDINATION,
+    ATTR_MASTER_ENTITY_ID,
     ATTR_SELF_CONTROLLED,
+    ATTR_SENSOR_INGESTION,
     ATTR_STUCK_LOOP,
+    ATTR_SWITCHING_PLAN,
+    ATTR_TIME_TO_CONTROL,
     ATTR_VALUE,
     CLOSE_TO_PWM,
     CONF_AREA,
+    CONF_COMMAND_BATCH_WINDOW,
+    CONF_COMMAND_STAGGER,
     CONF_DETAILED_OUTPUT,
     CONF_ENABLE_OLD_INTEGRAL,
     CONF_ENABLE_OLD_PARAMETERS,
@@ -92,15 +101,20 @@ from .const import (
     CONF_INITIAL_PRESET_MODE,
     CONF_MASTER_MODE,
     CONF_PASSIVE_CHECK_TIME,
+    CONF_PASSIVE_CONCURRENCY,
+    CONF_PASSIVE_SPACING,
     CONF_PASSIVE_SWITCH_CHECK,
     CONF_PRECISION,
     CONF_PWM_SCALE,
     CONF_SENSOR,
+    CONF_SENSOR_DEADBAND,
+    CONF_SENSOR_MIN_INTERVAL,
     CONF_SENSOR_OUT,
     CONF_STALE_DURATION,
     CONTROL_START_DELAY,
     MASTER_CONTROL_LEAD,
     NC_SWITCH_MODE,
+    NESTING_EXECUTOR_DEADLINE,
     NO_SWITCH_MODE,
     PRESET_EMERGENCY,
     PRESET_RESTORE,
@@ -108,9 +122,25 @@ from .const import (
     SAT_CONTROL_LEAD,
     SERVICE_SET_VALUE,
     START_MISALINGMENT,
+    STORE_MAX_AGE,
+    STORE_SAVE_DELAY,
+    STORE_VERSION,
     OperationMode,
 )
+from .actuator import ActuatorCache
+from .clock import get_clock
+from .command_queue import async_get_command_queue
+from .coordination import async_get_master_coordinator
+from .decisions import DECISION_CONTROL, DECISION_SWITCH, DecisionLog
+from .exercise import async_get_exercise
+from .ingestion import SensorIngestion
+from .input_log import InputRecorder
 from .platform_schema import PLATFORM_SCHEMA  # noqa: F401
+from .profiling import TickProfiler, write_stats
+from .startup import async_get_startup
+from .switching_plan import SwitchingPlan
+from .tracing import ControlTracer
+from .watchdog import async_get_watchdog
 
 ERROR_STATE = [STATE_UNAVAILABLE, STATE_UNKNOWN, STATE_PROBLEM]
 NOT_SUPPORTED_SWITCH_STATES = [STATE_OPEN, STATE_OPENING, STATE_CLOSED, STATE_CLOSING]
@@ -143,8 +173,18 @@ async def async_setup_platform(
     initial_preset_mode = config.get(CONF_INITIAL_PRESET_MODE)
     area = config.get(CONF_AREA)
     sensor_stale_duration = config.get(CONF_STALE_DURATION)
+    sensor_deadband = config.get(CONF_SENSOR_DEADBAND)
+    sensor_min_interval = config.get(CONF_SENSOR_MIN_INTERVAL)
     passive_switch = config.get(CONF_PASSIVE_SWITCH_CHECK)
     passive_switch_time = config.get(CONF_PASSIVE_CHECK_TIME)
+    passive_switch_limits = (
+        config.get(CONF_PASSIVE_CONCURRENCY),
+        config.get(CONF_PASSIVE_SPACING),
+    )
+    command_limits = (
+        config.get(CONF_COMMAND_BATCH_WINDOW),
+        config.get(CONF_COMMAND_STAGGER),
+    )
     detailed_output = config.get(CONF_DETAILED_OUTPUT)
     enable_old_state = config.get(CONF_ENABLE_OLD_STATE)
     enable_old_parameters = config.get(CONF_ENABLE_OLD_PARAMETERS)
@@ -169,6 +209,7 @@ async def async_setup_platform(
     custom_presets = list({key_i for list_i in custom_presets for key_i in list_i})
     await async_setup_reload_service(hass, DOMAIN, PLATFORMS)
     services.register_services(list(set(custom_presets)))
+    async_get_startup(hass)
 
     async_add_entities(
         [
@@ -190,8 +231,12 @@ async def async_setup_platform(
                 enable_old_parameters,
                 enable_old_integral,
                 sensor_stale_duration,
+                sensor_deadband,
+                sensor_min_interval,
                 passive_switch,
                 passive_switch_time,
+                passive_switch_limits,
+                command_limits,
             )
         ]
     )
@@ -227,11 +272,19 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         enable_old_parameters,
         enable_old_integral,
         sensor_stale_duration,
+        sensor_deadband,
+        sensor_min_interval,
         passive_switch,
         passive_switch_time,
+        passive_switch_limits,
+        command_limits,
     ) -> None:
         """Initialize the thermostat."""
+        # state transitions, e.g. hvac mode changes
         self._temp_lock = asyncio.Lock()
+        # one controller and one pwm tick at a time
+        self._control_lock = asyncio.Lock()
+        self._pwm_lock = asyncio.Lock()
 
         self._sensor_entity_id = sensor_entity_id
         self._sensor_out_entity_id = sensor_out_entity_id
@@ -249,8 +302,16 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self._restore_parameters = enable_old_parameters
         self._restore_integral = enable_old_integral
         self._sensor_stale_duration = sensor_stale_duration
+        self._sensor_deadband = sensor_deadband
+        self._sensor_min_interval = (
+            sensor_min_interval.total_seconds() if sensor_min_interval else 0
+        )
+        self._ingestion = {}
+        self._sensor_watches = {}
         self._passive_switch = passive_switch
         self._passive_switch_time = passive_switch_time
+        self._passive_switch_limits = passive_switch_limits
+        self._command_limits = command_limits
         self._area = area
         self._emergency_stop = []
         self._current_temperature = None
@@ -259,14 +320,21 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self._hvac_on = None
         self._loop_controller = None
         self._loop_pwm = None
-        self._start_pwm = None
-        self._stop_pwm = None
+        self._switching_plan = None
         self._satelites = None
         self.time_changed = None
         self._pwm_start_time = None
         self._sat_id = 0
         self.control_output = {ATTR_CONTROL_OFFSET: 0, ATTR_CONTROL_PWM_OUTPUT: 0}
         self._self_controlled = OperationMode.SELF
+        self._master_entity_id = None
+        self._store = None
+        self._actuators = None
+        self._tracer = ControlTracer()
+        self._profiler = TickProfiler()
+        self._decisions = DecisionLog()
+        self._input_log: InputRecorder | None = None
+        self._nesting_job: asyncio.Future | None = None  # offloaded nesting run
 
         # check if it is master for Hvacmode.off
         self.is_master = False
@@ -274,9 +342,9 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         for _, hvac_mode in hvac_def.items():
             if CONF_MASTER_MODE in hvac_mode:
                 self.is_master = True
-                self._attr_name = OperationMode.MASTER
 
         # setup control modes
+        self._hvac_config = hvac_def
         self._hvac_def = {}
         for hvac_mode, mode_config in hvac_def.items():
             self._hvac_def[hvac_mode] = hvac_setting.HVACSetting(
@@ -301,9 +369,24 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         """
         self._logger.info("Add thermostat to hass")
         await super().async_added_to_hass()
+        self._actuators = ActuatorCache(self.hass)
+        self._switching_plan = SwitchingPlan(
+            self.hass, self._async_switch_turn_on, self._async_switch_turn_off
+        )
+        self.async_on_remove(self._switching_plan.async_cancel)
+        self.async_on_remove(self._profiler.stop)
+        self.async_on_remove(self._async_stop_input_log)
 
         # Add listeners to track changes from the temp sensor
         if self._sensor_entity_id:
+            self._ingestion[self._sensor_entity_id] = SensorIngestion(
+                self.hass,
+                lambda value: self.hass.async_create_task(
+                    self._async_update_current_temp(value)
+                ),
+                self._sensor_deadband,
+                self._sensor_min_interval,
+            )
             self.async_on_remove(
                 async_track_state_change_event(
                     self.hass,
@@ -314,6 +397,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
 
         # Add listeners to track changes from the outdoor temp sensor
         if self._sensor_out_entity_id:
+            self._ingestion[self._sensor_out_entity_id] = SensorIngestion(
+                self.hass,
+                self._async_update_outdoor_temperature,
+                self._sensor_deadband,
+                self._sensor_min_interval,
+            )
             self.async_on_remove(
                 async_track_state_change_event(
                     self.hass,
@@ -322,17 +411,20 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 )
             )
 
-        # routine to check if state updates from sensor have stopped
-        if (
-            self._sensor_entity_id or self._sensor_out_entity_id
-        ) and self._sensor_stale_duration:
-            self.async_on_remove(
-                async_track_time_interval(
-                    self.hass,
-                    self._async_stale_sensor_check,
-                    self._sensor_stale_duration,
+        for ingestion in self._ingestion.values():
+            self.async_on_remove(ingestion.async_cancel)
+
+        # check if state updates from sensor have stopped
+        if self._sensor_stale_duration:
+            watchdog = async_get_watchdog(self.hass)
+            for entity_id in self._ingestion:
+                watch = watchdog.async_watch(
+                    entity_id,
+                    self._sensor_stale_duration.total_seconds(),
+                    self._async_stale_sensor,
                 )
-            )
+                self._sensor_watches[entity_id] = watch
+                self.async_on_remove(watch.async_cancel)
 
         # Add listeners to track changes from the hvac switches
         entity_list = []
@@ -347,68 +439,130 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             )
         )
 
+        if self.is_master:
+            # heating windows of all masters are balanced
+            satelites = set()
+            for mode_def in self._hvac_def.values():
+                if mode_def.is_hvac_master_mode:
+                    satelites.update(mode_def.get_satelites)
+            self.async_on_remove(
+                async_get_master_coordinator(self.hass).async_register(
+                    self.entity_id, satelites
+                )
+            )
+        else:
+            # master is known before its first satellite update
+            self.async_on_remove(
+                async_get_master_coordinator(self.hass).async_track_master(
+                    self.entity_id, self._async_set_master
+                )
+            )
+
+        # actuator commands of all thermostats are batched
+        self.async_on_remove(
+            async_get_command_queue(self.hass).async_register(
+                self.entity_id, *self._command_limits
+            )
+        )
+
         if self._passive_switch:
-            # run at night
-            async_track_time_change(
-                self.hass,
-                self._async_stuck_switch_check,
-                hour=self._passive_switch_time.hour,
-                minute=self._passive_switch_time.minute,
-                second=self._passive_switch_time.second,
+            # run at night, valves of all thermostats in one queue
+            self.async_on_remove(
+                async_get_exercise(self.hass).async_register(
+                    self,
+                    self._passive_switch_time,
+                    *self._passive_switch_limits,
+                )
             )
 
-        async def _async_startup(*_) -> None:
-            """Init on startup."""
-            self._logger.debug("Run start-up")
-            save_state = False
+        # controller and filter state to resume after restart
+        self._store = Store(
+            self.hass,
+            STORE_VERSION,
+            f"{DOMAIN}.{self.unique_id or self.entity_id}",
+        )
 
-            # read room temperature sensor
-            if self._sensor_entity_id:
-                sensor_state = self.hass.states.get(self._sensor_entity_id)
-            else:
-                sensor_state = None
+        # start-up of all thermostats is coordinated when Home Assistant starts
+        startup = async_get_startup(self.hass)
+        startup.async_register(self)
+        self.async_on_remove(lambda: startup.async_unregister(self))
+        if self.hass.state == CoreState.running or startup.started:
+            await self.async_startup()
+
+    async def async_startup(self) -> None:
+        """Init on startup."""
+        self._logger.debug("Run start-up")
+        save_state = False
+        stored = await self._store.async_load()
+        old_state = await self.async_get_last_state()
+        if not stored and old_state is not None:
+            # versions before the store kept the state in the attributes
+            self._logger.debug("no stored state, use attributes of old state")
+            stored = self._legacy_store_data(old_state)
+        stored = self._recent_store_data(stored or {})
+
+        # resume filter when stored state is recent
+        if (
+            self.filter_mode > 0
+            and (filter_state := stored.get("filter"))
+            and get_clock().time() - filter_state["last_update"] < STORE_MAX_AGE
+        ):
+            self._logger.debug("restore filter state from store")
+            self._restore_filter(filter_state)
 
-            # process room temperature
-            if sensor_state and sensor_state.state not in ERROR_STATE:
-                await self._async_update_current_temp(sensor_state.state)
-                save_state = True
+        # read room temperature sensor
+        if self._sensor_entity_id:
+            sensor_state = self.hass.states.get(self._sensor_entity_id)
+        else:
+            sensor_state = None
 
-            # check outdoor temperature
-            if self._sensor_out_entity_id:
-                sensor_state = self.hass.states.get(self._sensor_out_entity_id)
-            else:
-                sensor_state = None
+        # process room temperature
+        if sensor_state and sensor_state.state not in ERROR_STATE:
+            await self._async_update_current_temp(float(sensor_state.state))
+            save_state = True
 
-            # process outdoor temperature
-            if sensor_state and sensor_state.state not in ERROR_STATE:
-                self._async_update_outdoor_temperature(sensor_state.state)
-                save_state = True
+        # check outdoor temperature
+        if self._sensor_out_entity_id:
+            sensor_state = self.hass.states.get(self._sensor_out_entity_id)
+        else:
+            sensor_state = None
 
-            # sate the current state
-            if save_state:
-                self.async_write_ha_state()
+        # process outdoor temperature
+        if sensor_state and sensor_state.state not in ERROR_STATE:
+            self._async_update_outdoor_temperature(float(sensor_state.state))
+            save_state = True
 
-            # Check if we have an old state, if so, restore it
-            if (old_state := await self.async_get_last_state()) is not None:
-                if not self._enable_old_state:
-                    # init in case no restore is required
-                    if not self._hvac_mode_init:
-                        self._logger.warning(
-                            "no initial hvac mode specified: force off mode"
-                        )
-                        self._hvac_mode_init = HVACMode.OFF
-                    self._logger.info(
-                        "init default hvac mode: '%s'", self._hvac_mode_init
-                    )
-                else:
-                    self.restore_old_state(old_state)
+        # sate the current state
+        if save_state:
+            self.async_write_ha_state()
 
-            await self.async_set_hvac_mode(self._hvac_mode_init)
+        # Check if we have an old state, if so, restore it
+        if old_state is not None:
+            if not self._enable_old_state:
+                # init in case no restore is required
+                if not self._hvac_mode_init:
+                    self._logger.warning("no initial hvac mode specified: force off mode")
+                    self._hvac_mode_init = HVACMode.OFF
+                self._logger.info("init default hvac mode: '%s'", self._hvac_mode_init)
+            else:
+                self.restore_old_state(old_state)
 
-        if self.hass.state == CoreState.running:
-            await _async_startup()
-        else:
-            self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, _async_startup)
+        # resume controllers
+        for key, data in stored.get("hvac", {}).items():
+            if key in self._hvac_def:
+                self._hvac_def[key].restore_store(data, self._restore_integral)
+
+        await self.async_set_hvac_mode(self._hvac_mode_init)
+
+        # master resumes with last known satellite demand
+        if self.is_master and self._hvac_on and self._enable_old_state:
+            self._hvac_on.restore_satelite_table(
+                stored.get("hvac", {}).get(self._hvac_mode, {})
+            )
+
+        # nothing to control
+        if self._hvac_mode == HVACMode.OFF:
+            async_get_startup(self.hass).async_controlled(self)
 
     def restore_old_state(self, old_state) -> None:
         """Restore old state/config."""
@@ -460,7 +614,6 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                     self._hvac_def[key].restore_reboot(
                         data,
                         self._restore_parameters,
-                        self._restore_integral,
                     )
 
                 # Restore the target temperature`
@@ -497,24 +650,197 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 CONF_AREA: self._area,
                 ATTR_HVAC_DEFINITION: tmp_dict,
                 ATTR_EMERGENCY_MODE: self._emergency_stop,
+                ATTR_TIME_TO_CONTROL: async_get_startup(self.hass).time_to_control,
+                **self._detailed_attributes(),
             }
         # for satellite states
-        else:
-            return {
-                ATTR_EMERGENCY_MODE: self._emergency_stop,
-                ATTR_SELF_CONTROLLED: self._self_controlled,
-                ATTR_CURRENT_TEMP_VEL: self.current_temperature_velocity,
-                ATTR_CURRENT_OUTDOOR_TEMPERATURE: self.outdoor_temperature,
-                ATTR_FILTER_MODE: self.filter_mode,
-                CONF_AREA: self._area,
-                ATTR_HVAC_DEFINITION: tmp_dict,
+        attributes = {
+            ATTR_EMERGENCY_MODE: self._emergency_stop,
+            ATTR_SELF_CONTROLLED: self._self_controlled,
+            ATTR_CURRENT_TEMP_VEL: self.current_temperature_velocity,
+            ATTR_CURRENT_OUTDOOR_TEMPERATURE: self.outdoor_temperature,
+            ATTR_FILTER_MODE: self.filter_mode,
+            CONF_AREA: self._area,
+            ATTR_HVAC_DEFINITION: tmp_dict,
+            **self._detailed_attributes(),
+        }
+        if self._ingestion and self._detailed_output:
+            attributes[ATTR_SENSOR_INGESTION] = {
+                entity_id: dict(ingestion.counters)
+                for entity_id, ingestion in self._ingestion.items()
             }
+        return attributes
+
+    @property
+    def _detailed_output(self) -> bool:
+        """Detailed output active for any hvac mode."""
+        return any(data.detailed_output for data in self._hvac_def.values())
+
+    def _detailed_attributes(self) -> dict:
+        """Actuator, timer and trace statistics for detailed output."""
+        if not self._actuators or not self._detailed_output:
+            return {}
+        attributes = {
+            ATTR_ACTUATOR_COMMANDS: self._actuators.counters,
+            ATTR_SWITCHING_PLAN: {
+                **self._switching_plan.counters,
+                "edge_delay": self._switching_plan.delay_stats,
+            },
+        }
+        if self._tracer.enabled:
+            attributes[ATTR_CONTROL_TRACE] = self._tracer.percentiles()
+        if self._kf_temp:
+            attributes[ATTR_FILTER_REPAIRS] = self._kf_temp.factorization_repairs
+        if self.is_master:
+            attributes[ATTR_MASTER_COORDINATION] = async_get_master_coordinator(
+                self.hass
+            ).stats(self.entity_id)
+        return attributes
 
     def set_detailed_output(self, hvac_mode: HVACMode, new_mode: bool) -> None:
         """Configure attribute output level."""
         self._hvac_def[hvac_mode].detailed_output = new_mode
         self.schedule_update_ha_state()
 
+    @callback
+    def async_set_tracing(self, enabled: bool) -> None:
+        """Start or stop tracing of the control ticks."""
+        self._tracer.enable(enabled)
+        self._logger.info("tracing %s", "started" if enabled else "stopped")
+
+    async def async_dump_trace(self, count: int | None = None) -> dict:
+        """Stage time percentiles and recent spans of the control ticks."""
+        trace = {
+            "enabled": self._tracer.enabled,
+            "percentiles": self._tracer.percentiles(),
+            "spans": self._tracer.recent(count),
+        }
+        self._logger.info("trace: %s", trace)
+        return trace
+
+    async def async_dump_decisions(self, count: int | None = None) -> dict:
+        """Recent control decisions and switch commands."""
+        decisions = {"decisions": self._decisions.recent(count)}
+        self._logger.info("decisions: %s", decisions)
+        return decisions
+
+    @callback
+    def async_record_inputs(self, enabled: bool) -> None:
+        """Start or stop recording of the inputs for offline replay."""
+        if not enabled:
+            self._async_stop_input_log()
+            return
+        if self._input_log is not None:
+            return
+
+        self._input_log = InputRecorder(
+            self.hass,
+            self.hass.config.path(
+                f"{DOMAIN}_inputs_{self.entity_id.replace('.', '_')}.log"
+            ),
+        )
+        self._async_record_input(
+            "config",
+            name=self._attr_name,
+            area=self._area,
+            hvac_mode=self._hvac_mode,
+            modes={
+                hvac_mode: {
+                    "config": self._hvac_config[hvac_mode],
+                    "target": hvac_def.target_temperature,
+                    "integral": hvac_def.get_integral
+                    if hvac_def.is_prop_pid_mode
+                    else None,
+                }
+                for hvac_mode, hvac_def in self._hvac_def.items()
+            },
+        )
+        # current satelite states of master
+        if self.is_master and self._hvac_on:
+            for satelite in self._hvac_on.get_satelites:
+                if state := self.hass.states.get("climate." + satelite):
+                    self._async_record_input(
+                        "satelite",
+                        entity_id=state.entity_id,
+                        state=state.state,
+                        attributes=dict(state.attributes),
+                    )
+        self._logger.info("recording inputs to '%s'", self._input_log.path)
+
+    @callback
+    def _async_stop_input_log(self) -> None:
+        """Write remaining inputs and stop recording."""
+        if self._input_log is None:
+            return
+        self._input_log.async_flush()
+        self._logger.info(
+            "input recording stopped after %s entries", self._input_log.count
+        )
+        self._input_log = None
+
+    @callback
+    def _async_record_input(self, kind: str, **data) -> None:
+        """Add input to the input log when recording."""
+        if self._input_log is not None:
+            self._input_log.record(kind, data)
+
+    @callback
+    def _async_record_tick(self, routine: bool, force: bool, offset: float) -> None:
+        """Record the inputs of the controller calculation."""
+        self._input_log.record(
+            "controller",
+            {
+                "hvac_mode": self._hvac_mode,
+                "routine": routine,
+                "force": force,
+                "offset": offset,
+                "state": self._hvac_on.current_state,
+                "temperature": self._hvac_on.current_temperature,
+                "outdoor": self._hvac_on.outdoor_temperature,
+                "setpoint": self._hvac_on.target_temperature,
+                "time_offset": self._hvac_on.time_offset,
+                "master_delay": self._hvac_on.master_delay,
+            },
+        )
+
+    @callback
+    def _async_record_decision(self, satelite_info: dict | None) -> None:
+        """Record the outcome of the controller calculation."""
+        self._input_log.record(
+            "decision",
+            {
+                "nesting": self._hvac_on.nesting.stats.get("routine")
+                if self.is_master
+                else None,
+                "phase_shift": self._hvac_on.nesting.stats.get("phase_shift", 0)
+                if self.is_master
+                else None,
+                "satelites": satelite_info,
+                "values": self._hvac_on.get_decision_values,
+            },
+        )
+
+    @callback
+    def async_profile(self, ticks: int) -> None:
+        """Profile the next control and pwm ticks."""
+        path = self.hass.config.path(
+            f"{DOMAIN}_profile_{self.entity_id.replace('.', '_')}_"
+            f"{get_clock().now().strftime('%Y%m%d_%H%M%S')}.prof"
+        )
+        try:
+            self._profiler.start(ticks, path)
+        except RuntimeError as err:
+            raise HomeAssistantError(str(err)) from err
+        self._logger.info("profiling next %s ticks to '%s'", ticks, path)
+
+    @callback
+    def _async_end_profile_tick(self, profile) -> None:
+        """Close profiled tick, write stats after the last profiled tick."""
+        if (result := self._profiler.end_tick(profile)) is None:
+            return
+        self._logger.info("profiling finished, stats written to '%s'", result[1])
+        self.hass.async_add_executor_job(write_stats, *result)
+
     @callback
     def async_set_pwm_threshold(
         self, hvac_mode: HVACMode, new_threshold: float
@@ -523,6 +849,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self._logger.info(
             "new minimum for pwm scale for '%s' to: '%s'", hvac_mode, new_threshold
         )
+        self._async_record_input(
+            "service",
+            service="set_pwm_threshold",
+            hvac_mode=hvac_mode,
+            new_threshold=new_threshold,
+        )
         self._hvac_def[hvac_mode].set_pwm_threshold(new_threshold)
         self.schedule_update_ha_state()
 
@@ -537,6 +869,15 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
     ) -> None:  # pylint: disable=invalid-name
         """Set new PID Controller Kp,Ki,Kd value."""
         self._logger.info("new PID for '%s' to: %s;%s;%s", hvac_mode, kp, ki, kd)
+        self._async_record_input(
+            "service",
+            service="set_pid",
+            hvac_mode=hvac_mode,
+            kp=kp,
+            ki=ki,
+            kd=kd,
+            update=update,
+        )
         self._hvac_def[hvac_mode].set_pid_param(kp=kp, ki=ki, kd=kd, update=update)
         self.schedule_update_ha_state()
 
@@ -545,6 +886,73 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self.set_filter_mode(mode)
         self.schedule_update_ha_state()
 
+    def _restore_filter(self, state: dict) -> None:
+        """Create filter from stored state."""
+        from .UKF_config import UKFFilter  # pylint: disable=import-outside-toplevel
+
+        self._kf_temp = UKFFilter(state["x"][0], 60, self.filter_mode)
+        self._kf_temp.set_state(state)
+
+    def _legacy_store_data(self, old_state) -> dict:
+        """Store data from the state attributes of versions without store."""
+        last_update = old_state.last_updated.timestamp()
+        hvac = {}
+        for key, data in old_state.attributes.get(ATTR_HVAC_DEFINITION, {}).items():
+            integral = data.get("PID_integral", data.get("PID_I"))
+            hvac[key] = {} if integral is None else {"PID_integral": integral}
+        stored = {"hvac": hvac, "last_update": last_update}
+
+        # filter state follows from the filtered temperature and velocity
+        temperature = old_state.attributes.get(ATTR_CURRENT_TEMPERATURE)
+        velocity = old_state.attributes.get(ATTR_CURRENT_TEMP_VEL)
+        if isinstance(temperature, (int, float)) and isinstance(
+            velocity, (int, float)
+        ):
+            stored["filter"] = {
+                "x": [float(temperature), float(velocity)],
+                "last_update": last_update,
+            }
+        return stored
+
+    def _recent_store_data(self, stored: dict) -> dict:
+        """Drop stored controller state older than the store age limit.
+
+        the switch history is always kept for the passive switch check
+        """
+        last_update = stored.get("last_update")
+        if last_update is None or get_clock().time() - last_update < STORE_MAX_AGE:
+            return stored
+        self._logger.debug("stored state outdated, restore switch history only")
+        return {
+            "hvac": {
+                key: {
+                    name: value
+                    for name, value in data.items()
+                    if name == ATTR_LAST_SWITCH_CHANGE
+                }
+                for key, data in stored.get("hvac", {}).items()
+            }
+        }
+
+    @callback
+    def _async_schedule_store(self) -> None:
+        """Save controller and filter state, writes within delay are combined."""
+        if self._store is not None:
+            self._store.async_delay_save(self._store_data, STORE_SAVE_DELAY)
+
+    def _store_data(self) -> dict:
+        """Controller and filter state to resume after restart."""
+        data = {
+            "hvac": {
+                hvac_mode: hvac_def.get_store_data()
+                for hvac_mode, hvac_def in self._hvac_def.items()
+            },
+            "last_update": get_clock().time(),
+        }
+        if self._kf_temp:
+            data["filter"] = self._kf_temp.get_state()
+        return data
+
     def set_filter_mode(self, mode: int) -> None:
         """Set new filter for the temp sensor."""
         self._filter_mode = mode
@@ -563,7 +971,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             # init ukf when mode from 0 to >0
             if not self._kf_temp:
                 if self._current_temperature is not None:
-                    self._kf_temp = UKF_config.UKFFilter(
+                    # filter (numpy) is only loaded when a filter is configured
+                    from .UKF_config import (  # pylint: disable=import-outside-toplevel
+                        UKFFilter,
+                    )
+
+                    self._kf_temp = UKFFilter(
                         self._current_temperature,
                         cycle_time,
                         self.filter_mode,
@@ -610,6 +1023,9 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
     def async_set_integral(self, hvac_mode: HVACMode, integral: float) -> None:
         """Set new PID Controller integral value."""
         self._logger.info("new PID integral for '%s' to: '%s'", hvac_mode, integral)
+        self._async_record_input(
+            "service", service="set_integral", hvac_mode=hvac_mode, integral=integral
+        )
         self._hvac_def[hvac_mode].set_integral(integral)
         self.schedule_update_ha_state()
 
@@ -619,9 +1035,17 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
     ) -> None:  # pylint: disable=invalid-name
         """Set new weather Controller ka,kb value."""
         self._logger.info("new weatehr ka,kb '%s' to: %s;%s", hvac_mode, ka, kb)
+        self._async_record_input(
+            "service", service="set_ka_kb", hvac_mode=hvac_mode, ka=ka, kb=kb
+        )
         self._hvac_def[hvac_mode].set_ka_kb(ka=ka, kb=kb)
         self.schedule_update_ha_state()
 
+    @callback
+    def _async_set_master(self, master_entity_id: str) -> None:
+        """Set master which controls the thermostat as satellite."""
+        self._master_entity_id = master_entity_id
+
     @callback
     def async_set_satelite_mode(
         self,
@@ -630,17 +1054,27 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         sat_id: int = 0,
         pwm_start_time: float = 0,
         master_delay: float = 0,
+        master_entity_id: str | None = None,
     ) -> None:
         """Satellite update from master.
 
         Originates from master to control satellite routines
         control_mode 'no_change' to only update offset.
         """
+        if master_entity_id is not None:
+            self._master_entity_id = master_entity_id
         pwm_loop = False
         # mod controller update
         self._logger.info(
             "sat update received for mode:'%s'; offset:'%s'", control_mode, offset
         )
+        self._async_record_input(
+            "service",
+            service="set_satelite_mode",
+            control_mode=control_mode,
+            offset=offset,
+            master_delay=master_delay,
+        )
 
         # no current and no previous thus return
         if self._old_mode == HVACMode.OFF and self._hvac_on is None:
@@ -660,11 +1094,14 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         if offset is not None:
             if self.control_output[ATTR_CONTROL_OFFSET] != offset:
                 self._hvac_on.time_offset = offset
-                self.control_output[ATTR_CONTROL_OFFSET] = offset
+                self.control_output = {
+                    **self.control_output,
+                    ATTR_CONTROL_OFFSET: offset,
+                }
             pwm_loop = True
         else:
             self._hvac_on.time_offset = 0
-            self.control_output[ATTR_CONTROL_OFFSET] = 0
+            self.control_output = {**self.control_output, ATTR_CONTROL_OFFSET: 0}
             pwm_loop = True
 
         # turn thermostat to self controlled
@@ -681,22 +1118,22 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             # cancel scheduled switch routines
             self._async_cancel_pwm_routines()
             # include pwm routine
-            self._pwm_start_time = time.time() + CONTROL_START_DELAY
+            self._pwm_start_time = get_clock().time() + CONTROL_START_DELAY
 
             # start controller loop
-            async_track_point_in_utc_time(
+            get_clock().async_track_point_in_time(
                 self.hass,
                 self.async_routine_controller_factory(
                     self._hvac_on.get_operate_cycle_time
                 ),
-                datetime.datetime.fromtimestamp(self._pwm_start_time),
+                self._pwm_start_time,
             )
 
             # start pwm loop
-            async_track_point_in_utc_time(
+            get_clock().async_track_point_in_time(
                 self.hass,
                 self.async_routine_pwm_factory(self._hvac_on.get_pwm_time),
-                datetime.datetime.fromtimestamp(self._pwm_start_time + PWM_LAG),
+                self._pwm_start_time + PWM_LAG,
             )
 
         # activate satellite mode
@@ -724,16 +1161,14 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 self._async_cancel_pwm_routines()
 
                 # schedule controller loop in sync with master
-                async_track_point_in_utc_time(
+                get_clock().async_track_point_in_time(
                     self.hass,
                     self.async_routine_controller_factory(
                         self._hvac_on.get_operate_cycle_time
                     ),
-                    datetime.datetime.fromtimestamp(
-                        self._pwm_start_time  # master control loop
-                        - sat_id * SAT_CONTROL_LEAD  # create some time inbetween sats
-                        - MASTER_CONTROL_LEAD  # sat control loop before master
-                    ),
+                    self._pwm_start_time  # master control loop
+                    - sat_id * SAT_CONTROL_LEAD  # create some time inbetween sats
+                    - MASTER_CONTROL_LEAD,  # sat control loop before master
                 )
                 # no pwm loop after master change wait for new offsets
                 pwm_loop = False
@@ -775,6 +1210,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             return
 
         self._hvac_on.target_temperature = round(temperature, 3)
+        self._async_record_input(
+            "service",
+            service="set_temperature",
+            hvac_mode=hvac_mode,
+            temperature=self._hvac_on.target_temperature,
+        )
 
         # operate in all cases except off
         if self._hvac_mode != HVACMode.OFF:
@@ -783,8 +1224,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self.async_write_ha_state()
 
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
-        """Change hvac mode."""
-        async with self._temp_lock:
+        """Change hvac mode.
+
+        waits for a running pwm tick, a running controller tick drops its
+        result when the mode changed
+        """
+        async with self._temp_lock, self._pwm_lock:
             # No changes have been made
             if self._hvac_mode == hvac_mode:
                 return
@@ -795,6 +1240,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 return
 
             self._logger.info("HVAC mode changed to '%s'", hvac_mode)
+            self._async_record_input("hvac_mode", hvac_mode=hvac_mode)
 
             # cancel active routines
             if self._hvac_on:
@@ -850,7 +1296,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
 
             # reset time stamp pid to avoid integral run-off
             if self._hvac_on.is_prop_pid_mode:
-                self.time_changed = time.time()
+                self.time_changed = get_clock().time()
                 self._hvac_on.pid_reset_time()
 
             # start listening for outdoor sensors
@@ -882,7 +1328,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
 
             # proportional or master start-up
             elif self.is_master or self._hvac_on.is_hvac_proportional_mode:
-                self._pwm_start_time = time.time()
+                self._pwm_start_time = get_clock().time()
                 if self.is_master:
                     self._pwm_start_time += CONTROL_START_DELAY
 
@@ -904,20 +1350,20 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                     )
 
                 # run controller before pwm loop
-                async_track_point_in_utc_time(
+                get_clock().async_track_point_in_time(
                     self.hass,
                     self.async_routine_controller_factory(
                         self._hvac_on.get_operate_cycle_time
                     ),
-                    datetime.datetime.fromtimestamp(self._pwm_start_time),
+                    self._pwm_start_time,
                 )
 
                 # run pwm just after controller
                 if self._hvac_on.get_pwm_time:
-                    async_track_point_in_utc_time(
+                    get_clock().async_track_point_in_time(
                         self.hass,
                         self.async_routine_pwm_factory(self._hvac_on.get_pwm_time),
-                        datetime.datetime.fromtimestamp(self._pwm_start_time + PWM_LAG),
+                        self._pwm_start_time + PWM_LAG,
                     )
 
             # Ensure we update the current operation after changing the mode
@@ -951,7 +1397,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
 
         if interval and self._loop_controller is None:
             self._logger.debug("Define new control loop")
-            self._loop_controller = async_track_time_interval(
+            self._loop_controller = get_clock().async_track_time_interval(
                 self.hass, self._async_controller, interval
             )
             self.async_on_remove(self._loop_controller)
@@ -991,7 +1437,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 # no routine needed for proportional valve
                 return
 
-            self._loop_pwm = async_track_time_interval(
+            self._loop_pwm = get_clock().async_track_time_interval(
                 self.hass, self._async_controller_pwm, interval
             )
             self.hass.async_create_task(self._async_controller_pwm())
@@ -1017,153 +1463,146 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
     def _async_indoor_temp_change(self, event: Event[EventStateChangedData]) -> None:
         """Handle temperature change.
 
-        Only call emergency stop due to stale sensor, ignore invalid values
+        Only call emergency stop due to stale sensor, ignore invalid values.
+        Valid values pass the sensor ingestion to drop duplicates.
         """
         new_state = event.data.get("new_state")
-        self._logger.debug("New sensor temperature '%s'", new_state.state)
+        ingestion = self._ingestion[self._sensor_entity_id]
 
         if new_state is None or new_state.state in ERROR_STATE:
             self._logger.warning(
                 "Sensor temperature %s invalid: %s, skip current state",
-                new_state.name,
-                new_state.state,
+                self._sensor_entity_id,
+                new_state.state if new_state else None,
             )
+            ingestion.async_invalid()
             return
-        elif not is_float(new_state.state):
+        try:
+            value = float(new_state.state)
+        except (TypeError, ValueError):
             self._logger.warning(
                 "Sensor temperature %s unclear: %s type %s, skip current state",
                 new_state.name,
                 new_state.state,
                 type(new_state.state),
             )
+            ingestion.async_invalid()
             return
-        elif float(new_state.state) < -50 or float(new_state.state) > 50:
+        if value < -50 or value > 50:
             self._logger.warning(
                 "Sensor temperature %s unrealistic: %s, skip current state",
                 new_state.name,
                 new_state.state,
             )
+            ingestion.async_invalid()
             return
-        elif self.preset_mode == PRESET_EMERGENCY:
+
+        self._async_record_input("sensor", entity_id=new_state.entity_id, value=value)
+        if watch := self._sensor_watches.get(self._sensor_entity_id):
+            watch.async_feed()
+        if self.preset_mode == PRESET_EMERGENCY:
             self._async_restore_emergency_stop(self._sensor_entity_id)
 
-        self.hass.async_create_task(self._async_update_current_temp(new_state.state))
+        ingestion.async_process(value)
 
     @callback
     def _async_outdoor_temp_change(self, event: Event[EventStateChangedData]) -> None:
         """Handle outdoor temperature changes.
 
-        Only call emergency stop due to stale sensor, ignore invalid values
+        Only call emergency stop due to stale sensor, ignore invalid values.
+        Valid values pass the sensor ingestion to drop duplicates.
         """
         new_state = event.data.get("new_state")
-        self._logger.debug("New sensor outdoor temperature '%s'", new_state.state)
+        ingestion = self._ingestion[self._sensor_out_entity_id]
+
         if new_state is None or new_state.state in ERROR_STATE:
             self._logger.debug(
                 "Outdoor sensor temperature %s invalid %s, skip current state",
-                new_state.name,
-                new_state.state,
+                self._sensor_out_entity_id,
+                new_state.state if new_state else None,
             )
+            ingestion.async_invalid()
             return
-        elif not is_float(new_state.state):
+        try:
+            value = float(new_state.state)
+        except (TypeError, ValueError):
             self._logger.warning(
                 "Outdoor sensor temperature %s unclear: %s type %s, skip current state",
                 new_state.name,
                 new_state.state,
                 type(new_state.state),
             )
+            ingestion.async_invalid()
             return
-        elif self.preset_mode == PRESET_EMERGENCY:
+
+        self._async_record_input("sensor", entity_id=new_state.entity_id, value=value)
+        if watch := self._sensor_watches.get(self._sensor_out_entity_id):
+            watch.async_feed()
+        if self.preset_mode == PRESET_EMERGENCY:
             self._async_restore_emergency_stop(self._sensor_out_entity_id)
 
-        self._async_update_outdoor_temperature(new_state.state)
+        ingestion.async_process(value)
 
     @callback
-    def _async_stale_sensor_check(self, now: datetime.datetime | None = None) -> None:
-        """Check if the sensor has emitted a value during the allowed stale period."""
-        entity_list = []
-        if self._sensor_entity_id:
-            entity_list.append(self._sensor_entity_id)
-        if self._sensor_out_entity_id:
-            entity_list.append(self._sensor_out_entity_id)
-
-        # check all sensors
-        for entity_id in entity_list:
-            sensor_state = self.hass.states.get(entity_id)
-            if (
-                datetime.datetime.now(datetime.UTC) - sensor_state.last_updated
-                > self._sensor_stale_duration
-            ):
-                self._logger.debug(
-                    "'%s' last received update is %s, duration is '%s', limit is '%s'",
-                    entity_id,
-                    sensor_state.last_updated,
-                    datetime.datetime.now(datetime.UTC) - sensor_state.last_updated,
-                    self._sensor_stale_duration,
-                )
-
-                self._async_activate_emergency_stop("stale sensor", sensor=entity_id)
+    def _async_stale_sensor(self, entity_id: str) -> None:
+        """Sensor has not emitted a value during the allowed stale period."""
+        self._logger.debug(
+            "'%s' no update received within '%s'",
+            entity_id,
+            self._sensor_stale_duration,
+        )
+        self._async_activate_emergency_stop("stale sensor", sensor=entity_id)
 
-    @callback
-    def _async_stuck_switch_check(self, now) -> None:
-        """Check if the switch has not changed for a certain period and force operation to avoid stuck or jammed."""
+    def exercise_due(self) -> list:
+        """Hvac modes with a switch not operated for its passive duration.
 
+        switches are not exercised while the thermostat or its master is
+        in operation
+        """
         # operated by master and check if currently active
-        if self._self_controlled != OperationMode.SELF:
-            master_mode = state_attr(
-                # self.hass, "climate." + self._self_controlled, "hvac_action"
-                self.hass,
-                "climate.master",
-                "hvac_action",
-            )
+        if self._self_controlled != OperationMode.SELF and self._master_entity_id:
+            master_mode = state_attr(self.hass, self._master_entity_id, "hvac_action")
 
             # cancel when master in operation
             if master_mode in [HVACAction.HEATING, HVACAction.COOLING]:
-                return
+                return []
 
         # check if thermostat is in operation
         if self._hvac_on and self._is_valve_open():
-            return
+            return []
 
-        # get data of all switches
-        entity_list = {}
+        due = []
         for hvac_mode, mode_config in self._hvac_def.items():
-            if mode_config.get_switch_stale:
-                entity_list[hvac_mode] = [
-                    mode_config.get_hvac_switch,
-                    mode_config.get_switch_stale,
-                    mode_config.switch_last_change,
-                ]
+            if not mode_config.get_switch_stale:
+                continue
+            if self._switch_moved_recently(hvac_mode):
+                continue
+            self._logger.info(
+                "Switch '%s' stuck prevention activated: not changed state for '%s'",
+                mode_config.get_hvac_switch,
+                get_clock().now() - mode_config.switch_last_change,
+            )
+            due.append(hvac_mode)
 
-        if not entity_list:
+        if not any(data.get_switch_stale for data in self._hvac_def.values()):
             self._logger.warning(
                 "jamming/stuck prevention activated but no duration set for switches"
             )
-            return
-
-        # check each switch
-        for hvac_mode, data in entity_list.items():
-            # check if switch activated emergency mode
-            if data[0] in self._emergency_stop:
-                return
-
-            self._logger.debug(
-                "Switch '%s' stuck prevention check with last update '%s'",
-                data[0],
-                data[2],
-            )
+        return due
 
-            # check if too long not operated
-            if datetime.datetime.now(datetime.UTC) - data[2] > data[1]:
-                self._logger.info(
-                    "Switch '%s' stuck prevention activated: not changed state for '%s'",
-                    data[0],
-                    datetime.datetime.now(datetime.UTC) - data[2],
-                )
-
-                # run short operation of switch
-                self.hass.async_create_task(
-                    self._async_toggle_switch(hvac_mode, data[0])
-                )
+    def _switch_moved_recently(self, hvac_mode: HVACMode) -> bool:
+        """Switch operated within passive duration or in emergency."""
+        mode_config = self._hvac_def[hvac_mode]
+        self._logger.debug(
+            "Switch '%s' stuck prevention check with last update '%s'",
+            mode_config.get_hvac_switch,
+            mode_config.switch_last_change,
+        )
+        return (
+            mode_config.get_hvac_switch in self._emergency_stop
+            or get_clock().now() - mode_config.switch_last_change
+            <= mode_config.get_switch_stale
+        )
 
     @callback
     def _async_satelite_change(self, event: Event[EventStateChangedData]) -> None:
@@ -1172,9 +1611,16 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         if not new_state:
             self._logger.error("Error receiving thermostat update. 'None' received")
             return
-        self._logger.debug(
-            "Receiving update from '%s'",
-            new_state.name,
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(
+                "Receiving update from '%s'",
+                new_state.name,
+            )
+        self._async_record_input(
+            "satelite",
+            entity_id=new_state.entity_id,
+            state=new_state.state,
+            attributes=dict(new_state.attributes),
         )
 
         # check if stuck loop is triggered
@@ -1215,6 +1661,9 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         """Handle device switch state changes."""
         new_state = event.data.get("new_state")
         entity_id = event.data.get(ATTR_ENTITY_ID)
+        self._actuators.async_observe(
+            entity_id, new_state.state if new_state else None
+        )
         self._logger.debug(
             "'%s' switch changed to '%s'",
             entity_id,
@@ -1283,10 +1732,10 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self, current_temp: float | None = None
     ) -> None:
         """Update thermostat, optionally with latest state from sensor."""
-        if current_temp:
+        if current_temp is not None:
             self._logger.debug("Room temperature updated to '%s'", current_temp)
             # store local in case current hvac mode is off
-            self._current_temperature = float(current_temp)
+            self._current_temperature = current_temp
 
             # setup filter after first temp reading
             if not self._kf_temp and self.filter_mode > 0:
@@ -1295,14 +1744,14 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         # update ukf filter
         if self._kf_temp:
             self._kf_temp.kf_predict()
-            if current_temp:
-                tmp_temperature = float(current_temp)
+            if current_temp is not None:
+                tmp_temperature = current_temp
             elif self._current_temperature is not None:
                 tmp_temperature = self._current_temperature
             else:
                 tmp_temperature = None
 
-            if tmp_temperature:
+            if tmp_temperature is not None:
                 self._kf_temp.kf_update(tmp_temperature)
 
             self._logger.debug(
@@ -1313,7 +1762,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         if self._hvac_on is not None and self._hvac_on.is_hvac_on_off_mode:
             self.hass.async_create_task(self._async_controller())
 
-        if current_temp:
+        if current_temp is not None:
             self.async_write_ha_state()  # called from controller thus not needed here
 
     @callback
@@ -1321,9 +1770,9 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self, current_temp: float | None = None
     ) -> None:
         """Update thermostat with latest state from outdoor sensor."""
-        if current_temp:
+        if current_temp is not None:
             self._logger.debug("Outdoor temperature updated to '%s'", current_temp)
-            self._outdoor_temperature = float(current_temp)
+            self._outdoor_temperature = current_temp
             if self._hvac_on:
                 self._hvac_on.outdoor_temperature = self._outdoor_temperature
 
@@ -1356,6 +1805,21 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                     sat_id = 0
                     delay = 0
 
+                # start-up: sync all satellites in a single pass
+                startup = async_get_startup(self.hass)
+                if startup.starting and (
+                    sat_entity := startup.get_entity("climate." + satelite)
+                ):
+                    sat_entity.async_set_satelite_mode(
+                        control_mode,
+                        offset,
+                        sat_id=sat_id,
+                        pwm_start_time=self._pwm_start_time,
+                        master_delay=delay,
+                        master_entity_id=self.entity_id,
+                    )
+                    continue
+
                 # create tasks to update
                 self.hass.async_create_task(
                     self._async_send_satelite_data(
@@ -1396,6 +1860,7 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
                 "sat_id": sat_id,
                 "pwm_start_time": pwm_start_time,
                 "master_delay": master_delay,
+                ATTR_MASTER_ENTITY_ID: self.entity_id,
             },
             context=self._context,
             # blocking=False,
@@ -1442,15 +1907,15 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         '_pwm_start_time refers' to start of current pwm cycle.
         """
         pwm_duration = self._hvac_on.get_pwm_time.seconds
-        # if time.time() > self._pwm_start_time + pwm_duration:
-        while time.time() > self._pwm_start_time + pwm_duration:
+        # if get_clock().time() > self._pwm_start_time + pwm_duration:
+        while get_clock().time() > self._pwm_start_time + pwm_duration:
             self._pwm_start_time += pwm_duration
 
     @property
     def pwm_controller_time(self) -> bool:
         """Check if pwm loop is to be started soon."""
         next_pwm_loop = self._pwm_start_time
-        now = time.time()
+        now = get_clock().time()
         time_diff = now - next_pwm_loop
 
         if time_diff > 0 and time_diff < 1:
@@ -1488,296 +1953,378 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         self, now: datetime.datetime | None = None, force: bool = False
     ) -> None:
         """Check if we need to turn heating on or off."""
-        async with self._temp_lock:
-            # now is passed by to the callback the async_track_time_interval function , and is set to "now"
-            routine = now is not None  # boolean
-
-            self._logger.debug(
-                "Controller: calculate output, routine=%s; forced=%s", routine, force
+        lock_request = time.perf_counter()
+        async with self._control_lock:
+            span = self._tracer.start(
+                "controller", time.perf_counter() - lock_request
             )
+            profile = None
+            try:
+                profile = self._profiler.start_tick()
+                # now is passed by to the callback the async_track_time_interval function , and is set to "now"
+                routine = now is not None  # boolean
 
-            # do not run when not in sync with master
-            if self._self_controlled == OperationMode.PENDING:
-                self._logger.debug("Controller cancelled due to 'pending mode'")
-                if await self._async_check_emergency():
-                    return
-
-            # check emergency mode
-            if self.preset_mode == PRESET_EMERGENCY:
-                if not self._emergency_stop:
-                    self._async_restore_emergency_stop("")
-                self._logger.debug("Controller cancelled due to 'emergency mode'")
-                return
-
-            # routine should not be called when thermostat is off
-            if not self._hvac_on:
-                self._logger.warning(
-                    "Control update should not be activate when hvac  mode is 'off', exit routine"
+                self._logger.debug(
+                    "Controller: calculate output, routine=%s; forced=%s",
+                    routine,
+                    force,
                 )
-                return
 
-            # update and check current temperatures for pwm cycle
-            if routine and not self.is_master:
-                await self._async_update_current_temp()
+                # do not run when not in sync with master
+                if self._self_controlled == OperationMode.PENDING:
+                    self._logger.debug("Controller cancelled due to 'pending mode'")
+                    if await self._async_check_emergency():
+                        return
 
-            # send temperature to controller
-            if not self.is_master:
-                await self._async_update_controller_temp()
+                # check emergency mode
+                if self.preset_mode == PRESET_EMERGENCY:
+                    if not self._emergency_stop:
+                        self._async_restore_emergency_stop("")
+                    self._logger.debug("Controller cancelled due to 'emergency mode'")
+                    return
 
-            # cancel whne no sensor readings are present
-            if (
-                self._hvac_on.is_hvac_on_off_mode
-                or self._hvac_on.is_hvac_proportional_mode
-            ):
-                if self._sensor_entity_id and self._hvac_on.current_temperature is None:
+                # routine should not be called when thermostat is off
+                if not self._hvac_on:
                     self._logger.warning(
-                        "cancel control loop: current temp is None while running controller routine."
+                        "Control update should not be activate when hvac  mode is 'off', exit routine"
                     )
                     return
+                hvac_on = self._hvac_on
+
+                # update and check current temperatures for pwm cycle
+                if routine and not self.is_master:
+                    await self._async_update_current_temp()
+
+                # send temperature to controller
+                if not self.is_master:
+                    await self._async_update_controller_temp()
+                self._tracer.lap(span, "temperature")
+                if self._hvac_on is not hvac_on:
+                    self._logger.debug("hvac mode changed, controller tick stopped")
+                    return
 
-            # cancel when no outdoor reading
-            if self._hvac_on.is_wc_mode:
-                if self._sensor_out_entity_id and (
-                    self._hvac_on.outdoor_temperature is None
-                    or self._hvac_on.target_temperature is None
+                # cancel whne no sensor readings are present
+                if (
+                    hvac_on.is_hvac_on_off_mode
+                    or hvac_on.is_hvac_proportional_mode
                 ):
-                    self._logger.warning(
-                        "cancel control loop: current outdoor temp is '%s' and setpoint is '%s' cannot run weather mode",
-                        self._hvac_on.outdoor_temperature,
-                        self._hvac_on.target_temperature,
-                    )
-                    return
+                    if (
+                        self._sensor_entity_id
+                        and hvac_on.current_temperature is None
+                    ):
+                        self._logger.warning(
+                            "cancel control loop: current temp is None while running controller routine."
+                        )
+                        return
 
-            # for mode on_off
-            if self._hvac_on.is_hvac_on_off_mode:
-                if not await self._async_check_duration(routine, force):
-                    return
+                # cancel when no outdoor reading
+                if hvac_on.is_wc_mode:
+                    if self._sensor_out_entity_id and (
+                        hvac_on.outdoor_temperature is None
+                        or hvac_on.target_temperature is None
+                    ):
+                        self._logger.warning(
+                            "cancel control loop: current outdoor temp is '%s' and setpoint is '%s' cannot run weather mode",
+                            hvac_on.outdoor_temperature,
+                            hvac_on.target_temperature,
+                        )
+                        return
 
-            # determine point in time of current pwm loop
-            if self._hvac_on.get_pwm_time.seconds:
-                offset = (
-                    time.time() - self._pwm_start_time
-                ) / self._hvac_on.get_pwm_time.seconds
-            else:
-                offset = 0
+                # for mode on_off
+                if hvac_on.is_hvac_on_off_mode:
+                    if not await self._async_check_duration(routine, force):
+                        return
 
-            if (
-                self.is_master
-                and routine is None
-                and self._hvac_on.close_to_routine(offset)
-            ):
-                # too close to routine, do not include satellite changes
-                return
+                # determine point in time of current pwm loop
+                if hvac_on.get_pwm_time.seconds:
+                    offset = (
+                        get_clock().time() - self._pwm_start_time
+                    ) / hvac_on.get_pwm_time.seconds
+                else:
+                    offset = 0
 
-            # calculate actual pwm
-            self._hvac_on.calculate(routine=routine, force=force, current_offset=offset)
+                if (
+                    self.is_master
+                    and routine is None
+                    and hvac_on.close_to_routine(offset)
+                ):
+                    # too close to routine, do not include satellite changes
+                    return
 
-            # update satellites
-            if self.is_master:
-                # set offsets at satelites
-                satelite_info = self._hvac_on.get_satelite_offset()
-                self._async_change_satelite_modes(satelite_info)
+                # calculate actual pwm
+                self._tracer.lap(span, "checks")
+                if self._input_log is not None:
+                    self._async_record_tick(routine, force, offset)
+                tick_start = time.perf_counter()
+                if self.is_master and routine:
+                    offloaded = await self._async_nest_satelites(hvac_on)
+                    if offloaded is None:
+                        self._logger.debug(
+                            "hvac mode changed, nesting result dropped"
+                        )
+                        return
+                else:
+                    offloaded = 0
+                    hvac_on.calculate(
+                        routine=routine, force=force, current_offset=offset
+                    )
+                if self.is_master:
+                    hvac_on.loop_blocking = round(
+                        time.perf_counter() - tick_start - offloaded, 4
+                    )
+                self._tracer.add(span, "nesting_executor", offloaded)
+                self._tracer.lap(span, "calculate")
 
-            # get controller output
-            self._hvac_on.calc_control_output()
-            self.control_output = self._hvac_on.get_control_output
-            self._logger.debug(
-                "Obtained current control output: '%s'", self.control_output
-            )
+                # result of previous hvac mode is not published
+                if self._hvac_on is not hvac_on:
+                    self._logger.debug("hvac mode changed, controller output dropped")
+                    return
 
-            # check if pwm loop needs update
-            if (
-                force  # forced run
-                or self._hvac_on.is_hvac_on_off_mode  # hysteris
-                or (
-                    (self._hvac_on.is_hvac_proportional_mode or self.is_master)
-                    and not self._hvac_on.get_pwm_time  # proportional valve
+                # update satellites
+                satelite_info = None
+                if self.is_master:
+                    # set offsets at satelites
+                    satelite_info = self._hvac_on.get_satelite_offset()
+                    self._async_change_satelite_modes(satelite_info)
+                    self._tracer.lap(span, "dispatch")
+
+                # get controller output
+                self._hvac_on.calc_control_output()
+                # publish new output, pwm ticks read it without lock
+                self.control_output = dict(self._hvac_on.get_control_output)
+                self._decisions.record(
+                    DECISION_CONTROL, **self._hvac_on.get_decision_values
                 )
-                # or (routine and self.is_master)  # master routine cycle
-            ):
-                self._logger.debug(
-                    "Running pwm controller from control loop with 'force=%s'", force
+                if self._input_log is not None:
+                    self._async_record_decision(satelite_info)
+                if self._logger.isEnabledFor(logging.DEBUG):
+                    self._logger.debug(
+                        "Obtained current control output: '%s'", self.control_output
+                    )
+                self._tracer.lap(span, "control_output")
+
+                # check if pwm loop needs update
+                if (
+                    force  # forced run
+                    or self._hvac_on.is_hvac_on_off_mode  # hysteris
+                    or (
+                        (self._hvac_on.is_hvac_proportional_mode or self.is_master)
+                        and not self._hvac_on.get_pwm_time  # proportional valve
+                    )
+                    # or (routine and self.is_master)  # master routine cycle
+                ):
+                    self._logger.debug(
+                        "Running pwm controller from control loop with 'force=%s'",
+                        force,
+                    )
+                    self.hass.async_create_task(self._async_controller_pwm(force=force))
+
+                self._async_schedule_store()
+
+                if self._hvac_on.is_hvac_switch_on_off:
+                    self.async_write_ha_state()
+            finally:
+                self._async_end_profile_tick(profile)
+                self._tracer.finish(span, "schedule")
+                if self._input_log is not None:
+                    self._input_log.async_flush()
+
+    async def _async_nest_satelites(
+        self, hvac_on: hvac_setting.HVACSetting
+    ) -> float | None:
+        """Run nesting in executor on a snapshot of the satelite data.
+
+        when the deadline is passed the previous nesting is kept and updated,
+        no new run is started while an overrun run is still in the executor
+        returns time spent in executor, None when the hvac mode changed
+        in the meantime
+        """
+        start_time = time.perf_counter()
+        if self._nesting_job is not None and not self._nesting_job.done():
+            self._logger.warning(
+                "Previous nesting run still busy, previous nesting is used"
+            )
+            nesting = None
+        else:
+            nesting, satelites = hvac_on.nesting_snapshot()
+            self._nesting_job = self.hass.async_add_executor_job(
+                nesting.nest_routine, satelites
+            )
+            try:
+                # shielded: an overrun run is kept as in-flight job
+                await asyncio.wait_for(
+                    asyncio.shield(self._nesting_job), NESTING_EXECUTOR_DEADLINE
+                )
+            except asyncio.TimeoutError:
+                self._logger.warning(
+                    "Nesting not finished within %s sec, previous nesting is used",
+                    NESTING_EXECUTOR_DEADLINE,
                 )
-                self.hass.async_create_task(self._async_controller_pwm(force=force))
+                nesting = None
+        offloaded = time.perf_counter() - start_time
+        if self._hvac_on is not hvac_on:
+            return None
 
-            if self._hvac_on.is_hvac_switch_on_off:
-                self.async_write_ha_state()
+        hvac_on.apply_nesting(nesting, coordinate=self._async_coordinate_nesting)
+        return offloaded
+
+    @callback
+    def _async_coordinate_nesting(self, window: dict) -> float:
+        """Shift of the heating window balanced with the other masters.
+
+        window and shift as fraction of the pwm loop
+        """
+        duration = self._hvac_on.get_pwm_time.seconds
+        if not duration or self._pwm_start_time is None:
+            return 0
+        # nesting runs close to the start of the pwm loop
+        now = get_clock().time()
+        loop_start = (
+            self._pwm_start_time
+            + round((now - self._pwm_start_time) / duration) * duration
+        )
+        shift = async_get_master_coordinator(self.hass).async_shift(
+            self.entity_id,
+            loop_start + window["start"] * duration,
+            loop_start + window["end"] * duration,
+            duration,
+            window["slack"] * duration,
+            window["load"],
+        )
+        return shift / duration
 
     async def _async_controller_pwm(
         self, now: datetime.datetime | None = None, force: bool = False
     ) -> None:
         """Convert control output to pwm loop."""
-        async with self._temp_lock:
-            self._logger.debug(
-                "Running pwm routine, routine=%s, forced=%s", now is not None, force
-            )
+        lock_request = time.perf_counter()
+        async with self._pwm_lock:
+            span = self._tracer.start("pwm", time.perf_counter() - lock_request)
+            profile = None
+            try:
+                profile = self._profiler.start_tick()
+                self._logger.debug(
+                    "Running pwm routine, routine=%s, forced=%s", now is not None, force
+                )
+                # latest published controller output
+                output = self.control_output
+                if now is not None:
+                    self._switching_plan.async_record_delay(
+                        get_clock().time() - now.timestamp()
+                    )
+                self._async_record_input("pwm", routine=now is not None, force=force)
+                if (
+                    self._hvac_on is not None
+                    and self._self_controlled != OperationMode.PENDING
+                ):
+                    async_get_startup(self.hass).async_controlled(self)
 
-            # keep off in emergency or pwm = 0
-            if (
-                self.control_output[ATTR_CONTROL_PWM_OUTPUT] in [None, 0]
-                or self._hvac_on is None
-                or self.preset_mode == PRESET_EMERGENCY
-            ):
-                self._async_cancel_pwm_routines()
-            # determine switch on-off or valve position
-            else:
-                if self._hvac_on.get_pwm_time:
-                    pwm_duration = self._hvac_on.get_pwm_time.seconds
+                # keep off in emergency or pwm = 0
+                if (
+                    output[ATTR_CONTROL_PWM_OUTPUT] in [None, 0]
+                    or self._hvac_on is None
+                    or self.preset_mode == PRESET_EMERGENCY
+                ):
+                    self._async_cancel_pwm_routines()
+                # determine switch on-off or valve position
                 else:
-                    pwm_duration = None
-
-                # on-off mode switches the pwm between 0 and 100
-                if self._hvac_on.is_hvac_on_off_mode:
-                    if self.control_output[ATTR_CONTROL_PWM_OUTPUT] <= 0:
-                        await self._async_switch_turn_off()
+                    if self._hvac_on.get_pwm_time:
+                        pwm_duration = self._hvac_on.get_pwm_time.seconds
                     else:
-                        await self._async_switch_turn_on()
-
-                # convert pwm to on-off switch
-                elif pwm_duration:
-                    # determine start and end time of valve open
-                    now = time.time()
-                    self.update_pwm_time()
-                    pwm_scale = self._hvac_on.pwm_scale
-                    scale_factor = pwm_duration / pwm_scale
-                    start_time = (
-                        self._pwm_start_time
-                        + self.control_output[ATTR_CONTROL_OFFSET] * scale_factor
-                    )
-                    end_time = (
-                        self._pwm_start_time
-                        + min(
-                            sum(self.control_output.values()), self._hvac_on.pwm_scale
-                        )
-                        * scale_factor
-                    )
+                        pwm_duration = None
 
-                    if self._hvac_on.is_hvac_master_mode:
-                        start_time += self._hvac_on.compensate_valve_lag
-
-                    # stop current schedules
-                    if self._start_pwm is not None:
-                        await self._async_start_pwm()
-                    if self._stop_pwm is not None:
-                        await self._async_stop_pwm()
-
-                    # negative duration of valve
-                    if (
-                        # control time is too short
-                        end_time <= start_time
-                        # valve should be closed
-                        or end_time < now
-                        # opening time shorter than threshold
-                        or end_time - now
-                        < max(
-                            self._hvac_on.pwm_threshold / pwm_scale * pwm_duration,
-                            START_MISALINGMENT,
-                        )
-                    ):
-                        if self._is_valve_open():
+                    # on-off mode switches the pwm between 0 and 100
+                    if self._hvac_on.is_hvac_on_off_mode:
+                        if output[ATTR_CONTROL_PWM_OUTPUT] <= 0:
                             await self._async_switch_turn_off()
-                        return
-
-                    # check if current switch state is matching
-                    # if self.control_output[ATTR_CONTROL_PWM_OUTPUT] == pwm_scale:
-                    #     await self._async_switch_turn_on()
-                    if (
-                        start_time - now > START_MISALINGMENT or end_time <= now
-                    ) and self._is_valve_open():
-                        await self._async_switch_turn_off()
-                    elif start_time <= now < end_time:
-                        await self._async_switch_turn_on()
-
-                    # schedule new switch changes
-                    if start_time > now:
-                        await self._async_start_pwm(start_time)
-                    if (
-                        end_time > now
-                        and self.control_output[ATTR_CONTROL_PWM_OUTPUT] != pwm_scale
-                    ):
-                        await self._async_stop_pwm(end_time)
+                        else:
+                            await self._async_switch_turn_on()
+
+                    # convert pwm to on-off switch
+                    elif pwm_duration:
+                        # determine start and end time of valve open
+                        now = get_clock().time()
+                        self.update_pwm_time()
+                        pwm_scale = self._hvac_on.pwm_scale
+                        scale_factor = pwm_duration / pwm_scale
+                        start_time = (
+                            self._pwm_start_time
+                            + output[ATTR_CONTROL_OFFSET] * scale_factor
+                        )
+                        end_time = (
+                            self._pwm_start_time
+                            + min(
+                                sum(output.values()),
+                                self._hvac_on.pwm_scale,
+                            )
+                            * scale_factor
+                        )
 
-                # convert pwm to proportional switch and close
-                else:
-                    valve_open = self._is_valve_open()
+                        if self._hvac_on.is_hvac_master_mode:
+                            start_time += self._hvac_on.compensate_valve_lag
+
+                        # negative duration of valve
+                        if (
+                            # control time is too short
+                            end_time <= start_time
+                            # valve should be closed
+                            or end_time < now
+                            # opening time shorter than threshold
+                            or end_time - now
+                            < max(
+                                self._hvac_on.pwm_threshold / pwm_scale * pwm_duration,
+                                START_MISALINGMENT,
+                            )
+                        ):
+                            self._switching_plan.async_cancel()
+                            if self._is_valve_open():
+                                await self._async_switch_turn_off()
+                            return
+
+                        # check if current switch state is matching
+                        # if output[ATTR_CONTROL_PWM_OUTPUT] == pwm_scale:
+                        #     await self._async_switch_turn_on()
+                        if (
+                            start_time - now > START_MISALINGMENT or end_time <= now
+                        ) and self._is_valve_open():
+                            await self._async_switch_turn_off()
+                        elif start_time <= now < end_time:
+                            await self._async_switch_turn_on()
+
+                        # reschedule switch changes which moved
+                        self._switching_plan.async_update(
+                            start_time if start_time > now else None,
+                            end_time
+                            if output[ATTR_CONTROL_PWM_OUTPUT] != pwm_scale
+                            else None,
+                        )
 
-                    if (
-                        self._hvac_on.pwm_threshold
-                        > self.control_output[ATTR_CONTROL_PWM_OUTPUT]
-                        and valve_open
-                    ):
-                        await self._async_switch_turn_off()
-                    # convert pwm to proportional switch and change position
+                    # convert pwm to proportional switch and close
                     else:
-                        await self._async_switch_turn_on()
+                        valve_open = self._is_valve_open()
+
+                        if (
+                            self._hvac_on.pwm_threshold
+                            > output[ATTR_CONTROL_PWM_OUTPUT]
+                            and valve_open
+                        ):
+                            await self._async_switch_turn_off()
+                        # convert pwm to proportional switch and change position
+                        else:
+                            await self._async_switch_turn_on()
+            finally:
+                self._async_end_profile_tick(profile)
+                self._tracer.finish(span, "switching")
 
     @callback
     def _async_cancel_pwm_routines(self, hvac_mode: HVACMode | None = None) -> None:
         """Cancel scheduled switch routines."""
-        if self._async_start_pwm is not None:
-            self.hass.async_create_task(self._async_start_pwm())
-        if self._async_stop_pwm is not None:
-            self.hass.async_create_task(self._async_stop_pwm())
+        self._switching_plan.async_cancel()
 
         # if self._hvac_on:
         #     # stop switch
         self.hass.async_create_task(self._async_switch_turn_off(hvac_mode=hvac_mode))
 
-    async def _async_start_pwm(
-        self, start_time: datetime.datetime | None = None
-    ) -> None:
-        """Start pwm at specified time."""
-        if start_time is None and self._start_pwm is not None:
-            self._logger.debug("cancel scheduled switch on")
-            self._start_pwm()
-            self._start_pwm = None
-        elif start_time is not None and self._start_pwm is not None:
-            self._logger.debug("Re-define scheduled switch on")
-            self._start_pwm()
-            self._start_pwm = None
-        if start_time and self._start_pwm is None:
-            self._logger.debug("Define scheduled switch on")
-            self._start_pwm = async_track_point_in_utc_time(
-                self.hass,
-                self.async_turn_switch_on_factory(),
-                datetime.datetime.fromtimestamp(start_time),
-            )
-            self.async_on_remove(self._start_pwm)
-
-    async def _async_stop_pwm(self, stop_time: datetime.datetime | None = None) -> None:
-        """Stop pwm at specified time."""
-        if stop_time is None and self._stop_pwm is not None:
-            self._logger.debug("cancel scheduled switch off")
-            self._stop_pwm()
-            self._stop_pwm = None
-        elif stop_time is not None and self._stop_pwm is not None:
-            self._logger.debug("Re-define scheduled switch off")
-            self._stop_pwm()
-            self._stop_pwm = None
-        if stop_time and self._stop_pwm is None:
-            self._logger.debug("Define scheduled switch off")
-            self._stop_pwm = async_track_point_in_utc_time(
-                self.hass,
-                self.async_turn_switch_off_factory(),
-                datetime.datetime.fromtimestamp(stop_time),
-            )
-            self.async_on_remove(self._stop_pwm)
-
-    @callback
-    def async_turn_switch_on_factory(
-        self, hvac_mode: HVACMode | None = None, control_val: float | None = None
-    ):
-        """Generate turn on callbacks as factory."""
-
-        # TODO: factory needed?
-        async def async_turn_on_switch(now: datetime.datetime):
-            """Turn on specific switch."""
-            await self._async_switch_turn_on(
-                hvac_mode=hvac_mode, control_val=control_val
-            )
-
-        return async_turn_on_switch
-
     def _prop_valve_position(self, hvac_on, control_val: float | None = None):
         """Determine master utilisation for proportional valve scale factor."""
         master_util = 1
@@ -1787,11 +2334,15 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         else:
             valve_pos = control_val
 
-        if self._self_controlled == OperationMode.MASTER:
+        if self._self_controlled == OperationMode.MASTER and self._master_entity_id:
             master_mode = state_attr(
-                self.hass, "climate." + self._self_controlled, ATTR_HVAC_DEFINITION
+                self.hass, self._master_entity_id, ATTR_HVAC_DEFINITION
             )
-            if self.hvac_mode in master_mode and hvac_on.master_scaled_bound > 1:
+            if (
+                master_mode
+                and self.hvac_mode in master_mode
+                and hvac_on.master_scaled_bound > 1
+            ):
                 master_control_val = master_mode[self.hvac_mode][ATTR_CONTROL_OUTPUT][
                     ATTR_CONTROL_PWM_OUTPUT
                 ]
@@ -1830,13 +2381,19 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         if _hvac_on.is_hvac_switch_on_off:
             if self._is_valve_open(hvac_mode=hvac_mode):
                 self._logger.debug("Switch already ON")
+                self._actuators.async_suppressed(entity_id)
                 return
 
             data = {ATTR_ENTITY_ID: entity_id}
             self._logger.debug("Order 'ON' sent to switch device '%s'", entity_id)
 
             # storetime of operation for stuck switch check
-            _hvac_on.switch_last_change = datetime.datetime.now(datetime.UTC)
+            _hvac_on.switch_last_change = get_clock().now()
+            self._decisions.record(
+                DECISION_SWITCH,
+                switch=1,
+                pwm_out=self.control_output[ATTR_CONTROL_PWM_OUTPUT],
+            )
 
             # NC-NO conversion
             if _hvac_on.get_hvac_switch_mode == NC_SWITCH_MODE:
@@ -1844,13 +2401,22 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             else:
                 operation = SERVICE_TURN_OFF
 
-            await self.hass.services.async_call(
+            if await async_get_command_queue(self.hass).async_call(
                 HA_DOMAIN, operation, data, context=self._context
-            )
+            ):
+                self._actuators.commanded(entity_id, operation)
 
         # change valve position
         else:
             valve_pos = self._prop_valve_position(_hvac_on, control_val)
+            if self._actuators.is_redundant(
+                entity_id,
+                valve_pos,
+                _hvac_on.get_valve_deadband,
+                _hvac_on.get_switch_refresh,
+            ):
+                self._logger.debug("Valve already at '%s'", valve_pos)
+                return
             self._logger.debug(
                 "Change state of heater '%s' to '%s'",
                 entity_id,
@@ -1858,29 +2424,25 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             )
 
             # storetime of operation for stuck switch check
-            _hvac_on.switch_last_change = datetime.datetime.now(datetime.UTC)
+            _hvac_on.switch_last_change = get_clock().now()
+            self._decisions.record(
+                DECISION_SWITCH,
+                switch=valve_pos,
+                pwm_out=self.control_output[ATTR_CONTROL_PWM_OUTPUT],
+            )
             data = {
                 ATTR_ENTITY_ID: entity_id,
                 ATTR_VALUE: valve_pos,
             }
             method = entity_id.split(".")[0]
 
-            await self.hass.services.async_call(
+            if await async_get_command_queue(self.hass).async_call(
                 method,
                 SERVICE_SET_VALUE,
                 data,
                 context=self._context,
-            )
-
-    @callback
-    def async_turn_switch_off_factory(self, hvac_mode: HVACMode | None = None) -> None:
-        """Generate turn on callbacks as factory."""
-
-        async def async_turn_off_switch(now: datetime.datetime):
-            """Turn off specific switch."""
-            await self._async_switch_turn_off(hvac_mode=hvac_mode)
-
-        return async_turn_off_switch
+            ):
+                self._actuators.commanded(entity_id, valve_pos)
 
     async def _async_switch_turn_off(self, hvac_mode: HVACMode | None = None) -> None:
         """Close valve.
@@ -1898,10 +2460,16 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
         if _hvac_on.is_hvac_switch_on_off:
             if not self._is_valve_open(hvac_mode=hvac_mode):
                 self._logger.debug("Switch already OFF")
+                self._actuators.async_suppressed(entity_id)
                 return
 
             data = {ATTR_ENTITY_ID: entity_id}
             self._logger.debug("Order 'OFF' sent to switch device '%s'", entity_id)
+            self._decisions.record(
+                DECISION_SWITCH,
+                switch=0,
+                pwm_out=self.control_output[ATTR_CONTROL_PWM_OUTPUT],
+            )
 
             # NC-NO conversion
             if _hvac_on.get_hvac_switch_mode == NC_SWITCH_MODE:
@@ -1909,39 +2477,59 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             else:
                 operation = SERVICE_TURN_ON
 
-            await self.hass.services.async_call(
+            if await async_get_command_queue(self.hass).async_call(
                 HA_DOMAIN, operation, data, context=self._context
-            )
+            ):
+                self._actuators.commanded(entity_id, operation)
 
         # operate propoertional valve
         else:
+            if _hvac_on.get_hvac_switch_mode == NC_SWITCH_MODE:
+                control_val = 0
+            else:
+                control_val = _hvac_on.pwm_scale
+
+            # closing is not subject to the deadband
+            if self._actuators.is_redundant(
+                entity_id, control_val, refresh=_hvac_on.get_switch_refresh
+            ):
+                self._logger.debug("Valve already closed")
+                _hvac_on.stuck_loop = False
+                return
+
             self._logger.debug(
                 "Change state of switch '%s' to '%s'",
                 entity_id,
                 0,
             )
 
-            if _hvac_on.get_hvac_switch_mode == NC_SWITCH_MODE:
-                control_val = 0
-            else:
-                control_val = _hvac_on.pwm_scale
-
+            self._decisions.record(
+                DECISION_SWITCH,
+                switch=control_val,
+                pwm_out=self.control_output[ATTR_CONTROL_PWM_OUTPUT],
+            )
             data = {ATTR_ENTITY_ID: entity_id, ATTR_VALUE: control_val}
             method = entity_id.split(".")[0]
 
-            await self.hass.services.async_call(
+            if await async_get_command_queue(self.hass).async_call(
                 method,
                 SERVICE_SET_VALUE,
                 data,
                 context=self._context,
-            )
+            ):
+                self._actuators.commanded(entity_id, control_val)
 
         _hvac_on.stuck_loop = False
 
-    async def _async_toggle_switch(self, hvac_mode: HVACMode, entity_id: str) -> None:
-        """Toggle the state of a switch temporarily and hereafter set it to 0 or 1."""
+    async def async_exercise_switch(self, hvac_mode: HVACMode) -> bool:
+        """Open a switch temporarily and hereafter close it.
 
-        _, _hvac_on, _ = self.get_hvac_data(hvac_mode)
+        returns False when the switch moved since it was queued
+        """
+        if self._switch_moved_recently(hvac_mode):
+            return False
+
+        _, _hvac_on, entity_id = self.get_hvac_data(hvac_mode)
         duration = _hvac_on.get_switch_stale_open_time
         _hvac_on.stuck_loop = True
 
@@ -1958,13 +2546,9 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             control_val = _hvac_on.pwm_scale
 
         await self._async_switch_turn_on(hvac_mode=hvac_mode, control_val=control_val)
-
-        # schedule toggle
-        async_track_point_in_utc_time(
-            self.hass,
-            self.async_turn_switch_off_factory(hvac_mode=hvac_mode),
-            datetime.datetime.fromtimestamp(time.time() + duration.total_seconds()),
-        )
+        await get_clock().async_sleep(self.hass, duration.total_seconds())
+        await self._async_switch_turn_off(hvac_mode=hvac_mode)
+        return True
 
     @callback
     def _async_activate_emergency_stop(self, source: str, sensor: str) -> None:
@@ -2014,6 +2598,12 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
     ) -> None:
         """Set new preset mode."""
         self._logger.debug("Preset update to %s", preset_mode)
+        self._async_record_input(
+            "service",
+            service="set_preset_mode",
+            hvac_mode=hvac_mode,
+            preset_mode=preset_mode,
+        )
 
         if (
             preset_mode not in self.valid_presets(hvac_mode)
@@ -2099,9 +2689,8 @@ class MultiZoneThermostat(ClimateEntity, RestoreEntity):
             self._logger.debug("no found entity for %s", hvac_mode)
             return False
 
-        try:
-            switch_state = self.hass.states.get(entity_id).state
-        except:
+        switch_state = self._actuators.get_state(entity_id)
+        if switch_state is None:
             self._async_activate_emergency_stop(
                 "valve open check entity not found", sensor=entity_id
             )
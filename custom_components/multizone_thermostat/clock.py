@@ -0,0 +1,209 @@
+"""Time source and timers of the integration.
+
+All modules read the time and schedule timers through the active clock.
+The system clock uses the wall clock and the Home Assistant event
+helpers. A simulated clock runs timers in time order when advanced, such
+that days of operation are simulated without waiting.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import datetime
+import heapq
+import inspect
+import itertools
+import time
+
+
+class SystemClock:
+    """Wall clock with Home Assistant timers."""
+
+    def time(self) -> float:
+        """Current time (timestamp)."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Monotonic time (sec) for durations and deadlines."""
+        return time.monotonic()
+
+    def now(self) -> datetime.datetime:
+        """Current time (UTC)."""
+        return datetime.datetime.now(datetime.UTC)
+
+    def async_track_point_in_time(
+        self, hass, action: Callable, timestamp: float
+    ) -> Callable[[], None]:
+        """Run action at timestamp, returns cancel callback."""
+        from homeassistant.helpers.event import async_track_point_in_utc_time
+
+        return async_track_point_in_utc_time(
+            hass, action, datetime.datetime.fromtimestamp(timestamp, datetime.UTC)
+        )
+
+    def async_call_later(
+        self, hass, delay: float, action: Callable
+    ) -> Callable[[], None]:
+        """Run action after delay (sec), returns cancel callback."""
+        from homeassistant.helpers.event import async_call_later
+
+        return async_call_later(hass, delay, action)
+
+    def async_track_time_interval(
+        self, hass, action: Callable, interval: datetime.timedelta
+    ) -> Callable[[], None]:
+        """Run action every interval, returns cancel callback."""
+        from homeassistant.helpers.event import async_track_time_interval
+
+        return async_track_time_interval(hass, action, interval)
+
+    def async_track_time_change(
+        self, hass, action: Callable, hour: int, minute: int, second: int
+    ) -> Callable[[], None]:
+        """Run action daily at time of day, returns cancel callback."""
+        from homeassistant.helpers.event import async_track_time_change
+
+        return async_track_time_change(
+            hass, action, hour=hour, minute=minute, second=second
+        )
+
+    async def async_sleep(self, hass, delay: float) -> None:
+        """Wait for delay (sec)."""
+        await asyncio.sleep(delay)
+
+
+class SimulatedClock(SystemClock):
+    """Clock which only moves when advanced.
+
+    Timers are kept in a heap and run in time order by async_advance, the
+    clock is set to the timer time before its action runs.
+    """
+
+    def __init__(self, start: float | None = None) -> None:
+        """Start at timestamp, default current time."""
+        self._time = time.time() if start is None else start
+        self._timers = []
+        self._sequence = itertools.count()
+
+    def time(self) -> float:
+        """Simulated time (timestamp)."""
+        return self._time
+
+    def monotonic(self) -> float:
+        """Simulated time, deadlines do not expire during a computation."""
+        return self._time
+
+    def now(self) -> datetime.datetime:
+        """Simulated time (UTC)."""
+        return datetime.datetime.fromtimestamp(self._time, datetime.UTC)
+
+    def _schedule(
+        self, timestamp: float, action: Callable, interval: float | None = None
+    ) -> Callable[[], None]:
+        """Add timer to heap, returns cancel callback."""
+        timer = [timestamp, next(self._sequence), action, interval, True]
+        heapq.heappush(self._timers, timer)
+
+        def cancel() -> None:
+            timer[4] = False
+
+        return cancel
+
+    def async_track_point_in_time(
+        self, hass, action: Callable, timestamp: float
+    ) -> Callable[[], None]:
+        """Run action at simulated timestamp."""
+        return self._schedule(timestamp, action)
+
+    def async_call_later(
+        self, hass, delay: float, action: Callable
+    ) -> Callable[[], None]:
+        """Run action after simulated delay (sec)."""
+        return self._schedule(self._time + delay, action)
+
+    def async_track_time_interval(
+        self, hass, action: Callable, interval: datetime.timedelta
+    ) -> Callable[[], None]:
+        """Run action every simulated interval."""
+        seconds = interval.total_seconds()
+        return self._schedule(self._time + seconds, action, seconds)
+
+    def async_track_time_change(
+        self, hass, action: Callable, hour: int, minute: int, second: int
+    ) -> Callable[[], None]:
+        """Run action daily at simulated time of day (UTC)."""
+        first = self.now().replace(
+            hour=hour, minute=minute, second=second, microsecond=0
+        )
+        if first.timestamp() <= self._time:
+            first += datetime.timedelta(days=1)
+        return self._schedule(first.timestamp(), action, 86400)
+
+    async def async_sleep(self, hass, delay: float) -> None:
+        """Wait until the simulated delay passed."""
+        future = asyncio.get_running_loop().create_future()
+
+        def wake(_now) -> None:
+            if not future.done():
+                future.set_result(None)
+
+        cancel = self._schedule(self._time + delay, wake)
+        try:
+            await future
+        finally:
+            cancel()
+
+    def set_time(self, timestamp: float) -> None:
+        """Jump to timestamp without running timers."""
+        self._time = timestamp
+
+    @property
+    def next_timer(self) -> float | None:
+        """Time of first active timer."""
+        while self._timers and not self._timers[0][4]:
+            heapq.heappop(self._timers)
+        return self._timers[0][0] if self._timers else None
+
+    async def async_advance(self, seconds: float, hass=None) -> int:
+        """Move time forward and run due timers in time order.
+
+        with hass the tasks created by a timer finish before the next timer
+        runs, returns the number of timers run
+        """
+        end = self._time + seconds
+        count = 0
+        while (due := self.next_timer) is not None and due <= end:
+            timer = heapq.heappop(self._timers)
+            _, _, action, interval, _ = timer
+            self._time = max(self._time, due)
+            if interval:
+                # reuse timer such that its cancel callback stays valid
+                timer[0] += interval
+                timer[1] = next(self._sequence)
+                heapq.heappush(self._timers, timer)
+
+            result = action(self.now())
+            if inspect.isawaitable(result):
+                await result
+            if hass is not None:
+                await hass.async_block_till_done()
+            count += 1
+
+        self._time = max(self._time, end)
+        return count
+
+
+_CLOCK: SystemClock = SystemClock()
+
+
+def get_clock() -> SystemClock:
+    """Active clock."""
+    return _CLOCK
+
+
+def set_clock(clock: SystemClock | None = None) -> SystemClock:
+    """Activate clock, default the system clock, returns previous clock."""
+    global _CLOCK  # pylint: disable=global-statement
+    previous = _CLOCK
+    _CLOCK = clock or SystemClock()
+    return previous
@@ -0,0 +1,219 @@
+"""Batching of actuator commands of all thermostats."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import datetime
+import logging
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import CALLBACK_TYPE, Context, HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+from .const import (
+    COMMAND_CONCURRENCY,
+    DATA_COMMAND_QUEUE,
+    DEFAULT_COMMAND_BATCH_WINDOW,
+    DEFAULT_COMMAND_STAGGER,
+)
+
+
+@dataclass(slots=True)
+class CommandBatch:
+    """Entities receiving the same service call."""
+
+    domain: str
+    service: str
+    data: dict
+    context: Context | None
+    # entity_id -> future resolved with the success of its command
+    waiters: dict[str, asyncio.Future] = field(default_factory=dict)
+
+
+class CommandQueue:
+    """Combine actuator commands issued within a short window.
+
+    All thermostats start their pwm cycle at the same moment. Commands with
+    equal domain, service, data and context are sent as one service call
+    for all entities, such that state changes keep the context of their
+    thermostat. When an entity receives a new command before the batch is
+    sent only the latest command is kept. A failed batch is sent again per
+    entity, such that one failing actuator does not fail the commands of
+    the other entities. Service calls are optionally staggered and the
+    number of calls in progress is limited. The window and stagger are the
+    largest of the registered thermostats.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, concurrency: int = COMMAND_CONCURRENCY
+    ) -> None:
+        """Prepare empty queue."""
+        self.hass = hass
+        self._limits: dict[str, tuple[float, float]] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._logger = logging.getLogger(DOMAIN).getChild("commands")
+        self._batches: dict[tuple, CommandBatch] = {}
+        self._entity_batch: dict[str, tuple] = {}
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        self.commands = 0
+        self.service_calls = 0
+
+    @property
+    def window(self) -> float:
+        """Largest batching window (sec) of the registered thermostats."""
+        return max(
+            (limit[0] for limit in self._limits.values()),
+            default=DEFAULT_COMMAND_BATCH_WINDOW.total_seconds(),
+        )
+
+    @property
+    def stagger(self) -> float:
+        """Largest stagger (sec) of the registered thermostats."""
+        return max(
+            (limit[1] for limit in self._limits.values()),
+            default=DEFAULT_COMMAND_STAGGER.total_seconds(),
+        )
+
+    @callback
+    def async_register(
+        self,
+        entity_id: str,
+        window: datetime.timedelta,
+        stagger: datetime.timedelta,
+    ) -> CALLBACK_TYPE:
+        """Add batching limits of thermostat, returns unregister."""
+        self._limits[entity_id] = (window.total_seconds(), stagger.total_seconds())
+
+        @callback
+        def async_unregister() -> None:
+            self._limits.pop(entity_id, None)
+
+        return async_unregister
+
+    async def async_call(
+        self,
+        domain: str,
+        service: str,
+        service_data: dict,
+        context: Context | None = None,
+    ) -> bool:
+        """Queue service call for a single entity and wait until sent.
+
+        returns False when the call failed or a newer command replaced it
+        """
+        data = dict(service_data)
+        entity_id = data.pop(ATTR_ENTITY_ID)
+        key = (
+            domain,
+            service,
+            tuple(sorted(data.items())),
+            context.id if context else None,
+        )
+
+        # latest command of an entity replaces a queued one
+        if (old_key := self._entity_batch.get(entity_id)) is not None:
+            old_batch = self._batches[old_key]
+            old_batch.waiters.pop(entity_id).set_result(False)
+            if not old_batch.waiters:
+                del self._batches[old_key]
+
+        if (batch := self._batches.get(key)) is None:
+            batch = self._batches[key] = CommandBatch(domain, service, data, context)
+        future = batch.waiters[entity_id] = self.hass.loop.create_future()
+        self._entity_batch[entity_id] = key
+        self.commands += 1
+
+        if self._unsub_flush is None:
+            self._unsub_flush = get_clock().async_call_later(
+                self.hass, self.window, self._async_flush
+            )
+
+        return await asyncio.shield(future)
+
+    @callback
+    def _async_flush(self, _now) -> None:
+        """Send all queued batches."""
+        self._unsub_flush = None
+        batches = list(self._batches.values())
+        self._batches = {}
+        self._entity_batch = {}
+        self.hass.async_create_task(self._async_send_all(batches))
+
+    async def _async_send_all(self, batches: list[CommandBatch]) -> None:
+        """Send batches, staggered when configured."""
+        tasks = []
+        stagger = self.stagger
+        for i, batch in enumerate(batches):
+            if stagger and i:
+                await get_clock().async_sleep(self.hass, stagger)
+            tasks.append(self.hass.async_create_task(self._async_send(batch)))
+        await asyncio.gather(*tasks)
+
+    async def _async_send(self, batch: CommandBatch) -> None:
+        """Send one service call for all entities of the batch.
+
+        a failed batch of multiple entities is sent again per entity
+        """
+        entity_ids = list(batch.waiters)
+        try:
+            await self._async_service_call(batch, entity_ids)
+        except Exception as err:
+            if len(entity_ids) == 1:
+                self._logger.warning(
+                    "%s.%s for %s failed: %s",
+                    batch.domain,
+                    batch.service,
+                    entity_ids[0],
+                    err,
+                )
+                batch.waiters[entity_ids[0]].set_result(False)
+                return
+
+            self._logger.warning(
+                "%s.%s for %s failed: %s, send per entity",
+                batch.domain,
+                batch.service,
+                entity_ids,
+                err,
+            )
+            await asyncio.gather(
+                *(
+                    self._async_send(
+                        CommandBatch(
+                            batch.domain,
+                            batch.service,
+                            batch.data,
+                            batch.context,
+                            {entity_id: future},
+                        )
+                    )
+                    for entity_id, future in batch.waiters.items()
+                )
+            )
+        else:
+            for future in batch.waiters.values():
+                future.set_result(True)
+
+    async def _async_service_call(
+        self, batch: CommandBatch, entity_ids: list
+    ) -> None:
+        """Call service of the batch for entities."""
+        async with self._semaphore:
+            self.service_calls += 1
+            self._logger.debug("%s.%s for %s", batch.domain, batch.service, entity_ids)
+            await self.hass.services.async_call(
+                batch.domain,
+                batch.service,
+                {ATTR_ENTITY_ID: entity_ids, **batch.data},
+                context=batch.context,
+            )
+
+
+@callback
+def async_get_command_queue(hass: HomeAssistant) -> CommandQueue:
+    """Actuator command queue of the domain."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_COMMAND_QUEUE not in domain_data:
+        domain_data[DATA_COMMAND_QUEUE] = CommandQueue(hass)
+    return domain_data[DATA_COMMAND_QUEUE]
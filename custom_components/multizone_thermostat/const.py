@@ -13,6 +13,7 @@ DEFAULT_DETAILED_OUTPUT = False
 DEFAULT_SENSOR_FILTER = 0
 DEFAULT_AREA = 0
 DEFAULT_INCLUDE_VALVE_LAG = timedelta(seconds=0)
+DEFAULT_SENSOR_DEADBAND = 0
 
 # on_off switch type
 NC_SWITCH_MODE = "NC"
@@ -26,6 +27,14 @@ DEFAULT_MIN_VALVE_PWM = 0  # factor of master pwm
 DEFAULT_PASSIVE_SWITCH = False
 DEFAULT_PASSIVE_SWITCH_OPEN_TIME = timedelta(seconds=60)
 DEFAULT_PASSIVE_CHECK_TIME = "02:00"
+DEFAULT_PASSIVE_CONCURRENCY = 2  # valves exercised at the same time
+DEFAULT_PASSIVE_SPACING = timedelta(seconds=30)
+DEFAULT_COMMAND_BATCH_WINDOW = timedelta(milliseconds=50)
+DEFAULT_COMMAND_STAGGER = timedelta(0)
+
+# actuator commands
+DEFAULT_VALVE_DEADBAND = 0
+DEFAULT_SWITCH_REFRESH = timedelta(minutes=30)
 
 # restore old states
 DEFAULT_OLD_STATE = False
@@ -64,7 +73,6 @@ ATTR_CURRENT_OUTDOOR_TEMPERATURE = "current_outdoor_temp"
 ATTR_FILTER_MODE = "filter_mode"
 ATTR_DETAILED_OUTPUT = "detailed_output"
 ATTR_EMERGENCY_MODE = "emergency mode"
-ATTR_UPDATE_NEEDED = "update satelite"
 ATTR_LAST_SWITCH_CHANGE = "switch_last_change"
 ATTR_STUCK_LOOP = "stuck_loop"
 
@@ -82,13 +90,21 @@ CONF_ENABLE_OLD_STATE = "restore_from_old_state"
 CONF_ENABLE_OLD_PARAMETERS = "restore_parameters"
 CONF_ENABLE_OLD_INTEGRAL = "restore_integral"
 CONF_STALE_DURATION = "sensor_stale_duration"
+CONF_SENSOR_DEADBAND = "sensor_deadband"
+CONF_SENSOR_MIN_INTERVAL = "sensor_min_interval"
 
 CONF_EXTRA_PRESETS = "extra_presets"
 
 CONF_PASSIVE_SWITCH_DURATION = "passive_switch_duration"
 CONF_PASSIVE_SWITCH_OPEN_TIME = "passive_switch_opening_time"
 CONF_PASSIVE_CHECK_TIME = "passive_switch_check_time"
+CONF_PASSIVE_CONCURRENCY = "passive_switch_concurrency"
+CONF_PASSIVE_SPACING = "passive_switch_spacing"
+CONF_COMMAND_BATCH_WINDOW = "command_batch_window"
+CONF_COMMAND_STAGGER = "command_stagger"
 CONF_INCLUDE_VALVE_LAG = "compensate_valve_lag"
+CONF_VALVE_DEADBAND = "valve_deadband"
+CONF_SWITCH_REFRESH = "switch_refresh"
 
 ATTR_CONTROL_OUTPUT = "control_output"  # offset and pwm_output
 ATTR_CONTROL_PWM_OUTPUT = "pwm_out"
@@ -148,11 +164,35 @@ CONF_MASTER_OPERATION_MODE = "operation_mode"
 CONF_SATELITES = "satelites"
 CONF_MIN_VALVE = "min_opening_for_propvalve"
 CONF_CONTINUOUS_LOWER_LOAD = "lower_load_scale"
+CONF_NESTING_RESOLUTION = "nesting_resolution"
+CONF_NESTING_STRATEGY = "nesting_strategy"
 
 # nesting
 ATTR_ROOMS = "rooms"
 ATTR_SCALED_PWM = "scaled_pwm"
 ATTR_ROUNDED_PWM = "rounded_pwm"
+ATTR_NESTING_STATS = "nesting_stats"
+ATTR_LOOP_BLOCKING = "loop_blocking_time"
+ATTR_TIME_TO_CONTROL = "startup_time_to_control"
+ATTR_SENSOR_INGESTION = "sensor_ingestion"
+ATTR_ACTUATOR_COMMANDS = "actuator_commands"
+ATTR_SWITCHING_PLAN = "switching_plan"
+ATTR_MASTER_ENTITY_ID = "master_entity_id"
+ATTR_CONTROL_TRACE = "control_trace"
+ATTR_MASTER_COORDINATION = "master_coordination"
+ATTR_FILTER_REPAIRS = "filter_repairs"
+
+# hass.data[DOMAIN] keys
+DATA_STARTUP = "startup"
+DATA_COMMAND_QUEUE = "command_queue"
+DATA_WATCHDOG = "watchdog"
+DATA_EXERCISE = "exercise"
+DATA_MASTERS = "masters"
+
+# persistent store for warm start
+STORE_VERSION = 1
+STORE_SAVE_DELAY = 60  # seconds, writes within delay are combined
+STORE_MAX_AGE = 3600  # seconds, older controller and filter state is not restored
 
 
 class NestingMode(StrEnum):
@@ -163,6 +203,13 @@ class NestingMode(StrEnum):
     MASTER_CONTINUOUS = "continuous"
 
 
+class NestingStrategy(StrEnum):
+    """Packing strategies for nesting."""
+
+    FIRST_FIT = "first_fit"
+    BEAM_SEARCH = "beam_search"
+
+
 # control constants
 CONTROL_START_DELAY = 1  #   # seconds, control loop start delay rel to time()
 MASTER_CONTROL_LEAD = 1  # 0.1  # seconds, time between last sat and master control
@@ -178,8 +225,21 @@ START_MISALINGMENT = (
     30  # seconds , skip switch toggle when in near future switch operated
 )
 
-NESTING_MATRIX = 20
+NESTING_MATRIX = 20  # default nesting resolution
+NESTING_MATRIX_MIN = 10
+NESTING_MATRIX_MAX = 50
+NESTING_ADAPTIVE = "adaptive"
+NESTING_ADAPTIVE_CELLS = 200  # adaptive resolution: matrix * active rooms
+NESTING_ADAPTIVE_STEP = 5  # adaptive resolution: rounding of matrix size
 NESTING_BALANCE = 0.1
+NESTING_FLIP_OPTIONS = 16  # continuous: max lid reversal options tried exhaustively
+NESTING_BEAM_WIDTH = 16  # beam search: max number of partial packings kept
+NESTING_SOLVER_DEADLINE = 0.02  # seconds, beam search time budget
+NESTING_EXECUTOR_DEADLINE = 0.5  # seconds, offloaded nesting run time budget
+MASTER_SHIFT_STEPS = 10  # candidate shifts of a master heating window
+
+# actuator command batching
+COMMAND_CONCURRENCY = 4  # max service calls in progress
 
 
 class OperationMode(StrEnum):
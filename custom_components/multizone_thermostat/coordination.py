@@ -0,0 +1,199 @@
+"""Coordination of the heating windows of multiple masters."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+import math
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+from .const import DATA_MASTERS, MASTER_SHIFT_STEPS
+
+
+def _instances(window: tuple, begin: float, finish: float) -> list:
+    """Repetitions of a periodic window overlapping begin till finish."""
+    start, end, period, load = window
+    if period <= 0:
+        return [(start, end, load)] if start < finish and end > begin else []
+    first = math.floor((begin - end) / period) + 1
+    last = math.ceil((finish - start) / period) - 1
+    return [
+        (start + i * period, end + i * period, load) for i in range(first, last + 1)
+    ]
+
+
+def _peak(intervals: list, begin: float, finish: float) -> float:
+    """Largest sum of loads of intervals at a moment between begin and finish."""
+    events = []
+    for start, end, load in intervals:
+        start, end = max(start, begin), min(end, finish)
+        if start < end:
+            events.append((start, 1, load))
+            events.append((end, 0, -load))
+    peak = current = 0
+    # intervals ending at a moment are closed before new ones start
+    for _, _, load in sorted(events):
+        current += load
+        peak = max(peak, current)
+    return peak
+
+
+class MasterCoordinator:
+    """Balance the combined peak load of the masters of the domain.
+
+    Each master nests only its own satellites. After a nesting run the
+    master reports its heating window: the part of its pwm loop in which
+    its satellites are open and its peak nested area. Within the slack of
+    its loop the window is shifted to the moment where the other masters
+    add the least load. A single master is never shifted.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Prepare empty coordinator."""
+        self.hass = hass
+        self._logger = logging.getLogger(DOMAIN).getChild("masters")
+        self._satelites: dict[str, set] = {}
+        # entity_id -> (start, end, period, load), times in seconds
+        self._windows: dict[str, tuple] = {}
+        self._shifts: dict[str, float] = {}
+        # satellite entity_id -> callback with its master entity_id
+        self._satelite_listeners: dict[str, Callable[[str], None]] = {}
+
+    @callback
+    def async_register(self, entity_id: str, satelites: set) -> CALLBACK_TYPE:
+        """Add master with its satellites, returns unregister."""
+        for other, other_satelites in self._satelites.items():
+            if shared := satelites & other_satelites:
+                self._logger.warning(
+                    "satellites %s are controlled by both %s and %s",
+                    sorted(shared),
+                    other,
+                    entity_id,
+                )
+        self._satelites[entity_id] = satelites
+        for satelite, action in self._satelite_listeners.items():
+            if satelite.split(".", 1)[1] in satelites:
+                action(entity_id)
+
+        @callback
+        def async_unregister() -> None:
+            self._satelites.pop(entity_id, None)
+            self._windows.pop(entity_id, None)
+            self._shifts.pop(entity_id, None)
+
+        return async_unregister
+
+    @callback
+    def async_track_master(
+        self, entity_id: str, action: Callable[[str], None]
+    ) -> CALLBACK_TYPE:
+        """Call action with the master of a satellite, returns unregister.
+
+        action runs at once when the master is known and otherwise when
+        the master registers
+        """
+        self._satelite_listeners[entity_id] = action
+        name = entity_id.split(".", 1)[1]
+        for master, satelites in self._satelites.items():
+            if name in satelites:
+                action(master)
+                break
+
+        @callback
+        def async_unregister() -> None:
+            self._satelite_listeners.pop(entity_id, None)
+
+        return async_unregister
+
+    def _active_windows(self, exclude: str | None = None) -> list:
+        """Windows of the masters which reported in their last loop."""
+        now = get_clock().time()
+        for entity_id, (_, end, period, _) in list(self._windows.items()):
+            if end + period < now:
+                # master stopped nesting
+                self._windows.pop(entity_id)
+                self._shifts.pop(entity_id, None)
+        return [
+            window
+            for entity_id, window in self._windows.items()
+            if entity_id != exclude
+        ]
+
+    @callback
+    def async_shift(
+        self,
+        entity_id: str,
+        start: float,
+        end: float,
+        period: float,
+        slack: float,
+        load: float,
+    ) -> float:
+        """Shift (sec) of the heating window with the least coinciding load.
+
+        start and end are the times of the window in the coming loop, slack
+        the maximum shift and load the peak nested area of the master
+        """
+        others = self._active_windows(exclude=entity_id)
+        best_shift = 0
+        if others and slack > 0 and end > start:
+            best_cost = None
+            for step in range(MASTER_SHIFT_STEPS + 1):
+                shift = slack * step / MASTER_SHIFT_STEPS
+                begin, finish = start + shift, end + shift
+                intervals = [
+                    interval
+                    for window in others
+                    for interval in _instances(window, begin, finish)
+                ]
+                overlap = sum(
+                    (min(i_end, finish) - max(i_start, begin)) * i_load
+                    for i_start, i_end, i_load in intervals
+                )
+                # lowest peak first, then least coinciding load
+                cost = (round(_peak(intervals, begin, finish), 6), round(overlap, 6))
+                if best_cost is None or cost < best_cost:
+                    best_cost, best_shift = cost, shift
+
+        self._windows[entity_id] = (start + best_shift, end + best_shift, period, load)
+        self._shifts[entity_id] = best_shift
+        self._logger.debug(
+            "%s heating window shifted %.1f sec within slack %.1f sec",
+            entity_id,
+            best_shift,
+            slack,
+        )
+        return best_shift
+
+    def combined_peak(self) -> float:
+        """Largest sum of nested area of all masters in the coming loops."""
+        windows = self._active_windows()
+        if not windows:
+            return 0
+        begin = get_clock().time()
+        finish = begin + max(window[2] for window in windows)
+        intervals = [
+            interval
+            for window in windows
+            for interval in _instances(window, begin, finish)
+        ]
+        return _peak(intervals, begin, finish)
+
+    def stats(self, entity_id: str) -> dict:
+        """Coordination state as seen by a master."""
+        return {
+            "masters": len(self._satelites),
+            "shift": round(self._shifts.get(entity_id, 0), 1),
+            "combined_peak": round(self.combined_peak(), 2),
+        }
+
+
+@callback
+def async_get_master_coordinator(hass: HomeAssistant) -> MasterCoordinator:
+    """Master coordinator of the domain."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_MASTERS not in domain_data:
+        domain_data[DATA_MASTERS] = MasterCoordinator(hass)
+    return domain_data[DATA_MASTERS]
@@ -0,0 +1,87 @@
+"""Compact decision history of a thermostat."""
+from __future__ import annotations
+
+from array import array
+import math
+
+from .clock import get_clock
+
+DECISION_WINDOW = 500  # number of decisions kept
+
+DECISION_FIELDS = (
+    "time",
+    "temperature",
+    "velocity",
+    "setpoint",
+    "outdoor",
+    "pid_p",
+    "pid_i",
+    "pid_d",
+    "wc",
+    "pwm_out",
+    "offset",
+    "master_delay",
+    "switch",
+)
+_FIELD_INDEX = {field: index for index, field in enumerate(DECISION_FIELDS)}
+_EMPTY_ROW = array("d", [math.nan]) * len(DECISION_FIELDS)
+
+# kind of decision
+DECISION_CONTROL = 0  # control output of controller tick
+DECISION_SWITCH = 1  # command sent to switch or valve
+DECISION_KINDS = ("control", "switch")
+
+
+class DecisionLog:
+    """Ring buffer of the recent decisions.
+
+    The values are stored in flat arrays allocated once, a decision
+    overwrites the oldest row when the buffer is full. Values not given are
+    left NaN and omitted from the dump. The standard library arrays keep
+    numpy out of the platform import.
+    """
+
+    def __init__(self, size: int = DECISION_WINDOW) -> None:
+        """Allocate empty buffer."""
+        self._size = size
+        self._values = array("d", [math.nan]) * (size * len(DECISION_FIELDS))
+        self._kinds = array("b", [0]) * size
+        self._index = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Number of decisions kept."""
+        return self._count
+
+    def record(self, kind: int, **values: float | None) -> None:
+        """Store decision with the current time."""
+        row = self._index * len(DECISION_FIELDS)
+        self._values[row : row + len(DECISION_FIELDS)] = _EMPTY_ROW
+        self._values[row] = get_clock().time()
+        for field, value in values.items():
+            if value is not None:
+                self._values[row + _FIELD_INDEX[field]] = value
+        self._kinds[self._index] = kind
+        self._index = (self._index + 1) % self._size
+        self._count = min(self._count + 1, self._size)
+
+    def clear(self) -> None:
+        """Forget all decisions."""
+        self._index = 0
+        self._count = 0
+
+    def recent(self, count: int | None = None) -> list:
+        """Last decisions, newest last."""
+        count = self._count if not count else min(count, self._count)
+        result = []
+        for offset in range(count, 0, -1):
+            index = (self._index - offset) % self._size
+            decision = {"kind": DECISION_KINDS[self._kinds[index]]}
+            row = index * len(DECISION_FIELDS)
+            for field, value in zip(
+                DECISION_FIELDS, self._values[row : row + len(DECISION_FIELDS)]
+            ):
+                if not math.isnan(value):
+                    decision[field] = round(value, 4)
+            result.append(decision)
+        return result
@@ -0,0 +1,158 @@
+"""Scheduled exercise of valves against jamming."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import datetime
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+from .const import DATA_EXERCISE
+
+if TYPE_CHECKING:
+    from .climate import MultiZoneThermostat
+
+
+class ExerciseScheduler:
+    """Exercise the valves of all thermostats in one queue.
+
+    At each check time the valves which have not moved for their passive
+    duration are queued. The valves are opened one after the other with
+    the spacing in between and at most the concurrency limit of valves is
+    open at the same time. A valve which moved since it was queued is
+    skipped.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Prepare empty scheduler."""
+        self.hass = hass
+        self._logger = logging.getLogger(DOMAIN).getChild("exercise")
+        self._entities: dict[tuple, dict] = {}
+        self._unsub_times: dict[tuple, CALLBACK_TYPE] = {}
+        self._limits: dict[str, tuple[int, float]] = {}
+        self._queue = deque()
+        self._running = False
+        self.progress = {"queued": 0, "exercised": 0, "skipped": 0, "failed": 0}
+
+    @property
+    def concurrency(self) -> int:
+        """Most restrictive concurrency of the registered thermostats."""
+        return min((limit[0] for limit in self._limits.values()), default=1)
+
+    @property
+    def spacing(self) -> float:
+        """Largest spacing (sec) of the registered thermostats."""
+        return max((limit[1] for limit in self._limits.values()), default=0)
+
+    @callback
+    def async_register(
+        self,
+        entity: MultiZoneThermostat,
+        check_time: datetime.time,
+        concurrency: int,
+        spacing: datetime.timedelta,
+    ) -> CALLBACK_TYPE:
+        """Exercise valves of thermostat at check time, returns unregister."""
+        key = (check_time.hour, check_time.minute, check_time.second)
+        self._entities.setdefault(key, {})[entity.entity_id] = entity
+        self._limits[entity.entity_id] = (concurrency, spacing.total_seconds())
+        if key not in self._unsub_times:
+            self._unsub_times[key] = get_clock().async_track_time_change(
+                self.hass,
+                self._check_factory(key),
+                hour=key[0],
+                minute=key[1],
+                second=key[2],
+            )
+
+        @callback
+        def async_unregister() -> None:
+            self._limits.pop(entity.entity_id, None)
+            entities = self._entities.get(key, {})
+            entities.pop(entity.entity_id, None)
+            if not entities and key in self._unsub_times:
+                self._unsub_times.pop(key)()
+                self._entities.pop(key, None)
+
+        return async_unregister
+
+    def _check_factory(self, key: tuple):
+        """Check time callback."""
+
+        @callback
+        def async_check(now: datetime.datetime) -> None:
+            self.async_check(key)
+
+        return async_check
+
+    @callback
+    def async_check(self, key: tuple) -> None:
+        """Queue due valves of thermostats with check time."""
+        for entity in list(self._entities.get(key, {}).values()):
+            for hvac_mode in entity.exercise_due():
+                self._queue.append((entity, hvac_mode))
+                self.progress["queued"] += 1
+
+        if self._queue and not self._running:
+            self._running = True
+            self.hass.async_create_background_task(
+                self._async_run(), f"{DOMAIN} valve exercise"
+            )
+
+    async def _async_run(self) -> None:
+        """Exercise queued valves."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+        self._logger.info("exercise of %s valves started", len(self._queue))
+        try:
+            while self._queue:
+                entity, hvac_mode = self._queue.popleft()
+                if tasks and self.spacing:
+                    await get_clock().async_sleep(self.hass, self.spacing)
+                await semaphore.acquire()
+                tasks.append(
+                    asyncio.create_task(
+                        self._async_exercise(entity, hvac_mode, semaphore)
+                    )
+                )
+            await asyncio.gather(*tasks)
+        finally:
+            self._running = False
+        self._logger.info("exercise finished: %s", self.progress)
+
+    async def _async_exercise(
+        self, entity: MultiZoneThermostat, hvac_mode: str, semaphore
+    ) -> None:
+        """Exercise one valve and report progress."""
+        try:
+            if await entity.async_exercise_switch(hvac_mode):
+                self.progress["exercised"] += 1
+            else:
+                self.progress["skipped"] += 1
+        except Exception as err:
+            self.progress["failed"] += 1
+            self._logger.warning(
+                "exercise of %s %s failed: %s", entity.entity_id, hvac_mode, err
+            )
+        finally:
+            semaphore.release()
+
+        self._logger.debug(
+            "exercise %s %s done, %s valves waiting",
+            entity.entity_id,
+            hvac_mode,
+            len(self._queue),
+        )
+
+
+@callback
+def async_get_exercise(hass: HomeAssistant) -> ExerciseScheduler:
+    """Valve exercise scheduler of the domain."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_EXERCISE not in domain_data:
+        domain_data[DATA_EXERCISE] = ExerciseScheduler(hass)
+    return domain_data[DATA_EXERCISE]
@@ -1,12 +1,16 @@
 """module where configuration of climate is handeled."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import copy
+from dataclasses import asdict
 import datetime
 import logging
+from math import ceil, floor
 import time
-
-import numpy as np
+from typing import TYPE_CHECKING
 
 from homeassistant.components.climate import (
-    ATTR_HVAC_MODE,
     ATTR_PRESET_MODE,
     PRESET_NONE,
     HVACMode,
@@ -15,14 +19,14 @@ from homeassistant.const import ATTR_TEMPERATURE, CONF_ENTITY_ID
 from homeassistant.core import State
 from homeassistant.helpers.typing import ConfigType
 
-from . import DOMAIN, pid_controller, pwm_nesting
+from . import DOMAIN, pid_controller
+from .clock import get_clock
 from .const import (
     ATTR_CONTROL_MODE,
     ATTR_CONTROL_OFFSET,
     ATTR_CONTROL_OUTPUT,
     ATTR_CONTROL_PWM_OUTPUT,
     ATTR_DETAILED_OUTPUT,
-    ATTR_EMERGENCY_MODE,
     ATTR_HVAC_DEFINITION,
     ATTR_KA,
     ATTR_KB,
@@ -30,10 +34,11 @@ from .const import (
     ATTR_KI,
     ATTR_KP,
     ATTR_LAST_SWITCH_CHANGE,
+    ATTR_LOOP_BLOCKING,
+    ATTR_NESTING_STATS,
     ATTR_SAT_ALLOWED,
     ATTR_SELF_CONTROLLED,
     ATTR_STUCK_LOOP,
-    ATTR_UPDATE_NEEDED,
     CONF_AREA,
     CONF_CONTINUOUS_LOWER_LOAD,
     CONF_CONTROL_REFRESH_INTERVAL,
@@ -46,6 +51,8 @@ from .const import (
     CONF_MASTER_SCALE_BOUND,
     CONF_MIN_CYCLE_DURATION,
     CONF_MIN_VALVE,
+    CONF_NESTING_RESOLUTION,
+    CONF_NESTING_STRATEGY,
     CONF_ON_OFF_MODE,
     CONF_PASSIVE_SWITCH_DURATION,
     CONF_PASSIVE_SWITCH_OPEN_TIME,
@@ -60,9 +67,11 @@ from .const import (
     CONF_SATELITES,
     CONF_SENSOR_OUT,
     CONF_SWITCH_MODE,
+    CONF_SWITCH_REFRESH,
     CONF_TARGET_TEMP_INIT,
     CONF_TARGET_TEMP_MAX,
     CONF_TARGET_TEMP_MIN,
+    CONF_VALVE_DEADBAND,
     CONF_WC_MODE,
     CONF_WINDOW_OPEN_TEMPDROP,
     PID_CONTROLLER,
@@ -71,6 +80,10 @@ from .const import (
     PWM_UPDATE_CHANGE,
     OperationMode,
 )
+from .satelite_record import SateliteRecord
+
+if TYPE_CHECKING:
+    from .pwm_nesting import Nesting
 
 
 class HVACSetting:
@@ -96,10 +109,9 @@ class HVACSetting:
         self._switch_entity = self._hvac_settings[CONF_ENTITY_ID]
         self.area = area
         self.detailed_output = detailed_output
-        self._store_integral = False
         self._master_delay = 0
 
-        self._last_change = datetime.datetime.now(datetime.UTC)
+        self._last_change = get_clock().now()
 
         self._control_output = {
             ATTR_CONTROL_OFFSET: 0,
@@ -128,6 +140,7 @@ class HVACSetting:
 
         self._satelites = None
         self.nesting = None
+        self.loop_blocking = None
 
         self._stuck_loop = False
 
@@ -191,14 +204,14 @@ class HVACSetting:
 
         elif self.is_hvac_master_mode:
             # nesting of pwm controlled valves
-            start_time = time.time()
+            start_time = time.perf_counter()
             if routine:
-                self.nesting.nest_rooms(self._satelites)
-                self.nesting.distribute_nesting()
+                self.nesting.nest_routine(self._satelites)
                 forced_nest = True
             # update nesting length only to avoid too large shifts
             else:
                 self.nesting.check_pwm(self._satelites, dt=current_offset)
+                self.nesting.update_stats("update")
                 forced_nest = False
             # TODO check offsets when thermostat setpoint is raised
             #  - check offset (input val offset)
@@ -208,16 +221,24 @@ class HVACSetting:
             if new_offsets:
                 self.set_satelite_offset(new_offsets, forced=forced_nest)
 
-            self._logger.debug(
-                "Control calculation dt %.4f sec", time.time() - start_time
-            )
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(
+                    "Control calculation dt %.4f sec", time.perf_counter() - start_time
+                )
 
     def start_master(self, reset: bool = False) -> None:
         """Init the master mode."""
         if reset:
             self._satelites = {}
 
-        self.nesting = pwm_nesting.Nesting(
+        self.nesting = self.new_nesting()
+
+    def new_nesting(self) -> Nesting:
+        """Nesting with current master config."""
+        # numpy based nesting is only loaded when a master is configured
+        from .pwm_nesting import Nesting  # pylint: disable=import-outside-toplevel
+
+        return Nesting(
             self._name,
             operation_mode=self._operation_mode,
             master_pwm=self.pwm_scale,
@@ -225,8 +246,39 @@ class HVACSetting:
             min_load=self.get_min_load,
             pwm_threshold=self.pwm_threshold,
             min_prop_valve_opening=self.get_min_valve_opening,
+            resolution=self._master[CONF_NESTING_RESOLUTION],
+            strategy=self._master[CONF_NESTING_STRATEGY],
         )
 
+    def nesting_snapshot(self) -> tuple[Nesting, dict]:
+        """New nesting and copy of satelite data for an offloaded nesting run."""
+        return self.new_nesting(), {
+            room: copy.copy(record) for room, record in self._satelites.items()
+        }
+
+    def apply_nesting(
+        self,
+        nesting: Nesting | None,
+        coordinate: Callable[[dict], float] | None = None,
+    ) -> None:
+        """Set satelite offsets from offloaded nesting run.
+
+        when no nesting is provided the previous nesting is updated
+        to the current satelite data, coordinate returns the shift of the
+        heating window in the pwm loop
+        """
+        if nesting is None:
+            self.nesting.check_pwm(self._satelites, dt=0)
+            self.nesting.update_stats("fallback")
+        else:
+            self.nesting = nesting
+
+        new_offsets = self.nesting.get_nesting()
+        if coordinate is not None and (window := self.nesting.nesting_window()):
+            new_offsets = self.nesting.set_phase_shift(coordinate(window))
+        if new_offsets:
+            self.set_satelite_offset(new_offsets, forced=True)
+
     def start_pid(self) -> None:
         """Init the PID controller."""
         self._logger.debug("Init pid settings")
@@ -241,7 +293,7 @@ class HVACSetting:
             kp,
             ki,
             kd,
-            time.time,
+            get_clock().time,
             lower_pwm_scale,
             upper_pwm_scale,
         )
@@ -290,9 +342,11 @@ class HVACSetting:
             self._wc[ATTR_CONTROL_PWM_OUTPUT] = min(
                 max(lower_pwm_scale, temp_diff * KA + KB), upper_pwm_scale
             )
-            self._logger.debug(
-                "weather control contribution %.2f", self._wc[ATTR_CONTROL_PWM_OUTPUT]
-            )
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(
+                    "weather control contribution %.2f",
+                    self._wc[ATTR_CONTROL_PWM_OUTPUT],
+                )
 
         else:
             self._logger.warning("no outdoor temperature; continue with previous data")
@@ -300,7 +354,7 @@ class HVACSetting:
     def run_pid(self, force: bool = False) -> None:
         """Calcuate the PID for current timestep."""
         # proportional pid mode
-        if isinstance(self.current_state, (list, tuple, np.ndarray)):
+        if isinstance(self.current_state, (list, tuple)):
             current = self.current_state
             # stop when room cools down too fast
             if self.check_window_open(current[1]):
@@ -355,7 +409,8 @@ class HVACSetting:
                     self.master_delay / self.get_pwm_time.seconds * self.pwm_scale
                 )
 
-            self._logger.debug("control output before rounding %s", control_output)
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug("control output before rounding %s", control_output)
             control_output = get_rounded(
                 control_output, self.pwm_scale / self.pwm_resolution
             )
@@ -520,6 +575,16 @@ class HVACSetting:
         """Return the switch entity."""
         return self._hvac_settings[CONF_SWITCH_MODE]
 
+    @property
+    def get_valve_deadband(self) -> float:
+        """Return the proportional valve position deadband."""
+        return self._hvac_settings[CONF_VALVE_DEADBAND]
+
+    @property
+    def get_switch_refresh(self) -> float:
+        """Return the period (sec) after which a valve position is resent."""
+        return self._hvac_settings[CONF_SWITCH_REFRESH].total_seconds()
+
     @property
     def get_switch_stale(self) -> float | None:
         """Return the switch max passive duration."""
@@ -804,12 +869,9 @@ class HVACSetting:
             self._satelites.pop(sat_name, None)
             update = True
         else:
-            preset = state.attributes.get(ATTR_HVAC_DEFINITION)[state.state][
-                ATTR_PRESET_MODE
-            ]
-            control_mode = state.attributes.get(ATTR_HVAC_DEFINITION)[state.state][
-                ATTR_CONTROL_MODE
-            ]
+            hvac_def = state.attributes.get(ATTR_HVAC_DEFINITION)[state.state]
+            preset = hvac_def[ATTR_PRESET_MODE]
+            control_mode = hvac_def[ATTR_CONTROL_MODE]
 
             if (
                 preset == PRESET_EMERGENCY
@@ -820,49 +882,57 @@ class HVACSetting:
                 update = True
 
             else:
-                self._logger.debug("Save update from '%s'", state)
-                pwm_time = state.attributes.get(ATTR_HVAC_DEFINITION)[state.state][
-                    CONF_PWM_DURATION
-                ]
-                pwm_scale = state.attributes.get(ATTR_HVAC_DEFINITION)[state.state][
-                    CONF_PWM_SCALE
-                ]
+                if self._logger.isEnabledFor(logging.DEBUG):
+                    self._logger.debug("Save update from '%s'", state)
                 setpoint = state.attributes[ATTR_TEMPERATURE]
-                time_offset, control_value = state.attributes.get(ATTR_HVAC_DEFINITION)[
-                    state.state
-                ][ATTR_CONTROL_OUTPUT].values()
+                time_offset, control_value = hvac_def[ATTR_CONTROL_OUTPUT].values()
+                record = self._satelites.get(sat_name)
 
                 # check if controller update is needed
-                if sat_name in self._satelites:
-                    old_val = self._satelites[sat_name][ATTR_CONTROL_PWM_OUTPUT]
+                if record is not None:
+                    old_val = record.pwm
                     if old_val == 0:
                         if control_value != 0:
                             update = True
                     elif abs((control_value - old_val) / old_val) > PWM_UPDATE_CHANGE:
                         update = True
 
-                    if setpoint != self._satelites[sat_name][ATTR_TEMPERATURE]:
+                    if setpoint != record.setpoint:
                         update = True
 
-                    if self._satelites[sat_name][ATTR_UPDATE_NEEDED]:
+                    if record.update_needed:
                         update = True
 
                 elif control_value > 0:
                     update = True
 
-                self._satelites[sat_name] = {
-                    ATTR_HVAC_MODE: state.state,
-                    ATTR_SELF_CONTROLLED: self_controlled,
-                    ATTR_EMERGENCY_MODE: preset,
-                    ATTR_CONTROL_MODE: control_mode,
-                    CONF_PWM_DURATION: pwm_time,
-                    CONF_PWM_SCALE: pwm_scale,
-                    ATTR_TEMPERATURE: setpoint,
-                    CONF_AREA: area,
-                    ATTR_CONTROL_PWM_OUTPUT: control_value,
-                    ATTR_CONTROL_OFFSET: time_offset,
-                    ATTR_UPDATE_NEEDED: update,
-                }
+                if record is None:
+                    self._satelites[sat_name] = SateliteRecord(
+                        hvac_mode=state.state,
+                        self_controlled=self_controlled,
+                        preset_mode=preset,
+                        control_mode=control_mode,
+                        pwm_duration=hvac_def[CONF_PWM_DURATION],
+                        pwm_scale=hvac_def[CONF_PWM_SCALE],
+                        setpoint=setpoint,
+                        area=area,
+                        pwm=control_value,
+                        offset=time_offset,
+                        update_needed=update,
+                    )
+                else:
+                    # update in place
+                    record.hvac_mode = state.state
+                    record.self_controlled = self_controlled
+                    record.preset_mode = preset
+                    record.control_mode = control_mode
+                    record.pwm_duration = hvac_def[CONF_PWM_DURATION]
+                    record.pwm_scale = hvac_def[CONF_PWM_SCALE]
+                    record.setpoint = setpoint
+                    record.area = area
+                    record.pwm = control_value
+                    record.offset = time_offset
+                    record.update_needed = update
 
         self._logger.debug("Satellite data requires controller update: %s", update)
         return update
@@ -882,12 +952,12 @@ class HVACSetting:
         """PWM offsets for satelites."""
         self._logger.debug("get sat offsets")
         tmp_dict = {}
-        for room, data in self._satelites.items():
-            if data[ATTR_UPDATE_NEEDED] is True:
+        for room, record in self._satelites.items():
+            if record.update_needed is True:
                 # only reset update for on-off valves
                 # such that prop valves keep scaling to new master pwm
-                data[ATTR_UPDATE_NEEDED] = False
-                tmp_dict[room] = data[ATTR_CONTROL_OFFSET]
+                record.update_needed = False
+                tmp_dict[room] = record.offset
         return tmp_dict
 
     def restore_satelites(self) -> None:
@@ -898,11 +968,11 @@ class HVACSetting:
     def set_satelite_offset(self, new_offsets: dict, forced: bool = True) -> None:
         """Store offset per satelite."""
         for room, offset in new_offsets.items():
-            if room in self._satelites:
-                # if self._satelites[room][ATTR_CONTROL_OFFSET] != offset or forced_update:
-                if forced or self._satelites[room][ATTR_CONTROL_OFFSET] != offset:
-                    self._satelites[room][ATTR_UPDATE_NEEDED] = True
-                self._satelites[room][ATTR_CONTROL_OFFSET] = offset
+            record = self._satelites.get(room)
+            if record is not None:
+                if forced or record.offset != offset:
+                    record.update_needed = True
+                record.offset = offset
 
     @property
     def get_control_mode(self) -> str:
@@ -964,12 +1034,35 @@ class HVACSetting:
         else:
             return False
 
+    @property
+    def get_decision_values(self) -> dict:
+        """Inputs and control output of the last calculation."""
+        values = {
+            "temperature": self.current_temperature,
+            "setpoint": self.target_temperature,
+            "outdoor": self.outdoor_temperature,
+            "pwm_out": self._control_output[ATTR_CONTROL_PWM_OUTPUT],
+            "offset": self._control_output[ATTR_CONTROL_OFFSET],
+            "master_delay": self.master_delay,
+        }
+        if isinstance(self.current_state, (list, tuple)):
+            values["velocity"] = self.current_state[1]
+        if self.is_hvac_proportional_mode:
+            if self.is_prop_pid_mode:
+                pid_parts = self._pid_cntrl.get_PID_parts
+                values["pid_p"] = pid_parts["p"]
+                values["pid_i"] = pid_parts["i"]
+                values["pid_d"] = pid_parts["d"]
+            if self.is_wc_mode:
+                values["wc"] = self._wc[ATTR_CONTROL_PWM_OUTPUT]
+        return values
+
     @property
     def get_variable_attr(self) -> ConfigType:
         """Return attributes for climate entity."""
         open_window = None
         if (
-            isinstance(self.current_state, (list, tuple, np.ndarray))
+            isinstance(self.current_state, (list, tuple))
             and self.is_hvac_proportional_mode
         ):
             current = self.current_state
@@ -991,6 +1084,9 @@ class HVACSetting:
         if self.is_hvac_master_mode:
             tmp_dict[CONF_SATELITES] = self.get_satelites
             tmp_dict[CONF_MASTER_OPERATION_MODE] = self._operation_mode
+            if self.detailed_output:
+                tmp_dict[ATTR_NESTING_STATS] = self.nesting.stats
+                tmp_dict[ATTR_LOOP_BLOCKING] = self.loop_blocking
 
         if self.is_hvac_proportional_mode:
             if self.is_prop_pid_mode:
@@ -1004,11 +1100,6 @@ class HVACSetting:
                         tmp_dict["PID_valve_pos"] = round(
                             self._pid[ATTR_CONTROL_PWM_OUTPUT], 3
                         )
-                    elif self._store_integral:
-                        tmp_dict["PID_P"] = None
-                        tmp_dict["PID_I"] = round(PID_parts["i"], 3)
-                        tmp_dict["PID_D"] = None
-                        tmp_dict["PID_valve_pos"] = None
 
             if self.is_wc_mode:
                 tmp_dict["ab_values"] = self.get_ka_kb_param
@@ -1020,14 +1111,11 @@ class HVACSetting:
                     tmp_dict["wc_valve_pos"] = None
         return tmp_dict
 
-    def restore_reboot(
-        self, data: ConfigType, restore_parameters: bool, restore_integral: bool
-    ) -> None:
+    def restore_reboot(self, data: ConfigType, restore_parameters: bool) -> None:
         """Restore attributes for climate entity."""
-        self._store_integral = restore_integral
         self.target_temperature = data[ATTR_TEMPERATURE]
-        self.switch_last_change = datetime.datetime.strptime(
-            data[ATTR_LAST_SWITCH_CHANGE], "%Y-%m-%dT%H:%M:%S.%f%z"
+        self.switch_last_change = datetime.datetime.fromisoformat(
+            data[ATTR_LAST_SWITCH_CHANGE]
         )
 
         if self.is_prop_pid_mode:
@@ -1035,19 +1123,43 @@ class HVACSetting:
                 kp, ki, kd = data["PID_values"]  # pylint: disable=invalid-name
                 self.set_pid_param(kp=kp, ki=ki, kd=kd, update=True)
 
-        if restore_integral:
-            if self.is_prop_pid_mode:
-                if "PID_integral" in data:
-                    self.set_integral(data["PID_integral"])
-
         if self._pid:
             self.pid_reset_time()
 
+    def get_store_data(self) -> dict:
+        """Controller state to resume after restart."""
+        data = {ATTR_LAST_SWITCH_CHANGE: self.switch_last_change.isoformat()}
+        if self.is_prop_pid_mode:
+            data["PID_integral"] = self.get_integral
+        if self.is_hvac_master_mode and self._satelites:
+            data[CONF_SATELITES] = {
+                room: asdict(record) for room, record in self._satelites.items()
+            }
+        return data
+
+    def restore_store(self, data: dict, restore_integral: bool) -> None:
+        """Resume controller state from store."""
+        if ATTR_LAST_SWITCH_CHANGE in data:
+            self.switch_last_change = datetime.datetime.fromisoformat(
+                data[ATTR_LAST_SWITCH_CHANGE]
+            )
+
+        if restore_integral and self.is_prop_pid_mode and "PID_integral" in data:
+            self.set_integral(data["PID_integral"])
+
+    def restore_satelite_table(self, data: dict) -> None:
+        """Resume master with last known satelite demand and offsets."""
+        if not self.is_hvac_master_mode or CONF_SATELITES not in data:
+            return
+        for room, record in data[CONF_SATELITES].items():
+            if room in self.get_satelites and room not in self._satelites:
+                self._satelites[room] = SateliteRecord(**record)
+
 
 def get_rounded(input_val: float, min_clip: float) -> float:
     """Round float to min_clip.
 
-    https://stackoverflow.com/questions/7859147/round-in-numpy-to-nearest-step
+    half steps are rounded up
     """
     scaled = input_val / min_clip
-    return np.where(scaled % 1 >= 0.5, np.ceil(scaled), np.floor(scaled)) * min_clip
+    return (ceil(scaled) if scaled % 1 >= 0.5 else floor(scaled)) * min_clip
@@ -0,0 +1,96 @@
+"""Ingestion of sensor readings before they reach the controller."""
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .clock import get_clock
+
+
+class SensorIngestion:
+    """Drop sensor readings which do not change the control.
+
+    A reading is dropped when equal to the last accepted value (attribute
+    only updates) or within the deadband. Readings arriving within the
+    minimum interval of the last accepted one are delayed; only the latest
+    is passed at the end of the interval.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        handler: Callable[[float], None],
+        deadband: float = 0,
+        min_interval: float = 0,
+    ) -> None:
+        """Prepare ingestion of one sensor."""
+        self.hass = hass
+        self._handler = handler
+        self.deadband = deadband
+        self.min_interval = min_interval
+        self._last_value = None
+        self._last_time = None
+        self._pending = None
+        self._unsub_pending: CALLBACK_TYPE | None = None
+        self.counters = {
+            "accepted": 0,
+            "duplicate": 0,
+            "deadband": 0,
+            "rate_limited": 0,
+            "invalid": 0,
+        }
+
+    @callback
+    def async_invalid(self) -> None:
+        """Count reading which could not be used."""
+        self.counters["invalid"] += 1
+
+    @callback
+    def async_process(self, value: float) -> None:
+        """Pass new reading to handler when it changes the control."""
+        if self._last_value is not None:
+            if value == self._last_value:
+                self.counters["duplicate"] += 1
+                self._pending = None
+                return
+
+            if abs(value - self._last_value) < self.deadband:
+                self.counters["deadband"] += 1
+                self._pending = None
+                return
+
+            wait = self._last_time + self.min_interval - get_clock().monotonic()
+            if wait > 0:
+                self.counters["rate_limited"] += 1
+                self._pending = value
+                if self._unsub_pending is None:
+                    self._unsub_pending = get_clock().async_call_later(
+                        self.hass, wait, self._async_release
+                    )
+                return
+
+        self._accept(value)
+
+    @callback
+    def _async_release(self, _now) -> None:
+        """Pass latest delayed reading."""
+        self._unsub_pending = None
+        if self._pending is not None:
+            value = self._pending
+            self._pending = None
+            self._accept(value)
+
+    def _accept(self, value: float) -> None:
+        """Store and pass reading."""
+        self._last_value = value
+        self._last_time = get_clock().monotonic()
+        self.counters["accepted"] += 1
+        self._handler(value)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Cancel delayed reading."""
+        if self._unsub_pending is not None:
+            self._unsub_pending()
+            self._unsub_pending = None
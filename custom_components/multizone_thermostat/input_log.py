@@ -0,0 +1,139 @@
+"""Recording of the inputs of a thermostat for offline replay.
+
+Each entry is a frame of a 4 byte big-endian length followed by a JSON
+array of time, kind and data. Durations, times and timestamps in the data
+are tagged such that they are restored when read.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+import datetime
+import json
+import os
+import struct
+
+from homeassistant.core import HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+
+INPUT_LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate file above size
+INPUT_LOG_BACKUPS = 3  # number of rotated files kept
+INPUT_LOG_FLUSH = 50  # entries buffered before written
+
+_HEADER = struct.Struct(">I")
+
+
+def _encode(value):
+    """JSON representation of values without JSON type."""
+    if isinstance(value, datetime.timedelta):
+        return {"__timedelta__": value.total_seconds()}
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def _decode(value: dict):
+    """Restore tagged values."""
+    if len(value) == 1:
+        if "__timedelta__" in value:
+            return datetime.timedelta(seconds=value["__timedelta__"])
+        if "__datetime__" in value:
+            return datetime.datetime.fromisoformat(value["__datetime__"])
+        if "__time__" in value:
+            return datetime.time.fromisoformat(value["__time__"])
+    return value
+
+
+def encode_entry(timestamp: float, kind: str, data: dict) -> bytes:
+    """Frame of one entry."""
+    payload = json.dumps(
+        [timestamp, kind, data], default=_encode, separators=(",", ":")
+    ).encode()
+    return _HEADER.pack(len(payload)) + payload
+
+
+def read_inputs(*paths: str) -> Iterator[tuple[float, str, dict]]:
+    """Entries of the log files in the given order (blocking).
+
+    a truncated last frame, e.g. after a crash, is ignored
+    """
+    for path in paths:
+        with open(path, "rb") as file:
+            while len(header := file.read(_HEADER.size)) == _HEADER.size:
+                (length,) = _HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length:
+                    break
+                timestamp, kind, data = json.loads(payload, object_hook=_decode)
+                yield timestamp, kind, data
+
+
+class InputRecorder:
+    """Append input entries to a rotating log file.
+
+    Entries are encoded when recorded and written in the executor in
+    batches. One write is in progress at a time such that the order of
+    the entries is kept.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        path: str,
+        max_bytes: int = INPUT_LOG_MAX_BYTES,
+        backups: int = INPUT_LOG_BACKUPS,
+    ) -> None:
+        """Record to path."""
+        self.hass = hass
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._buffer: list[bytes] = []
+        self._writing = False
+        self.count = 0
+
+    @callback
+    def record(self, kind: str, data: dict) -> None:
+        """Add entry with the current time."""
+        self._buffer.append(encode_entry(get_clock().time(), kind, data))
+        self.count += 1
+        if len(self._buffer) >= INPUT_LOG_FLUSH:
+            self.async_flush()
+
+    @callback
+    def async_flush(self) -> None:
+        """Write buffered entries."""
+        if self._buffer and not self._writing:
+            self._writing = True
+            self.hass.async_create_background_task(
+                self._async_write(), f"{DOMAIN} input log"
+            )
+
+    async def _async_write(self) -> None:
+        """Write batches until the buffer is empty."""
+        try:
+            while self._buffer:
+                batch, self._buffer = self._buffer, []
+                await self.hass.async_add_executor_job(self._write, batch)
+        finally:
+            self._writing = False
+
+    def _write(self, batch: list[bytes]) -> None:
+        """Append batch and rotate when full (blocking)."""
+        with open(self.path, "ab") as file:
+            file.write(b"".join(batch))
+            size = file.tell()
+        if size < self._max_bytes:
+            return
+        for index in range(self._backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self._backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
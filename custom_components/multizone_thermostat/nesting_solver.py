@@ -0,0 +1,111 @@
+"""Anytime beam search packing for the nesting routine.
+
+Rooms are rectangles of area (rows) and pwm (columns) which are placed in
+time within the nesting pwm length. The search minimises the peak
+simultaneous area and secondly the balance of the area over the pwm.
+The beam is widened each pass until the deadline, the best complete
+packing found so far is returned.
+"""
+
+import numpy as np
+
+from .clock import get_clock
+
+
+def profile_score(load: np.ndarray) -> tuple[int, float]:
+    """Peak and absolute balance of the area per pwm step."""
+    total = load.sum()
+    if total == 0:
+        return 0, 0.0
+
+    # idle moments are the worst balance, equal to Nesting.nesting_balance
+    if (load == 0).any():
+        return int(load.max()), 1.0
+
+    length = len(load)
+    balance = (np.arange(length) @ load / total - (length - 1) / 2) / length
+    return int(load.max()), abs(float(balance))
+
+
+def beam_pass(
+    area: list, pwm: list, length: int, width: int, deadline: float
+) -> tuple[list, tuple] | None:
+    """Place rooms in given order keeping the best partial packings.
+
+    partial packings are ranked on peak area and sum of squared area per pwm
+    step (levelling), returns None when the deadline passed
+    """
+    # state: area per pwm step, sum of squares, room start times
+    beam = [(np.zeros(length, dtype=int), 0, ())]
+
+    for area_i, pwm_i in zip(area, pwm):
+        if get_clock().monotonic() > deadline:
+            return None
+
+        pwm_i = min(pwm_i, length)
+        n_start = length - pwm_i + 1
+        window = np.arange(n_start)[:, None] + np.arange(pwm_i)
+
+        candidates = []
+        for load, sum_sq, starts in beam:
+            # max area before and after room for each start time
+            before = np.maximum.accumulate(np.concatenate(([0], load)))[:n_start]
+            after = np.maximum.accumulate(np.append(load, 0)[::-1])[::-1]
+            load_window = load[window]
+
+            peak = np.maximum(
+                np.maximum(before, after[pwm_i : pwm_i + n_start]),
+                load_window.max(axis=1) + area_i,
+            )
+            new_sum_sq = sum_sq + area_i * (2 * load_window.sum(axis=1) + area_i * pwm_i)
+
+            for start in np.lexsort((new_sum_sq, peak))[:width]:
+                candidates.append(
+                    (int(peak[start]), int(new_sum_sq[start]), int(start), load, starts)
+                )
+
+        candidates.sort(key=lambda cand: (cand[0], cand[1]))
+
+        # keep best unique area distributions
+        beam = []
+        unique = set()
+        for _, sum_sq, start, load, starts in candidates:
+            new_load = load.copy()
+            new_load[start : start + pwm_i] += area_i
+            key = new_load.tobytes()
+            if key in unique:
+                continue
+            unique.add(key)
+            beam.append((new_load, sum_sq, (*starts, start)))
+            if len(beam) == width:
+                break
+
+    load, _, starts = min(beam, key=lambda state: profile_score(state[0]))
+    return list(starts), profile_score(load)
+
+
+def beam_search(
+    area: list, pwm: list, length: int, deadline: float, max_width: int
+) -> tuple[list | None, tuple | None, int]:
+    """Start time per room of the best packing found before the deadline.
+
+    area and pwm are in nesting matrix units, deadline in clock monotonic time
+    returns start times, score (peak, balance) and beam width of last
+    completed pass
+    """
+    best_starts = None
+    best_score = None
+    completed = 0
+
+    width = 1
+    while width <= max_width:
+        result = beam_pass(area, pwm, length, width, deadline)
+        if result is None:
+            break
+        starts, score = result
+        if best_score is None or score < best_score:
+            best_starts, best_score = starts, score
+        completed = width
+        width *= 2
+
+    return best_starts, best_score, completed
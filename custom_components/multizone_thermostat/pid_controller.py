@@ -86,11 +86,12 @@ class PIDController:
         # UKF temp + velocity
         if isinstance(input_val, list):
             current_temp, self._differential = input_val
-            self._logger.debug(
-                "current temp '%.2f'; velocity %.4f",
-                current_temp,
-                self._differential,
-            )
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(
+                    "current temp '%.2f'; velocity %.4f",
+                    current_temp,
+                    self._differential,
+                )
         # when only current temp is provided
         else:
             current_temp = input_val
@@ -112,13 +113,14 @@ class PIDController:
         self._last_output = max(self._last_output, self._out_min)
 
         # Log some debug info
-        self._logger.debug(
-            "Contribution P: %.4f; I: %.4f; D: %.4f; Output: %.2f",
-            self.p_var,
-            self.i_var,
-            self.d_var,
-            self._last_output,
-        )
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(
+                "Contribution P: %.4f; I: %.4f; D: %.4f; Output: %.2f",
+                self.p_var,
+                self.i_var,
+                self.d_var,
+                self._last_output,
+            )
 
         # fully open if error is too high
         if (  # heating
@@ -15,6 +15,8 @@ import homeassistant.helpers.config_validation as cv
 from . import validations as val
 from .const import (
     CONF_AREA,
+    CONF_COMMAND_BATCH_WINDOW,
+    CONF_COMMAND_STAGGER,
     CONF_CONTINUOUS_LOWER_LOAD,
     CONF_CONTROL_REFRESH_INTERVAL,
     CONF_DETAILED_OUTPUT,
@@ -38,8 +40,12 @@ from .const import (
     CONF_MASTER_SCALE_BOUND,
     CONF_MIN_CYCLE_DURATION,
     CONF_MIN_VALVE,
+    CONF_NESTING_RESOLUTION,
+    CONF_NESTING_STRATEGY,
     CONF_ON_OFF_MODE,
     CONF_PASSIVE_CHECK_TIME,
+    CONF_PASSIVE_CONCURRENCY,
+    CONF_PASSIVE_SPACING,
     CONF_PASSIVE_SWITCH_CHECK,
     CONF_PASSIVE_SWITCH_DURATION,
     CONF_PASSIVE_SWITCH_OPEN_TIME,
@@ -54,15 +60,21 @@ from .const import (
     CONF_PWM_THRESHOLD,
     CONF_SATELITES,
     CONF_SENSOR,
+    CONF_SENSOR_DEADBAND,
+    CONF_SENSOR_MIN_INTERVAL,
     CONF_SENSOR_OUT,
     CONF_STALE_DURATION,
     CONF_SWITCH_MODE,
+    CONF_SWITCH_REFRESH,
     CONF_TARGET_TEMP_INIT,
     CONF_TARGET_TEMP_MAX,
     CONF_TARGET_TEMP_MIN,
+    CONF_VALVE_DEADBAND,
     CONF_WC_MODE,
     CONF_WINDOW_OPEN_TEMPDROP,
     DEFAULT_AREA,
+    DEFAULT_COMMAND_BATCH_WINDOW,
+    DEFAULT_COMMAND_STAGGER,
     DEFAULT_DETAILED_OUTPUT,
     DEFAULT_INCLUDE_VALVE_LAG,
     DEFAULT_MASTER_SCALE_BOUND,
@@ -76,6 +88,8 @@ from .const import (
     DEFAULT_OLD_STATE,
     DEFAULT_OPERATION,
     DEFAULT_PASSIVE_CHECK_TIME,
+    DEFAULT_PASSIVE_CONCURRENCY,
+    DEFAULT_PASSIVE_SPACING,
     DEFAULT_PASSIVE_SWITCH,
     DEFAULT_PASSIVE_SWITCH_OPEN_TIME,
     DEFAULT_PWM,
@@ -83,12 +97,20 @@ from .const import (
     DEFAULT_PWM_SCALE,
     DEFAULT_RESTORE_INTEGRAL,
     DEFAULT_RESTORE_PARAMETERS,
+    DEFAULT_SENSOR_DEADBAND,
     DEFAULT_SENSOR_FILTER,
+    DEFAULT_SWITCH_REFRESH,
     DEFAULT_TARGET_TEMP_COOL,
     DEFAULT_TARGET_TEMP_HEAT,
+    DEFAULT_VALVE_DEADBAND,
     NC_SWITCH_MODE,
+    NESTING_ADAPTIVE,
+    NESTING_MATRIX,
+    NESTING_MATRIX_MAX,
+    NESTING_MATRIX_MIN,
     NO_SWITCH_MODE,
     NestingMode,
+    NestingStrategy,
     OperationMode,
 )
 
@@ -106,6 +128,12 @@ hvac_control_options = {
     vol.Optional(
         CONF_PASSIVE_SWITCH_OPEN_TIME, default=DEFAULT_PASSIVE_SWITCH_OPEN_TIME
     ): vol.All(cv.time_period, cv.positive_timedelta),
+    vol.Optional(CONF_VALVE_DEADBAND, default=DEFAULT_VALVE_DEADBAND): vol.All(
+        vol.Coerce(float), vol.Range(min=0)
+    ),
+    vol.Optional(CONF_SWITCH_REFRESH, default=DEFAULT_SWITCH_REFRESH): vol.All(
+        cv.time_period, cv.positive_timedelta
+    ),
     vol.Optional(CONF_EXTRA_PRESETS, default={}): vol.Schema(dict),
 }
 
@@ -213,6 +241,16 @@ master = {
             vol.Optional(CONF_MIN_VALVE, default=DEFAULT_MIN_VALVE_PWM): vol.Coerce(
                 float
             ),
+            vol.Optional(CONF_NESTING_RESOLUTION, default=NESTING_MATRIX): vol.Any(
+                NESTING_ADAPTIVE,
+                vol.All(
+                    vol.Coerce(int),
+                    vol.Range(min=NESTING_MATRIX_MIN, max=NESTING_MATRIX_MAX),
+                ),
+            ),
+            vol.Optional(
+                CONF_NESTING_STRATEGY, default=NestingStrategy.FIRST_FIT
+            ): vol.In([NestingStrategy.FIRST_FIT, NestingStrategy.BEAM_SEARCH]),
         }
     )
 }
@@ -263,12 +301,30 @@ PLATFORM_SCHEMA = vol.All(
             vol.Optional(CONF_STALE_DURATION): vol.All(
                 cv.time_period, cv.positive_timedelta
             ),
+            vol.Optional(
+                CONF_SENSOR_DEADBAND, default=DEFAULT_SENSOR_DEADBAND
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_SENSOR_MIN_INTERVAL): vol.All(
+                cv.time_period, cv.positive_timedelta
+            ),
             vol.Optional(
                 CONF_PASSIVE_SWITCH_CHECK, default=DEFAULT_PASSIVE_SWITCH
             ): cv.boolean,
             vol.Optional(
                 CONF_PASSIVE_CHECK_TIME, default=DEFAULT_PASSIVE_CHECK_TIME
             ): vol.Datetime(format="%H:%M"),
+            vol.Optional(
+                CONF_PASSIVE_CONCURRENCY, default=DEFAULT_PASSIVE_CONCURRENCY
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(
+                CONF_PASSIVE_SPACING, default=DEFAULT_PASSIVE_SPACING
+            ): vol.All(cv.time_period, cv.positive_timedelta),
+            vol.Optional(
+                CONF_COMMAND_BATCH_WINDOW, default=DEFAULT_COMMAND_BATCH_WINDOW
+            ): vol.All(cv.time_period, cv.positive_timedelta),
+            vol.Optional(
+                CONF_COMMAND_STAGGER, default=DEFAULT_COMMAND_STAGGER
+            ): vol.All(cv.time_period, cv.positive_timedelta),
             vol.Optional(CONF_ENABLE_OLD_STATE, default=DEFAULT_OLD_STATE): cv.boolean,
             vol.Optional(
                 CONF_ENABLE_OLD_PARAMETERS, default=DEFAULT_RESTORE_PARAMETERS
@@ -0,0 +1,96 @@
+"""Profiling of the control ticks of a live thermostat."""
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+
+PROFILE_TOP = 50  # functions in the text summary
+
+# cProfile supports one active profiler, hence one thermostat at a time
+_running: TickProfiler | None = None
+
+
+class TickProfiler:
+    """Run cProfile around the next control and pwm ticks.
+
+    The profiler is enabled when the first of overlapping ticks starts
+    and disabled when the last of them ends. Await points of a tick
+    include other work of the event loop. Only ticks started while
+    profiling count, after the requested number of ticks the profile is
+    handed over to be written and profiling stops.
+    """
+
+    def __init__(self) -> None:
+        """Prepare idle profiler."""
+        self._profile: cProfile.Profile | None = None
+        self._remaining = 0  # ticks still to start
+        self._active = 0  # profiled ticks running
+        self.path = None
+
+    @property
+    def active(self) -> bool:
+        """Profiling is running."""
+        return self._profile is not None
+
+    def start(self, ticks: int, path: str) -> None:
+        """Profile the next ticks and write stats to path."""
+        global _running  # pylint: disable=global-statement
+        if _running is not None and _running is not self:
+            raise RuntimeError("profiling of another thermostat is running")
+        _running = self
+        self._profile = cProfile.Profile()
+        self._remaining = ticks
+        self._active = 0
+        self.path = path
+
+    def start_tick(self) -> cProfile.Profile | None:
+        """Enable profiler for a tick, returns the profile when profiled."""
+        if self._profile is None or self._remaining <= 0:
+            return None
+        if not self._active:
+            self._profile.enable()
+        self._active += 1
+        self._remaining -= 1
+        return self._profile
+
+    def end_tick(
+        self, profile: cProfile.Profile | None
+    ) -> tuple[cProfile.Profile, str] | None:
+        """Close tick started with profile.
+
+        returns profile and path when the last requested tick ended
+        """
+        if profile is None or profile is not self._profile:
+            # tick not profiled or profiling stopped meanwhile
+            return None
+        self._active -= 1
+        if self._active:
+            return None
+        self._profile.disable()
+        if self._remaining > 0:
+            return None
+        return self.stop()
+
+    def stop(self) -> tuple[cProfile.Profile, str] | None:
+        """Stop profiling, returns profile and path."""
+        global _running  # pylint: disable=global-statement
+        if self._profile is None:
+            return None
+        if self._active:
+            self._profile.disable()
+            self._active = 0
+        profile, self._profile = self._profile, None
+        if _running is self:
+            _running = None
+        return profile, self.path
+
+
+def write_stats(profile: cProfile.Profile, path: str) -> None:
+    """Write binary stats and text summary (blocking)."""
+    profile.dump_stats(path)
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP)
+    with open(path + ".txt", "w", encoding="utf-8") as file:
+        file.write(summary.getvalue())
@@ -14,21 +14,26 @@ import time
 import numpy as np
 
 from . import DOMAIN
+from .clock import get_clock
 from .const import (
     ATTR_CONTROL_OFFSET,
     ATTR_CONTROL_PWM_OUTPUT,
-    ATTR_ROOMS,
-    ATTR_ROUNDED_PWM,
-    ATTR_SCALED_PWM,
-    CONF_AREA,
-    CONF_PWM_DURATION,
-    CONF_PWM_SCALE,
+    NESTING_ADAPTIVE,
+    NESTING_ADAPTIVE_CELLS,
+    NESTING_ADAPTIVE_STEP,
     NESTING_BALANCE,
+    NESTING_BEAM_WIDTH,
     NESTING_DOMINANCE,
+    NESTING_FLIP_OPTIONS,
     NESTING_MARGIN,
     NESTING_MATRIX,
+    NESTING_MATRIX_MAX,
+    NESTING_MATRIX_MIN,
+    NESTING_SOLVER_DEADLINE,
     NestingMode,
+    NestingStrategy,
 )
+from .nesting_solver import beam_search
 
 
 class Nesting:
@@ -43,26 +48,44 @@ class Nesting:
         min_load: float,
         pwm_threshold: float,
         min_prop_valve_opening: float,
+        resolution: int | str = NESTING_MATRIX,
+        strategy: NestingStrategy = NestingStrategy.FIRST_FIT,
     ) -> None:
         """Prepare nesting config.
 
         pwm max is equal to pwm scale
         all provided pwm per room are equal in pwm scale
+        resolution is the nesting matrix size or 'adaptive'
+        strategy is the packing routine used at start of pwm loop
         """
         self._logger = logging.getLogger(DOMAIN).getChild(name + ".nesting")
         self.operation_mode = operation_mode
+        self.strategy = strategy
+        self.beam_width = None
 
         self.master_pwm = master_pwm
-        self.master_pwm_scale = NESTING_MATRIX / self.master_pwm
-        self.min_area = min_load * NESTING_MATRIX
-        self.pwm_threshold = pwm_threshold / self.master_pwm * NESTING_MATRIX
-        self.min_prop_valve_opening = min_prop_valve_opening * NESTING_MATRIX
-        self.area_scale = NESTING_MATRIX / tot_area
+        self.tot_area = tot_area
+        self.min_load = min_load
+        self.master_pwm_threshold = pwm_threshold
+        self.min_prop_valve = min_prop_valve_opening
+
+        self.resolution = resolution
+        if resolution == NESTING_ADAPTIVE:
+            self.set_matrix(NESTING_MATRIX)
+        else:
+            self.set_matrix(int(resolution))
+
+        self.stats = {}
 
         self.packed = []
+        # room -> (lid, first row, end row, first column, end column)
+        self._locations = None
+        self._sparse_lids = set()  # lids with cleared cells to compact
         self.scale_factor = {}
         self.offset = {}
         self.cleaned_rooms = []
+        self._master_bounds = None  # first and end column of nested rooms
+        self.phase_shift = 0  # shift of the nesting in pwm steps by coordinator
         self.area = []
         self.rooms = []
         self.pwm = []
@@ -73,6 +96,71 @@ class Nesting:
         self.prop_pwm = []
         self.prop_area = []
 
+    def set_matrix(self, matrix: int) -> None:
+        """Set nesting resolution and scale the master settings to it.
+
+        matrix defines both the pwm time steps and the area steps
+        """
+        self.matrix = matrix
+        self.master_pwm_scale = self.matrix / self.master_pwm
+        self.min_area = self.min_load * self.matrix
+        self.pwm_threshold = self.master_pwm_threshold / self.master_pwm * self.matrix
+        self.min_prop_valve_opening = self.min_prop_valve * self.matrix
+        self.area_scale = self.matrix / self.tot_area
+
+    def adaptive_matrix(self, sat_data: dict) -> int:
+        """Nesting resolution based on the number of active on-off rooms.
+
+        many rooms: coarser grid to bound compute time
+        few rooms: finer grid to improve packing
+        """
+        active_rooms = sum(
+            1 for data in sat_data.values() if data.pwm_duration > 0 and data.pwm > 0
+        )
+        if active_rooms == 0:
+            return self.matrix
+
+        matrix = NESTING_ADAPTIVE_CELLS / active_rooms
+        # round to whole percentages steps of the pwm cycle
+        matrix = NESTING_ADAPTIVE_STEP * round(matrix / NESTING_ADAPTIVE_STEP)
+        return int(min(max(matrix, NESTING_MATRIX_MIN), NESTING_MATRIX_MAX))
+
+    def peak_load(self, packed: list | None = None) -> float:
+        """Maximum nested area at a moment as fraction of total area."""
+        if packed is None:
+            packed = self.packed
+        if not packed:
+            return 0
+        length = max(lid.shape[1] for lid in packed)
+        load = [0] * length
+        for lid in packed:
+            for i_2 in range(lid.shape[1]):
+                load[i_2] += sum(cell is not None for cell in lid[:, i_2])
+        return max(load) / self.matrix
+
+    def packing_score(self, packed: list) -> tuple[float, float]:
+        """Peak load and absolute balance of a packing, lower is better."""
+        balance = self.nesting_balance(packed)
+        return self.peak_load(packed), abs(balance) if balance is not None else 0
+
+    def update_stats(self, routine: str) -> None:
+        """Store cost and quality of last nesting run."""
+        balance = self.nesting_balance(self.packed)
+        self.stats = {
+            "routine": routine,
+            "strategy": self.strategy,
+            "duration": round(time.perf_counter() - self.start_time, 4),
+            "matrix": self.matrix,
+            "rooms": sum(1 for pwm in self.pwm if pwm > 0),
+            "lids": len(self.packed),
+            "balance": round(balance, 4) if balance is not None else None,
+            "peak_load": round(self.peak_load(), 3),
+        }
+        if self.strategy == NestingStrategy.BEAM_SEARCH:
+            self.stats["beam_width"] = self.beam_width
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("nesting run %s", self.stats)
+
     @property
     def load_on_off(self):
         """Nesting sum product of room area and pwm."""
@@ -99,7 +187,7 @@ class Nesting:
     @property
     def area_avg_prop(self):
         """Continuous heat request from rooms with prop valves."""
-        return self.load_prop / NESTING_MATRIX
+        return self.load_prop / self.matrix
 
     @property
     def max_all_pwm(self):
@@ -199,7 +287,7 @@ class Nesting:
 
     def pwm_for_minimum_mode(self):
         """Calculate nesting pwm for minimal on mode."""
-        nested_pwm = self.load_on_off / NESTING_MATRIX
+        nested_pwm = self.load_on_off / self.matrix
         return_value = max(self.max_pwm_on_off, nested_pwm)
 
         # pwm is lower than threshold without lower load
@@ -238,7 +326,7 @@ class Nesting:
             in [NestingMode.MASTER_CONTINUOUS, NestingMode.MASTER_BALANCED]
             and self.area_avg_prop > self.min_area > 0
         ):
-            return NESTING_MATRIX
+            return self.matrix
 
         # pwm as high as possible
         if self.operation_mode == NestingMode.MASTER_CONTINUOUS:
@@ -257,15 +345,15 @@ class Nesting:
             return_value = 0
 
         # bound output minimal to max pwm and nesting matrix
-        return_value = min(return_value, NESTING_MATRIX)
+        return_value = min(return_value, self.matrix)
 
         # avoid too short off period when pwm threshold is specified
         if (
             self.pwm_threshold > 0
-            and return_value != NESTING_MATRIX
-            and return_value + self.pwm_threshold > NESTING_MATRIX
+            and return_value != self.matrix
+            and return_value + self.pwm_threshold > self.matrix
         ):
-            return_value = NESTING_MATRIX - self.pwm_threshold
+            return_value = self.matrix - self.pwm_threshold
 
         return int(ceil(return_value))
 
@@ -282,7 +370,7 @@ class Nesting:
             # check new room heat requirement to stretch pwm
             if (
                 max_packed < dt + self.pwm[forced_room]
-                and self.area[forced_room] < 0.15 * NESTING_MATRIX
+                and self.area[forced_room] < 0.15 * self.matrix
             ):
                 return max_packed
             # lengthen nested pwm when new room requires sufficient heat
@@ -299,7 +387,6 @@ class Nesting:
         self.pwm = []
         self.real_pwm = []
         self.scale_factor = {}
-        new_data = {}
 
         self.prop_pwm = []
         self.prop_area = []
@@ -307,53 +394,31 @@ class Nesting:
         if not sat_data:
             return
 
-        new_data = {
-            key: []
-            for key in [CONF_AREA, ATTR_ROOMS, ATTR_ROUNDED_PWM, ATTR_SCALED_PWM]
-        }
-
+        # area, room, rounded pwm and scaled pwm per on-off room
+        on_off = []
         for room, data in sat_data.items():
             # scale room pwm to master
-            scale_factor = (
-                # self.master_pwm / data[CONF_PWM_SCALE] * self.master_pwm_scale
-                NESTING_MATRIX / data[CONF_PWM_SCALE]
-            )
+            scale_factor = self.matrix / data.pwm_scale
             self.scale_factor[room] = scale_factor
+            area = int(ceil(data.area * self.area_scale))
+            scaled_pwm = data.pwm * scale_factor
 
             # ignore proportional valves
-            if data[CONF_PWM_DURATION] > 0:
-                new_data[CONF_AREA].append(int(ceil(data[CONF_AREA] * self.area_scale)))
-                new_data[ATTR_ROUNDED_PWM].append(
-                    int(ceil(data[ATTR_CONTROL_PWM_OUTPUT] * scale_factor))
-                )
-                new_data[ATTR_SCALED_PWM].append(
-                    data[ATTR_CONTROL_PWM_OUTPUT] * scale_factor
-                )
-                new_data[ATTR_ROOMS].append(room)
+            if data.pwm_duration > 0:
+                on_off.append((area, room, int(ceil(scaled_pwm)), scaled_pwm))
             else:
-                self.prop_pwm.append(data[ATTR_CONTROL_PWM_OUTPUT] * scale_factor)
-                self.prop_area.append(int(ceil(data[CONF_AREA] * self.area_scale)))
+                self.prop_pwm.append(scaled_pwm)
+                self.prop_area.append(area)
 
-        if bool([a for a in new_data.values() if a == []]):
+        if not on_off:
             return
 
         # area is constant and thereby sort on area gives
         # more constant routine order, largest room is expected
         # to require most heat thus dominant and most important
-        # self.area, self.rooms, self.pwm, self.real_area, self.real_pwm = zip(
+        on_off.sort(reverse=True)
         self.area, self.rooms, self.pwm, self.real_pwm = (
-            list(x)
-            for x in zip(
-                *sorted(
-                    zip(
-                        new_data[CONF_AREA],
-                        new_data[ATTR_ROOMS],
-                        new_data[ATTR_ROUNDED_PWM],
-                        new_data[ATTR_SCALED_PWM],
-                    ),
-                    reverse=True,
-                )
-            )
+            list(x) for x in zip(*on_off)
         )
 
     def lid_segment(self, dt: int = None, forced_room: int | None = None) -> list:
@@ -379,7 +444,7 @@ class Nesting:
             time_shift = dt
             if (
                 self.max_nested_pwm() < time_shift
-                and self.area[room_index] < 0.15 * NESTING_MATRIX
+                and self.area[room_index] < 0.15 * self.matrix
             ):
                 return
             forced_room = room_index
@@ -407,6 +472,14 @@ class Nesting:
             time_shift:max_len,
         ] = self.rooms[room_index]
         self.packed.append(new_lid)
+        if self._locations is not None:
+            self._locations[self.rooms[room_index]] = (
+                len(self.packed) - 1,
+                0,
+                new_lid.shape[0],
+                time_shift,
+                max_len,
+            )
 
     def insert_room(self, room_index: int, dt: int = 0) -> bool:
         """Insert room to current nesting and return success."""
@@ -500,15 +573,21 @@ class Nesting:
                 if not final_opt:
                     return nested
 
-                # when multiple storage options are present select the one with best fit
-                if len(final_opt) > 1:
-                    fill_list = np.array(final_opt, dtype=object)[:, 4]
-                    best_index = fill_list.tolist().index(max(fill_list))
-                    lid_i, y_width, _, x_start, _ = final_opt[best_index]
-
-                # one option thus no choice
-                elif len(final_opt[0]) == 5 and final_opt[0][-1] != -1:
-                    lid_i, y_width, _, x_start, _ = final_opt[0]
+                # select the best fit of which the room area-pwm is still free
+                # as free space is not contiguous after rooms were updated
+                final_opt.sort(key=lambda option: option[4], reverse=True)
+                for option in final_opt:
+                    lid = self.packed[option[0]]
+                    col_start = np.shape(lid)[1] - option[1]
+                    if (
+                        lid[
+                            option[3] : option[3] + self.area[room_index],
+                            col_start : col_start + self.pwm[room_index],
+                        ]
+                        == None  # noqa: E711
+                    ).all():
+                        lid_i, y_width, _, x_start, _ = option
+                        break
 
                 # nest best found free space option with current room area-pwm
                 if lid_i is not None:
@@ -520,12 +599,22 @@ class Nesting:
 
                     # fill area segments and pwm space with room id
                     try:
+                        col_start = np.shape(mod_lid)[1] - y_width
                         mod_lid[
                             x_start : x_start + self.area[room_index],
-                            np.shape(mod_lid)[1] - y_width : np.shape(mod_lid)[1]
-                            - y_width
-                            + self.pwm[room_index],
+                            col_start : col_start + self.pwm[room_index],
                         ] = self.rooms[room_index]
+                        if self._locations is not None:
+                            self._locations[self.rooms[room_index]] = (
+                                lid_i,
+                                x_start,
+                                x_start + self.area[room_index],
+                                col_start,
+                                min(
+                                    col_start + self.pwm[room_index],
+                                    np.shape(mod_lid)[1],
+                                ),
+                            )
                     except IndexError as e:
                         nested = False
                         mod_lid = lid_bckup
@@ -535,16 +624,34 @@ class Nesting:
 
     def nest_rooms(self, data: dict = None) -> None:
         """Nest the rooms to get balanced heat requirement."""
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         self.packed = []
+        self._locations = None
+        self._sparse_lids = set()
         self.cleaned_rooms = []
         self.offset = {}
+        self._master_bounds = None
+        self.phase_shift = 0
+
+        # resolution is only changed at start of pwm loop
+        if self.resolution == NESTING_ADAPTIVE and data:
+            matrix = self.adaptive_matrix(data)
+            if matrix != self.matrix:
+                self._logger.debug("nesting resolution changed to %s", matrix)
+                self.set_matrix(matrix)
 
         self.satelite_data(data)
 
         if self.area is None or all(pwm == 0 for pwm in self.pwm):
             return
 
+        if self.strategy == NestingStrategy.BEAM_SEARCH:
+            self.pack_beam_search()
+        else:
+            self.pack_first_fit()
+
+    def pack_first_fit(self) -> None:
+        """Nest rooms in order of area in the first free space that fits."""
         # loop through rooms
         # and create 2D arrays nested with room area-pwm
         # the maximum row size (pwm) is pwm_max
@@ -561,10 +668,80 @@ class Nesting:
                 # no option thus create new lid to store room pwm
                 self.create_lid(i_r)
 
+    def pack_beam_search(self) -> None:
+        """Nest rooms by beam search on start time per room.
+
+        the balanced first fit nesting is the initial best packing and
+        is kept when the search does not improve peak load or balance
+        """
+        deadline = get_clock().monotonic() + NESTING_SOLVER_DEADLINE
+        self.pack_first_fit()
+        self.distribute_lids()
+
+        length = self.pwm_for_nesting
+        room_index = [i_r for i_r, pwm in enumerate(self.pwm) if pwm > 0]
+        if length == 0 or not room_index:
+            self.beam_width = 0
+            return
+
+        starts, _, self.beam_width = beam_search(
+            [self.area[i_r] for i_r in room_index],
+            [self.pwm[i_r] for i_r in room_index],
+            length,
+            deadline,
+            NESTING_BEAM_WIDTH,
+        )
+        if starts is None:
+            self._logger.debug("beam search deadline passed, first fit is used")
+            return
+
+        packed = self.lids_from_starts(room_index, starts, length)
+        if self.packing_score(packed) < self.packing_score(self.packed):
+            self.packed = packed
+            self._locations = None
+
+    def lids_from_starts(self, room_index: list, starts: list, length: int) -> list:
+        """Fill lids with the room area-pwm at given start times."""
+        packed = []
+        for i_r, start in zip(room_index, starts):
+            area = self.area[i_r]
+            end = min(start + self.pwm[i_r], length)
+            nested = False
+            # find adjacent area segments which are free during room pwm
+            for lid in packed:
+                free = (lid[:, start:end] == None).all(axis=1)  # noqa: E711
+                for x_start in range(lid.shape[0] - area + 1):
+                    if free[x_start : x_start + area].all():
+                        lid[x_start : x_start + area, start:end] = self.rooms[i_r]
+                        nested = True
+                        break
+                if nested:
+                    break
+
+            if not nested:
+                new_lid = np.full((area, length), None, dtype=object)
+                new_lid[:, start:end] = self.rooms[i_r]
+                packed.append(new_lid)
+        return packed
+
+    def nest_routine(self, data: dict) -> None:
+        """Full nesting run at start of pwm loop."""
+        self.nest_rooms(data)
+        self.distribute_nesting()
+        self.update_stats("routine")
+
     def distribute_nesting(self) -> None:
         """Shuffles packs to get best distribution."""
+        # beam search packing is balanced by the solver
+        if self.strategy == NestingStrategy.BEAM_SEARCH:
+            return
+        self.distribute_lids()
+
+    def distribute_lids(self) -> None:
+        """Reverse lids to balance the first fit nesting."""
         if not self.packed:
             return
+        self._locations = None
 
         if len(self.packed) == 1:
             return
@@ -576,17 +753,17 @@ class Nesting:
                     for area_segment, _ in enumerate(lid_i):
                         lid_i[area_segment] = list(reversed(lid_i[area_segment]))
 
+            if 2 ** (len(self.packed) - 1) > NESTING_FLIP_OPTIONS:
+                self.flip_lids()
+                return
+
             # create list of variations
-            option_list = list(
-                itertools.product([False, True], repeat=len(self.packed))
+            # mirrored options give the same balance thus first lid is kept fixed
+            option_list = (
+                (False, *opt)
+                for opt in itertools.product([False, True], repeat=len(self.packed) - 1)
             )
 
-            # remove duplicate options
-            len_options = len(option_list) - 1
-            for i_o, opt in enumerate(reversed(option_list)):
-                if [not elem for elem in opt] in option_list:
-                    option_list.pop(len_options - i_o)
-
             # loop through all options
             for opt in option_list:
                 test_set = copy.deepcopy(self.packed)
@@ -604,11 +781,12 @@ class Nesting:
                 if balance_result is not None:
                     if abs(balance_result) <= NESTING_BALANCE:
                         self.packed = test_set
-                        self._logger.debug(
-                            "finished time %.4f, balance %.4f",
-                            time.time() - self.start_time,
-                            balance_result,
-                        )
+                        if self._logger.isEnabledFor(logging.DEBUG):
+                            self._logger.debug(
+                                "finished time %.4f, balance %.4f",
+                                time.perf_counter() - self.start_time,
+                                balance_result,
+                            )
                         return
 
         # balanced mode or min pwm
@@ -625,15 +803,52 @@ class Nesting:
 
                 # determine the equality over pwm
                 balance_result = self.nesting_balance(self.packed)
-                self._logger.debug(
-                    "nesting balance %.4f",
-                    balance_result,
-                )
+                if self._logger.isEnabledFor(logging.DEBUG):
+                    self._logger.debug(
+                        "nesting balance %.4f",
+                        balance_result,
+                    )
 
                 if balance_result is not None:
                     if abs(balance_result) <= NESTING_BALANCE:
                         return
 
+    def flip_lids(self) -> None:
+        """Reverse lid by lid and keep the reversals which improve the balance.
+
+        used when the lids are too many to try all reversal options, the
+        first lid is kept fixed as mirrored options give the same balance
+        """
+        best = self.nesting_balance(self.packed)
+        if best is None:
+            return
+
+        for _ in range(2):
+            improved = False
+            for lid_i in self.packed[1:]:
+                if abs(best) <= NESTING_BALANCE:
+                    break
+                for area_segment, _ in enumerate(lid_i):
+                    lid_i[area_segment] = list(reversed(lid_i[area_segment]))
+
+                balance_result = self.nesting_balance(self.packed)
+                if abs(balance_result) < abs(best):
+                    best = balance_result
+                    improved = True
+                else:
+                    # undo reversal
+                    for area_segment, _ in enumerate(lid_i):
+                        lid_i[area_segment] = list(reversed(lid_i[area_segment]))
+            if not improved:
+                break
+
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug(
+                "finished time %.4f, balance %.4f",
+                time.perf_counter() - self.start_time,
+                best,
+            )
+
     def nesting_balance(self, test_set: list) -> float | None:
         """Get balance of areas over pwm signal."""
         cleaned_area = []
@@ -660,96 +875,111 @@ class Nesting:
         moment_area = 0
         for i, area in enumerate(cleaned_area):
             moment_area += i * area
-        self._logger.debug("area distribution \n %s", cleaned_area)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("area distribution \n %s", cleaned_area)
 
         return (moment_area / sum(cleaned_area) - (len(cleaned_area) - 1) / 2) / len(
             cleaned_area
         )
 
     def get_nesting(self) -> dict:
-        """Get offset per room with offset in satellite pwm scale."""
+        """Get offset per room with offset in satellite pwm scale.
+
+        the lids are mapped to room numbers (0 is free) and reduced to the
+        occupied columns per room, which give the offsets, cleaned_rooms
+        and the start and end of the master at once
+        """
         len_pwm = self.max_nested_pwm()
+        self.offset = {}
+        self.cleaned_rooms = []
+        self._master_bounds = None
         if len_pwm == 0:
             return {}
 
-        self.offset = {}
-        self.cleaned_rooms = [[] for _ in range(len_pwm)]
+        # occupied pwm columns per room number
+        numbers = {room: i_r + 1 for i_r, room in enumerate(self.rooms)}
+        numbers[None] = 0
+        occupied = np.zeros((len(self.rooms) + 1, len_pwm), dtype=bool)
+        at_end = np.zeros(len(self.rooms) + 1, dtype=bool)  # in last lid column
         for lid in self.packed:
-            # loop over pwm
-            # first check if some are at end
-            # extract unique rooms by fromkeys method
-            if len_pwm == NESTING_MATRIX:
-                # self.operation_mode == NestingMode.MASTER_CONTINUOUS
-                # and self.pwm_for_nesting == NESTING_MATRIX
-                rooms = list(dict.fromkeys(lid[:, -1]))
-                rooms = [r_i for r_i in rooms if r_i is not None]
-                if not rooms:
-                    continue
-                for room in rooms:
-                    self.cleaned_rooms[len_pwm - 1].append(room)
-                    if room not in self.offset:
-                        room_pwm = self.real_pwm[self.rooms.index(room)]
-                        # offset in satellite pwm scale
-                        self.offset[room] = (
-                            NESTING_MATRIX - room_pwm
-                        ) / self.scale_factor[room]
-
-            # define offsets others
-            for i_2 in range(lid.shape[1]):
-                # last one already done
-                if i_2 < len_pwm - 1:
-                    # extract unique rooms by fromkeys method
-                    rooms = list(dict.fromkeys(lid[:, i_2]))
-                    rooms = [r_i for r_i in rooms if r_i is not None]
-                    if not rooms:
-                        continue
-                    for room in rooms:
-                        if room not in self.cleaned_rooms[i_2]:
-                            self.cleaned_rooms[i_2].append(room)
-                        if room not in self.offset:
-                            self.offset[room] = i_2 / self.scale_factor[room]
-
+            lid_numbers = np.fromiter(
+                map(numbers.__getitem__, lid.flat), dtype=np.intp, count=lid.size
+            ).reshape(lid.shape)
+            occupied[lid_numbers, np.arange(lid.shape[1])] = True
+            at_end[lid_numbers[:, -1]] = True
+        occupied = occupied[1:]
+
+        nested = np.flatnonzero(occupied.any(axis=1))
+        if not len(nested):
+            return self.offset
+
+        real_pwm = np.asarray(self.real_pwm, dtype=float)[nested]
+        start = occupied[nested].argmax(axis=1).astype(float)
+        if len_pwm == self.matrix:
+            # rooms at the end of their lid end with the pwm loop
+            at_end = at_end[1:][nested]
+            start[at_end] = self.matrix - real_pwm[at_end]
+        start += self.phase_shift
+
+        for i_r, room_start in zip(nested.tolist(), start.tolist()):
+            room = self.rooms[i_r]
+            # offset in satellite pwm scale
+            self.offset[room] = room_start / self.scale_factor[room]
+
+        rooms = np.array(self.rooms, dtype=object)
+        self.cleaned_rooms = [rooms[column].tolist() for column in occupied.T]
+        self._master_bounds = (
+            int(occupied.any(axis=0).argmax()) + self.phase_shift,
+            float((start + real_pwm).max()),
+        )
         return self.offset
 
+    def nesting_window(self) -> dict | None:
+        """Heating window of the nesting as fraction of the pwm loop.
+
+        slack is the shift by which the nesting still ends within the loop
+        and load the peak nested area, None when no room is nested
+        """
+        if self._master_bounds is None:
+            return None
+        start, end = (bound - self.phase_shift for bound in self._master_bounds)
+        # proportional valves are open the full loop
+        slack = 0 if self.load_prop > 0 else max(0, self.matrix - end)
+        return {
+            "start": start / self.matrix,
+            "end": end / self.matrix,
+            "slack": slack / self.matrix,
+            "load": self.peak_load() * self.tot_area,
+        }
+
+    def set_phase_shift(self, shift: float) -> dict:
+        """Shift the nesting in the pwm loop and return the new offsets.
+
+        shift as fraction of the pwm loop
+        """
+        self.phase_shift = shift * self.matrix
+        self.stats["phase_shift"] = round(shift, 3)
+        return self.get_nesting()
+
     def get_master_output(self) -> dict:
         """Control ouput (offset and pwm) for master."""
         end_time = 0
         end_time_prop = 0
-        master_offset = None
-        # nested rooms present
-        if (
-            self.cleaned_rooms is not None and len(self.cleaned_rooms) > 0
-            # and self.rooms
-        ):
-            # loop over nesting to find start offset
-            for pwm_i, rooms in enumerate(self.cleaned_rooms):
-                if len(rooms) > 0 and master_offset is None:
-                    master_offset = pwm_i
-
-            # find max end time
-            room_end_time = [0]
-            for i_r, room in enumerate(self.rooms):
-                if room in self.offset:
-                    # take actual pwm into account and not rounded
-                    # scale offsets back to NESTING_MATRIX domain
-                    room_end = (
-                        self.offset[room] * self.scale_factor[room] + self.real_pwm[i_r]
-                    )
-                    room_end_time.append(room_end)
-
-            end_time = max(room_end_time)
-            self._logger.debug("pwm on-off '%s'", end_time / self.master_pwm_scale)
-
-        if master_offset is None:
-            master_offset = 0
+        master_offset = 0
+        # nested rooms present, start and end as found by get_nesting
+        # with the actual pwm and not the rounded
+        if self._master_bounds is not None:
+            master_offset, end_time = self._master_bounds
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug("pwm on-off '%s'", end_time / self.master_pwm_scale)
 
         # proportional valves require heat
         if self.load_prop > 0:
             # prop valves are full cycle open
             
             # too much load
-            if self.load_total / NESTING_MATRIX > end_time - master_offset:
-                end_time_prop = self.load_total / NESTING_MATRIX
+            if self.load_total / self.matrix > end_time - master_offset:
+                end_time_prop = self.load_total / self.matrix
 
             # continuous operation possible due to prop valves
             if (
@@ -757,11 +987,12 @@ class Nesting:
                 in [NestingMode.MASTER_BALANCED, NestingMode.MASTER_CONTINUOUS]
                 and self.area_avg_prop > self.min_area > 0
             ):
-                end_time_prop = NESTING_MATRIX
+                end_time_prop = self.matrix
 
-            self._logger.debug(
-                "pwm proportional '%s'", end_time_prop / self.master_pwm_scale
-            )
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self._logger.debug(
+                    "pwm proportional '%s'", end_time_prop / self.master_pwm_scale
+                )
             # assure sufficient opening
             end_time_prop = max(
                 end_time_prop,
@@ -771,7 +1002,8 @@ class Nesting:
 
         end_time = max(end_time, end_time_prop) / self.master_pwm_scale
         master_offset /= self.master_pwm_scale
-        self._logger.debug("master start '%s'; end '%s", master_offset, end_time)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("master start '%s'; end '%s", master_offset, end_time)
         return {
             ATTR_CONTROL_OFFSET: master_offset,
             ATTR_CONTROL_PWM_OUTPUT: end_time - master_offset,
@@ -782,145 +1014,185 @@ class Nesting:
 
         room needs to be removed from:
         - cleaned_rooms, packed, offset
+        only the cells of the room are cleared, emptied area segments and
+        lids are removed by compact_lids
         """
         self._logger.debug("'%s' removed from nesting", room)
+        location = self._clear_room(room)
+        if location is None:
+            return
 
-        # update packed
-        for i, pack in enumerate(self.packed):
-            pack = np.where(pack != room, pack, None)
-
-            len_pack = len(pack) - 1
-            for j, sub_area in enumerate(reversed(pack)):
-                if (sub_area == None).all():  # noqa: E711
-                    # new_pack = np.append(new_pack, [sub_area])
-                    pack = np.delete(pack, len_pack - j, 0)
+        # update cleaned rooms
+        _, _, _, col_start, col_end = location
+        for rooms in self.cleaned_rooms[col_start:col_end]:
+            if room in rooms:
+                rooms.remove(room)
+
+    def _clear_room(self, room: str) -> tuple | None:
+        """Clear the cells of a room and return its former location."""
+        location = self.room_locations().pop(room, None)
+        if location is not None:
+            lid_i, row_start, row_end, col_start, col_end = location
+            self.packed[lid_i][row_start:row_end, col_start:col_end] = None
+            self._sparse_lids.add(lid_i)
+        self.offset.pop(room, None)
+        return location
+
+    def compact_lids(self) -> None:
+        """Delete area segments and lids emptied by removed rooms.
+
+        the locations of the remaining rooms are shifted accordingly
+        """
+        if not self._sparse_lids:
+            return
 
-            self.packed[i] = copy.copy(pack)
+        packed = []
+        lid_map = {}  # old lid index -> new lid index
+        row_shift = {}  # old lid index -> removed rows up to each row
+        for lid_i, lid in enumerate(self.packed):
+            if lid_i in self._sparse_lids:
+                used = (lid != None).any(axis=1)  # noqa: E711
+                if not used.any():
+                    continue
+                if not used.all():
+                    row_shift[lid_i] = np.cumsum(~used)
+                    lid = lid[used]
+            lid_map[lid_i] = len(packed)
+            packed.append(lid)
+
+        if self._locations is not None and (
+            row_shift or len(packed) < len(self.packed)
+        ):
+            for room, location in self._locations.items():
+                lid_i, row_start, row_end, col_start, col_end = location
+                shift = int(row_shift[lid_i][row_start]) if lid_i in row_shift else 0
+                self._locations[room] = (
+                    lid_map[lid_i],
+                    row_start - shift,
+                    row_end - shift,
+                    col_start,
+                    col_end,
+                )
 
-        len_pack = len(self.packed) - 1
+        self.packed = packed
+        self._sparse_lids = set()
 
-        # remove items from packed which are empty
-        for i, pack in enumerate(reversed(self.packed)):
-            if not pack.any():
-                self.packed.pop(len_pack - i)
+    def room_locations(self) -> dict:
+        """Location of each nested room, built once after the lids changed.
 
-        # update cleaned rooms
-        for i, lid in enumerate(self.cleaned_rooms):
-            for ii, room_i in enumerate(lid):
-                if room_i == room:
-                    self.cleaned_rooms[i][ii] = ""
-
-        self.cleaned_rooms = list(filter(None, self.cleaned_rooms))
-
-        # update list with offsets
-        _ = self.offset.pop(room, None)
-
-    def nesting_bounds(self, room: str) -> list:
-        """Find room in nesting."""
-        index_start = None
-        index_end = None
-        free_space = 0
-        # find current area
-        for pack_i, lid in enumerate(self.packed):  # noqa: B007
-            # loop over pwm
-            for area_segment in lid:
-                # find start and end nesting
-                if room in area_segment:
-                    index_start = list(area_segment).index(room)
-                    index_end = len(area_segment) - list(reversed(area_segment)).index(
-                        room
+        a room fills a rectangle of a lid: the area rows and pwm columns
+        """
+        if self._locations is None:
+            self._locations = {}
+            for lid_i, lid in enumerate(self.packed):
+                for room in set(lid.flat):
+                    if room is None:
+                        continue
+                    mask = lid == room
+                    rows = np.flatnonzero(mask.any(axis=1))
+                    cols = np.flatnonzero(mask.any(axis=0))
+                    self._locations[room] = (
+                        lid_i,
+                        int(rows[0]),
+                        int(rows[-1]) + 1,
+                        int(cols[0]),
+                        int(cols[-1]) + 1,
                     )
+        return self._locations
 
-                    # check free space
-                    if len(area_segment) > index_end:
-                        if all(
-                            pwm_i is None for pwm_i in area_segment[index_end + 1 :]
-                        ):
-                            free_space = len(area_segment) - index_end
-                        else:
-                            free_space = -1
-                    break
+    def apply_room_delta(
+        self, room: str, new_pwm: int, new_area: int, dt: int = 0
+    ) -> None:
+        """Update the nesting of one room during the pwm loop.
 
-        return pack_i, index_start, index_end, free_space
+        pwm and area in nesting units, dt is the passed part of the loop
+        only the lid of the room is changed: a shorter pwm is cut, a longer
+        pwm is extended into the free space after the room and the room is
+        moved when its area changed or it does not fit. A room which
+        already started is extended as far as possible instead of moved.
+        """
+        room_index = self.rooms.index(room)
+        self.pwm[room_index] = new_pwm
+        self.area[room_index] = new_area
+        location = self.room_locations().get(room)
 
-    def update_nesting(
-        self,
-        lid_index: int,
-        room_index: int,
-        index_start: int,
-        index_end: int,
-        free_space: int,
-    ) -> None:
-        """Udpate room nestign with update."""
-        lid = self.packed[lid_index]
-        old_pwm = index_end - index_start
-
-        # extend when too short
-        if old_pwm < self.pwm[room_index] and free_space > 0:
-            if lid.shape[1] < self.max_nested_pwm():
-                new_length = self.max_nested_pwm() - lid.shape[1]
-                lid = np.lib.pad(
-                    lid,
-                    (
-                        (0, 0),
-                        (0, new_length),
-                    ),
-                    "constant",
-                    constant_values=(None),
-                )
-            # fill new created area
-            for area_segment in lid:
-                max_fill = min(index_start + self.pwm[room_index], len(area_segment))
-                if room_index in area_segment:
-                    area_segment[index_start:max_fill] = room_index
-
-        # when pwm has lowered
-        elif old_pwm > self.pwm[room_index]:
-            for area_segment in lid:
-                if room_index in area_segment:
-                    area_segment[
-                        index_start + self.pwm[room_index] + 1 : len(area_segment)
-                    ] = None
+        if new_pwm == 0:
+            self.remove_room(room)
+            return
+
+        if location is None:
+            self._nest_room(room_index, dt)
+            return
+
+        lid_i, row_start, row_end, col_start, col_end = location
+        lid = self.packed[lid_i]
+        if row_end - row_start != new_area:
+            self._move_room(room_index, dt)
+            return
+
+        # the shifted nesting ends with the pwm loop
+        last_col = min(lid.shape[1], ceil(self.matrix - self.phase_shift))
+        new_end = col_start + new_pwm
+        if new_end > last_col:
+            if col_start >= dt:
+                self._move_room(room_index, dt)
+                return
+            new_end = max(col_start, last_col)
+        rows = slice(row_start, row_end)
+        if new_end < col_end:
+            lid[rows, new_end:col_end] = None
+        elif new_end > col_end:
+            occupied = (lid[rows, col_end:new_end] != None).any(axis=0)  # noqa: E711
+            if occupied.any():
+                if col_start >= dt:
+                    self._move_room(room_index, dt)
+                    return
+                new_end = col_end + int(occupied.argmax())
+            lid[rows, col_end:new_end] = room
+        self._locations[room] = (lid_i, row_start, row_end, col_start, new_end)
+
+    def _move_room(self, room_index: int, dt: int) -> None:
+        """Clear room from its lid and nest it again."""
+        self._clear_room(self.rooms[room_index])
+        self._nest_room(room_index, dt)
+
+    def _nest_room(self, room_index: int, dt: int) -> None:
+        """Nest room in free space or a new lid."""
+        if not self.packed or not self.insert_room(room_index, dt=dt):
+            self.create_lid(room_index, dt=dt)
 
     def check_pwm(self, data: dict, dt: float = 0) -> None:
         """Check if nesting length is still right for each room."""
+        self.start_time = time.perf_counter()
         self.satelite_data(data)
-        self._logger.debug("check nesting @ %s of pwm loop", round(dt, 2))
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("check nesting @ %s of pwm loop", round(dt, 2))
 
-        time_past = floor(dt * NESTING_MATRIX)
+        # nesting is shifted in the pwm loop
+        time_past = max(0, floor(dt * self.matrix - self.phase_shift))
 
         # new satelite states result in no requirement
-        if self.area is None:
+        demand = {room for i, room in enumerate(self.rooms) if self.pwm[i] > 0}
+        if not demand:
             self.packed = []
+            self._locations = None
+            self._sparse_lids = set()
             self.cleaned_rooms = []
             self.offset = {}
+            self._master_bounds = None
             return
 
-        # remove nested rooms when not present
-        if self.packed:
-            current_rooms = list(self.offset.keys())
-            for room in current_rooms:
-                if room not in self.rooms:
-                    self.remove_room(room)
+        # remove nested rooms when not present or without demand
+        for room in list(self.offset):
+            if room not in demand:
+                self.remove_room(room)
 
-        # check per room the nesting
+        # update nesting per room
         for room_i, room in enumerate(self.rooms):
-            if self.pwm[room_i] == 0:
-                self.remove_room(room)
+            if room not in demand:
                 continue
+            self.apply_room_delta(
+                room, self.pwm[room_i], self.area[room_i], dt=time_past
+            )
 
-            if not self.packed:
-                self.create_lid(room_i, dt=time_past)
-            else:
-                # find room
-                pack_i, index_start, index_end, free_space = self.nesting_bounds(room)
-
-                # when the current room is not found
-                if index_start is None or index_end is None:
-                    if not self.insert_room(room_i, dt=time_past):
-                        self.create_lid(room_i, dt=time_past)
-                # modify existing nesting
-                else:
-                    self.update_nesting(
-                        pack_i, room_i, index_start, index_end, free_space
-                    )
+        self.compact_lids()
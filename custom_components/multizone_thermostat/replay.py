@@ -0,0 +1,217 @@
+"""Offline replay of recorded thermostat inputs.
+
+Run with the recorded files, oldest first:
+python -m custom_components.multizone_thermostat.replay LOG [LOG ...]
+"""
+from __future__ import annotations
+
+import argparse
+from collections.abc import Iterable
+import copy
+import json
+import math
+
+from homeassistant.const import STATE_OFF
+from homeassistant.core import State
+
+from .clock import SimulatedClock, set_clock
+from .hvac_setting import HVACSetting
+from .input_log import read_inputs
+
+REPLAY_TOLERANCE = 1e-6
+# decision values depending on the controller logic
+REPLAY_COMPARE = ("pid_p", "pid_i", "pid_d", "wc", "pwm_out", "offset")
+
+
+class InputReplay:
+    """Feed recorded inputs through the controllers of a thermostat.
+
+    The controllers are rebuilt from the config entry and run on a
+    simulated clock which is set to the recorded time of each entry. The
+    inputs of a controller tick are applied when the tick started and the
+    output is determined when it finished, inputs received in between
+    are applied in between as in the live thermostat. Each replayed
+    decision is compared with the recorded decision.
+    """
+
+    def __init__(self, tolerance: float = REPLAY_TOLERANCE) -> None:
+        """Prepare empty replay."""
+        self._tolerance = tolerance
+        self._clock = SimulatedClock(0)
+        self._hvac_def: dict[str, HVACSetting] = {}
+        self._hvac_on: HVACSetting | None = None
+        self._tick = None
+        self.ticks = 0
+        self.entries = 0
+        self.differences = []
+
+    def run(self, entries: Iterable[tuple[float, str, dict]]) -> dict:
+        """Replay entries, returns summary with the differences."""
+        previous = set_clock(self._clock)
+        try:
+            for timestamp, kind, data in entries:
+                self.entries += 1
+                self._clock.set_time(timestamp)
+                handler = getattr(self, f"_replay_{kind}", None)
+                if handler is not None:
+                    handler(data)
+        finally:
+            set_clock(previous)
+        return {
+            "entries": self.entries,
+            "ticks": self.ticks,
+            "differences": self.differences,
+        }
+
+    def _replay_config(self, data: dict) -> None:
+        """Rebuild the controllers."""
+        self._hvac_def = {}
+        self._hvac_on = None
+        for hvac_mode, mode in data["modes"].items():
+            hvac = HVACSetting(
+                data["name"],
+                hvac_mode,
+                copy.deepcopy(mode["config"]),
+                data["area"],
+                False,
+            )
+            hvac.target_temperature = mode["target"]
+            if mode["integral"] is not None:
+                hvac.set_integral(mode["integral"])
+            self._hvac_def[hvac_mode] = hvac
+        self._activate(data["hvac_mode"])
+
+    def _activate(self, hvac_mode: str) -> None:
+        """Switch active controller as the thermostat does."""
+        hvac = self._hvac_def.get(hvac_mode)
+        if hvac is self._hvac_on:
+            return
+        if self._hvac_on is not None and self._hvac_on.is_hvac_master_mode:
+            self._hvac_on.restore_satelites()
+        self._hvac_on = hvac
+        self._tick = None
+        if hvac_mode == STATE_OFF or hvac is None:
+            return
+        if hvac.is_prop_pid_mode:
+            hvac.pid_reset_time()
+        if hvac.is_hvac_master_mode:
+            hvac.restore_satelites()
+
+    def _replay_hvac_mode(self, data: dict) -> None:
+        """Change of hvac mode."""
+        self._activate(data["hvac_mode"])
+
+    def _replay_service(self, data: dict) -> None:
+        """Parameter changes, other services act through the tick inputs."""
+        hvac = self._hvac_def.get(data.get("hvac_mode"))
+        if hvac is None:
+            return
+        service = data["service"]
+        if service == "set_pid":
+            hvac.set_pid_param(
+                kp=data["kp"], ki=data["ki"], kd=data["kd"], update=data["update"]
+            )
+        elif service == "set_integral":
+            hvac.set_integral(data["integral"])
+        elif service == "set_ka_kb":
+            hvac.set_ka_kb(ka=data["ka"], kb=data["kb"])
+        elif service == "set_pwm_threshold":
+            hvac.set_pwm_threshold(data["new_threshold"])
+
+    def _replay_satelite(self, data: dict) -> None:
+        """Satelite update received by master."""
+        if self._hvac_on is not None and self._hvac_on.is_hvac_master_mode:
+            self._hvac_on.update_satelite(
+                State(data["entity_id"], data["state"], data["attributes"])
+            )
+
+    def _replay_controller(self, data: dict) -> None:
+        """Apply the inputs of a tick and run the calculation."""
+        self._activate(data["hvac_mode"])
+        hvac = self._hvac_on
+        if hvac is None:
+            return
+        if data["state"] is not None:
+            hvac.current_state = data["state"]
+        hvac.current_temperature = data["temperature"]
+        hvac.outdoor_temperature = data["outdoor"]
+        hvac.target_temperature = data["setpoint"]
+        hvac.time_offset = data["time_offset"]
+        hvac.master_delay = data["master_delay"]
+
+        nesting = None
+        if hvac.is_hvac_master_mode and data["routine"]:
+            # nesting runs on the satelite data at the start of the tick
+            nesting, satelites = hvac.nesting_snapshot()
+            nesting.nest_routine(satelites)
+        else:
+            hvac.calculate(
+                routine=data["routine"],
+                force=data["force"],
+                current_offset=data["offset"],
+            )
+        self._tick = (data, nesting)
+
+    def _replay_decision(self, data: dict) -> None:
+        """Determine the output of the tick and compare."""
+        if self._tick is None or self._hvac_on is None:
+            return
+        tick, nesting = self._tick
+        self._tick = None
+        hvac = self._hvac_on
+        satelites = None
+        if hvac.is_hvac_master_mode:
+            if tick["routine"]:
+                # heating window shifted as coordinated with the other masters
+                hvac.apply_nesting(
+                    None if data["nesting"] == "fallback" else nesting,
+                    coordinate=lambda window: data.get("phase_shift") or 0,
+                )
+            satelites = hvac.get_satelite_offset()
+        hvac.calc_control_output()
+        self.ticks += 1
+
+        replayed = hvac.get_decision_values
+        for field in REPLAY_COMPARE:
+            self._compare(field, data["values"].get(field), replayed.get(field))
+        if data["satelites"] is not None:
+            for room in set(data["satelites"]) | set(satelites or {}):
+                self._compare(
+                    f"satelite.{room}",
+                    data["satelites"].get(room),
+                    (satelites or {}).get(room),
+                )
+
+    def _compare(self, field: str, recorded, replayed) -> None:
+        """Store difference of recorded and replayed value."""
+        if recorded is None and replayed is None:
+            return
+        if (
+            recorded is not None
+            and replayed is not None
+            and math.isclose(recorded, replayed, abs_tol=self._tolerance)
+        ):
+            return
+        self.differences.append(
+            {
+                "time": self._clock.time(),
+                "field": field,
+                "recorded": recorded,
+                "replayed": replayed,
+            }
+        )
+
+
+def main() -> None:
+    """Replay log files and print the differences."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="input logs, oldest first")
+    parser.add_argument("--tolerance", type=float, default=REPLAY_TOLERANCE)
+    args = parser.parse_args()
+
+    result = InputReplay(args.tolerance).run(read_inputs(*args.logs))
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
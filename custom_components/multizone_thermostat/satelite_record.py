@@ -0,0 +1,24 @@
+"""Satelite demand as stored by the master."""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SateliteRecord:
+    """State of a satelite thermostat relevant for nesting.
+
+    pwm is the control output in satelite pwm scale
+    offset is the pwm start in satelite pwm scale
+    """
+
+    hvac_mode: str
+    self_controlled: str
+    preset_mode: str
+    control_mode: str
+    pwm_duration: int
+    pwm_scale: float
+    setpoint: float
+    area: float
+    pwm: float
+    offset: float
+    update_needed: bool = False
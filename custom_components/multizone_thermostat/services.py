@@ -1,5 +1,6 @@
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
+from homeassistant.core import SupportsResponse
 from homeassistant.helpers import entity_platform
 from homeassistant.components.climate import (
     ATTR_HVAC_MODE,
@@ -94,6 +95,43 @@ def register_services(custom_presets):
             vol.Optional("sat_id"): vol.Coerce(int),
             vol.Optional("pwm_start_time"): vol.Coerce(float),
             vol.Optional("master_delay"): vol.Coerce(float),
+            vol.Optional(ATTR_MASTER_ENTITY_ID): cv.entity_id,
         },
         "async_set_satelite_mode",
     )
+
+    platform.async_register_entity_service(  # type: ignore
+        "set_tracing",
+        {vol.Required("enabled"): cv.boolean},
+        "async_set_tracing",
+    )
+
+    platform.async_register_entity_service(  # type: ignore
+        "dump_trace",
+        {vol.Optional("count"): vol.All(vol.Coerce(int), vol.Range(min=1))},
+        "async_dump_trace",
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    platform.async_register_entity_service(  # type: ignore
+        "dump_decisions",
+        {vol.Optional("count"): vol.All(vol.Coerce(int), vol.Range(min=1))},
+        "async_dump_decisions",
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    platform.async_register_entity_service(  # type: ignore
+        "record_inputs",
+        {vol.Required("enabled"): cv.boolean},
+        "async_record_inputs",
+    )
+
+    platform.async_register_entity_service(  # type: ignore
+        "profile",
+        {
+            vol.Optional("ticks", default=10): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=1000)
+            )
+        },
+        "async_profile",
+    )
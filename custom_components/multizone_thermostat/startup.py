@@ -0,0 +1,124 @@
+"""Coordinated start-up of all thermostats after a restart."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.const import EVENT_HOMEASSISTANT_START
+from homeassistant.core import HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+from .const import DATA_STARTUP
+
+if TYPE_CHECKING:
+    from .climate import MultiZoneThermostat
+
+
+class StartupCoordinator:
+    """Restore all thermostats in one pass when Home Assistant starts.
+
+    Satellites are restored concurrently before the masters such that a
+    master syncs all its satellites at once. The time from start until
+    all thermostats control their valves is measured.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Listen for start of Home Assistant."""
+        self.hass = hass
+        self._logger = logging.getLogger(DOMAIN).getChild("startup")
+        self._entities = {}
+        self._pending = set()
+        self._start_time = None
+        self.starting = False
+        self.time_to_control = None
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, self._async_start)
+
+    @callback
+    def async_register(self, entity: MultiZoneThermostat) -> None:
+        """Add thermostat to start-up."""
+        self._entities[entity.entity_id] = entity
+
+    @callback
+    def async_unregister(self, entity: MultiZoneThermostat) -> None:
+        """Remove thermostat."""
+        self._entities.pop(entity.entity_id, None)
+        self._pending.discard(entity.entity_id)
+
+    @property
+    def started(self) -> bool:
+        """Coordinated start-up has run."""
+        return self._start_time is not None
+
+    def get_entity(self, entity_id: str) -> MultiZoneThermostat | None:
+        """Thermostat by entity id."""
+        return self._entities.get(entity_id)
+
+    async def _async_start(self, *_) -> None:
+        """Restore satellites and thereafter masters."""
+        self._start_time = get_clock().monotonic()
+        self.starting = True
+        entities = list(self._entities.values())
+        self._pending = {entity.entity_id for entity in entities}
+        self._logger.info("start-up of %s thermostats", len(entities))
+
+        try:
+            await self._async_start_group(
+                [entity for entity in entities if not entity.is_master]
+            )
+            await self._async_start_group(
+                [entity for entity in entities if entity.is_master]
+            )
+        finally:
+            self.starting = False
+
+        self._logger.debug(
+            "start-up restored in %.3f sec", get_clock().monotonic() - self._start_time
+        )
+        self._check_controlled()
+
+    async def _async_start_group(self, entities: list) -> None:
+        """Restore thermostats concurrently, a failing one does not stop others."""
+        results = await asyncio.gather(
+            *(entity.async_startup() for entity in entities), return_exceptions=True
+        )
+        for entity, result in zip(entities, results):
+            if isinstance(result, Exception):
+                # not waited for in time to control
+                self._pending.discard(entity.entity_id)
+                self._logger.error(
+                    "start-up of %s failed: %s",
+                    entity.entity_id,
+                    result,
+                    exc_info=result,
+                )
+
+    @callback
+    def async_controlled(self, entity: MultiZoneThermostat) -> None:
+        """Thermostat is off or controls its valve."""
+        if entity.entity_id not in self._pending:
+            return
+        self._pending.discard(entity.entity_id)
+        self._check_controlled()
+
+    def _check_controlled(self) -> None:
+        """Report when all thermostats are under control."""
+        if not self.started or self.starting or self._pending:
+            return
+        if self.time_to_control is not None:
+            return
+
+        self.time_to_control = round(get_clock().monotonic() - self._start_time, 2)
+        self._logger.info(
+            "all thermostats under control %.2f sec after start", self.time_to_control
+        )
+
+
+@callback
+def async_get_startup(hass: HomeAssistant) -> StartupCoordinator:
+    """Start-up coordinator of the domain."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_STARTUP not in domain_data:
+        domain_data[DATA_STARTUP] = StartupCoordinator(hass)
+    return domain_data[DATA_STARTUP]
@@ -0,0 +1,118 @@
+"""Scheduled valve open and close instants of a pwm cycle."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Awaitable, Callable
+import datetime
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .clock import get_clock
+from .const import START_MISALINGMENT
+from .tracing import percentile
+
+EDGE_OPEN = "open"
+EDGE_CLOSE = "close"
+EDGE_DELAY_WINDOW = 100  # number of recent edge delays kept
+
+
+class SwitchingPlan:
+    """Open and close timers of a thermostat valve.
+
+    A new plan is compared with the scheduled one and a timer is only
+    replaced when its edge shifts more than the tolerance, is added or is
+    removed. Counters show the replaced and kept timers.
+
+    The delay of an edge is the time between its planned instant and the
+    instant it is operated, the delays of recent edges show the jitter.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        open_action: Callable[[], Awaitable[None]],
+        close_action: Callable[[], Awaitable[None]],
+        tolerance: float = START_MISALINGMENT,
+    ) -> None:
+        """Prepare empty plan."""
+        self.hass = hass
+        self.tolerance = tolerance
+        self._actions = {EDGE_OPEN: open_action, EDGE_CLOSE: close_action}
+        self._edges: dict[str, tuple[float, CALLBACK_TYPE] | None] = {
+            EDGE_OPEN: None,
+            EDGE_CLOSE: None,
+        }
+        self.counters = {"scheduled": 0, "kept": 0, "cancelled": 0}
+        self._delays = deque(maxlen=EDGE_DELAY_WINDOW)
+
+    @property
+    def open_time(self) -> float | None:
+        """Scheduled opening (timestamp)."""
+        return self._edges[EDGE_OPEN] and self._edges[EDGE_OPEN][0]
+
+    @property
+    def close_time(self) -> float | None:
+        """Scheduled closing (timestamp)."""
+        return self._edges[EDGE_CLOSE] and self._edges[EDGE_CLOSE][0]
+
+    @property
+    def delay_stats(self) -> dict:
+        """Percentiles of recent edge delays (ms)."""
+        if not self._delays:
+            return {}
+        values = sorted(self._delays)
+        return {
+            "p50": percentile(values, 50),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+
+    @callback
+    def async_record_delay(self, delay: float) -> None:
+        """Store delay (sec) of an operated edge."""
+        self._delays.append(round(max(delay, 0) * 1000, 1))
+
+    @callback
+    def async_update(self, open_time: float | None, close_time: float | None) -> None:
+        """Apply new plan, None when edge is not scheduled."""
+        self._async_update_edge(EDGE_OPEN, open_time)
+        self._async_update_edge(EDGE_CLOSE, close_time)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Cancel all scheduled edges."""
+        self.async_update(None, None)
+
+    def _async_update_edge(self, edge: str, edge_time: float | None) -> None:
+        """Keep, move or remove timer of edge."""
+        current = self._edges[edge]
+        if current is not None:
+            if edge_time is not None and abs(edge_time - current[0]) <= self.tolerance:
+                self.counters["kept"] += 1
+                return
+            current[1]()
+            self._edges[edge] = None
+            self.counters["cancelled"] += 1
+
+        if edge_time is None:
+            return
+
+        self._edges[edge] = (
+            edge_time,
+            get_clock().async_track_point_in_time(
+                self.hass, self._edge_action(edge), edge_time
+            ),
+        )
+        self.counters["scheduled"] += 1
+
+    def _edge_action(self, edge: str):
+        """Timer callback of edge."""
+
+        async def async_run_edge(now: datetime.datetime) -> None:
+            """Operate valve."""
+            edge_time = self._edges[edge][0]
+            self._edges[edge] = None
+            self.async_record_delay(get_clock().time() - edge_time)
+            await self._actions[edge]()
+
+        return async_run_edge
@@ -0,0 +1,127 @@
+"""Stage timing of the control ticks of a thermostat."""
+from __future__ import annotations
+
+from collections import deque
+import time
+
+from .clock import get_clock
+
+TRACE_WINDOW = 200  # number of recent ticks kept
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest rank percentile of sorted values."""
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class TraceSpan:
+    """Stage times of one tick."""
+
+    __slots__ = ("tick", "time", "stages", "start", "last")
+
+    def __init__(self, tick: str, lock_wait: float) -> None:
+        """Open span after the lock wait (sec)."""
+        self.tick = tick
+        self.time = get_clock().time()
+        self.stages: dict[str, float] = {}
+        self.add("lock_wait", lock_wait)
+        self.start = self.last = time.perf_counter()
+
+    def add(self, stage: str, duration: float) -> None:
+        """Store stage time in ms."""
+        value = round(duration * 1000, 3)
+        self.stages[stage] = self.stages.get(stage, 0) + value
+
+    def lap(self, stage: str) -> None:
+        """Close stage with the time since the previous lap."""
+        now = time.perf_counter()
+        self.add(stage, now - self.last)
+        self.last = now
+
+    def as_dict(self) -> dict:
+        """Span to store, total is the wall time including the lock wait."""
+        self.stages["total"] = round(
+            (time.perf_counter() - self.start) * 1000 + self.stages["lock_wait"], 3
+        )
+        return {"tick": self.tick, "time": self.time, "stages": self.stages}
+
+
+class ControlTracer:
+    """Opt-in timing of the control ticks per stage.
+
+    A tick starts a span after the lock is acquired with the time waited
+    for the lock. The span is passed to each lap, such that ticks which
+    overlap at their await points keep their own stages. Each lap closes
+    a stage with the time since the previous lap. Stage times (ms) of
+    recent ticks are kept for percentiles and for a dump of the last
+    spans. Nothing is recorded when disabled.
+    """
+
+    def __init__(self, window: int = TRACE_WINDOW) -> None:
+        """Prepare disabled tracer."""
+        self.enabled = False
+        self._window = window
+        self._spans = deque(maxlen=window)
+        self._samples: dict[str, deque] = {}
+
+    def enable(self, enabled: bool) -> None:
+        """Start or stop tracing, stored spans are cleared on start."""
+        if enabled and not self.enabled:
+            self._spans.clear()
+            self._samples.clear()
+        self.enabled = enabled
+
+    def start(self, tick: str, lock_wait: float = 0) -> TraceSpan | None:
+        """Start span of a tick, lock wait in sec, None when disabled."""
+        if not self.enabled:
+            return None
+        return TraceSpan(tick, lock_wait)
+
+    def lap(self, span: TraceSpan | None, stage: str) -> None:
+        """Close stage of span."""
+        if span is not None:
+            span.lap(stage)
+
+    def add(self, span: TraceSpan | None, stage: str, duration: float) -> None:
+        """Add stage measured elsewhere, e.g. offloaded work (sec)."""
+        if span is not None:
+            span.add(stage, duration)
+
+    def finish(self, span: TraceSpan | None, stage: str | None = None) -> None:
+        """Close span and add its stages to the samples.
+
+        the remaining time since the last lap is added to stage, spans
+        finished while tracing is stopped are dropped
+        """
+        if span is None or not self.enabled:
+            return
+        if stage is not None:
+            span.lap(stage)
+        record = span.as_dict()
+        self._spans.append(record)
+        for stage_name, value in record["stages"].items():
+            key = f"{record['tick']}.{stage_name}"
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self._window)
+            self._samples[key].append(value)
+
+    def percentiles(self) -> dict:
+        """Rolling percentiles (ms) per tick stage."""
+        result = {}
+        for key, samples in self._samples.items():
+            values = sorted(samples)
+            result[key] = {
+                **{f"p{pct}": percentile(values, pct) for pct in PERCENTILES},
+                "max": values[-1],
+                "count": len(values),
+            }
+        return result
+
+    def recent(self, count: int | None = None) -> list:
+        """Last spans, newest last."""
+        spans = list(self._spans)
+        if count:
+            spans = spans[-count:]
+        return spans
@@ -0,0 +1,119 @@
+"""Stale sensor detection of all thermostats."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import heapq
+import itertools
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from . import DOMAIN
+from .clock import get_clock
+from .const import DATA_WATCHDOG
+
+
+class SensorWatch:
+    """Deadline of one sensor of a thermostat."""
+
+    __slots__ = ("_watchdog", "entity_id", "duration", "action", "deadline")
+
+    def __init__(
+        self,
+        watchdog: StaleWatchdog,
+        entity_id: str,
+        duration: float,
+        action: Callable[[str], None],
+    ) -> None:
+        """Watch sensor."""
+        self._watchdog = watchdog
+        self.entity_id = entity_id
+        self.duration = duration
+        self.action = action
+        self.deadline = None
+
+    @callback
+    def async_feed(self) -> None:
+        """Sensor reading received, move deadline."""
+        self._watchdog.async_schedule(self)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Stop watching sensor."""
+        self.deadline = None
+
+
+class StaleWatchdog:
+    """Deadlines of all watched sensors in one heap.
+
+    A reading moves the deadline of the sensor, the earlier deadline is
+    left in the heap and skipped when reached. A single timer is armed for
+    the first deadline. A stale sensor is reported once and is watched
+    again after its next reading.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Prepare empty watchdog."""
+        self.hass = hass
+        self._logger = logging.getLogger(DOMAIN).getChild("watchdog")
+        self._heap = []
+        self._sequence = itertools.count()
+        self._timer_time = None
+        self._unsub_timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_watch(
+        self, entity_id: str, duration: float, action: Callable[[str], None]
+    ) -> SensorWatch:
+        """Watch sensor, action is called with entity id when stale."""
+        watch = SensorWatch(self, entity_id, duration, action)
+        self.async_schedule(watch)
+        return watch
+
+    @callback
+    def async_schedule(self, watch: SensorWatch) -> None:
+        """Set deadline of sensor a duration from now."""
+        watch.deadline = get_clock().time() + watch.duration
+        heapq.heappush(self._heap, (watch.deadline, next(self._sequence), watch))
+        if self._timer_time is None or watch.deadline < self._timer_time:
+            self._arm(watch.deadline)
+
+    def _arm(self, deadline: float) -> None:
+        """Set timer at deadline."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+        self._timer_time = deadline
+        self._unsub_timer = get_clock().async_track_point_in_time(
+            self.hass, self._async_expire, deadline
+        )
+
+    @callback
+    def _async_expire(self, _now) -> None:
+        """Report stale sensors and arm timer for next deadline."""
+        self._unsub_timer = None
+        self._timer_time = None
+        now = get_clock().time()
+        while self._heap:
+            deadline, _, watch = self._heap[0]
+            if watch.deadline != deadline:
+                # moved or cancelled
+                heapq.heappop(self._heap)
+                continue
+            if deadline > now:
+                self._arm(deadline)
+                return
+            heapq.heappop(self._heap)
+            watch.deadline = None
+            self._logger.debug(
+                "'%s' no reading for %s sec", watch.entity_id, watch.duration
+            )
+            watch.action(watch.entity_id)
+
+
+@callback
+def async_get_watchdog(hass: HomeAssistant) -> StaleWatchdog:
+    """Stale sensor watchdog of the domain."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_WATCHDOG not in domain_data:
+        domain_data[DATA_WATCHDOG] = StaleWatchdog(hass)
+    return domain_data[DATA_WATCHDOG]
@@ -0,0 +1,96 @@
+"""Controller and pwm ticks which overlap at their await points."""
+import asyncio
+import pstats
+
+from custom_components.multizone_thermostat.profiling import TickProfiler
+from custom_components.multizone_thermostat.tracing import ControlTracer
+
+
+def controller_marker() -> None:
+    """Work of the controller tick after the pwm tick ended."""
+
+
+async def controller_tick(tracer, profiler, pwm_started, pwm_done) -> None:
+    """Controller tick awaiting the nesting while a pwm tick runs."""
+    span = tracer.start("controller", 0.001)
+    profile = profiler.start_tick()
+    try:
+        tracer.lap(span, "checks")
+        pwm_started.set()
+        await pwm_done.wait()
+        controller_marker()
+        tracer.lap(span, "calculate")
+    finally:
+        profiler.end_tick(profile)
+        tracer.finish(span, "schedule")
+
+
+async def pwm_tick(tracer, profiler, pwm_started, pwm_done) -> None:
+    """Pwm tick running within the await of the controller tick."""
+    await pwm_started.wait()
+    span = tracer.start("pwm")
+    profile = profiler.start_tick()
+    try:
+        await asyncio.sleep(0)
+    finally:
+        profiler.end_tick(profile)
+        tracer.finish(span, "switching")
+        pwm_done.set()
+
+
+def run_interleaved(tracer: ControlTracer, profiler: TickProfiler) -> None:
+    """Run a pwm tick inside the await of a controller tick."""
+
+    async def run() -> None:
+        pwm_started, pwm_done = asyncio.Event(), asyncio.Event()
+        await asyncio.gather(
+            controller_tick(tracer, profiler, pwm_started, pwm_done),
+            pwm_tick(tracer, profiler, pwm_started, pwm_done),
+        )
+
+    asyncio.run(run())
+
+
+def test_interleaved_ticks_keep_own_span() -> None:
+    """Stages of overlapping ticks end up in the span of their tick."""
+    tracer = ControlTracer()
+    tracer.enable(True)
+    run_interleaved(tracer, TickProfiler())
+
+    spans = {span["tick"]: span["stages"] for span in tracer.recent()}
+    assert set(spans) == {"controller", "pwm"}
+    assert set(spans["controller"]) == {
+        "lock_wait",
+        "checks",
+        "calculate",
+        "schedule",
+        "total",
+    }
+    assert set(spans["pwm"]) == {"lock_wait", "switching", "total"}
+    assert tracer.percentiles()["controller.calculate"]["count"] == 1
+
+
+def test_interleaved_ticks_share_profiler(tmp_path) -> None:
+    """Profiler stays enabled until the last overlapping tick ended."""
+    profiler = TickProfiler()
+    profiler.start(2, str(tmp_path / "ticks.prof"))
+    run_interleaved(ControlTracer(), profiler)
+
+    # both ticks counted once, profiling finished after the controller tick
+    assert not profiler.active
+    profiler.start(1, str(tmp_path / "next.prof"))
+    assert profiler.active
+    profiler.stop()
+
+
+def test_profile_covers_controller_after_pwm_tick(tmp_path) -> None:
+    """Work of the controller after the pwm tick ended is profiled."""
+    profiler = TickProfiler()
+    profiler.start(3, str(tmp_path / "ticks.prof"))
+    run_interleaved(ControlTracer(), profiler)
+
+    # one requested tick left, profile is still collecting
+    assert profiler.active
+    profile, _ = profiler.stop()
+    functions = {func[2] for func in pstats.Stats(profile).stats}
+    assert "controller_marker" in functions